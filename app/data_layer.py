@@ -0,0 +1,239 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+from utils import preprocess_data_for_zscore, preprocess_data
+from render_cache import render_key
+
+# Add the parent directory to the path for imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from scripts.load_data import load_site_data, load_site_rollup, load_site_time_bounds, site_rules_version, site_source_path
+from scripts.artifacts import code_hash
+from scripts.column_store import is_mapped
+from scripts.site_registry import load_site_registry
+from scripts.schema import FLOAT_COLUMNS
+from scripts.distributions import base_histograms
+from scripts.correlation import build_correlation_index
+from scripts.regression import fit_model, fit_models, sufficient_statistics
+from scripts.rollups import slice_rollup
+from scripts.wind import build_wind_table, slice_wind_table
+from scripts.time_index import slice_time_range, sort_by_time, time_bounds, time_index, time_index_dates
+
+# Limits of the process-wide site data cache, configurable through the environment
+DATA_CACHE_TTL_SECONDS = float(os.environ.get('DASHBOARD_DATA_TTL_SECONDS', 24 * 60 * 60))
+DATA_CACHE_MAX_MB = float(os.environ.get('DASHBOARD_DATA_MAX_MB', 2048))
+
+# Function to fingerprint a site's source file cheaply, so changed files are noticed on every rerun
+def source_fingerprint(site):
+    try:
+        stat = os.stat(site_source_path(site))
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+# Regressions of the dashboard's regression views as (target, predictors), solved when a site is prepared
+REGRESSION_MODELS = [('GHI', ('RH',)), ('Tamb', ('RH',))]
+
+# Function to get the site keys of all registered sites by their display name, for the site selector.
+# Only the registry is read, no site data is loaded.
+def get_site_choices():
+    return {config.display_name: site for site, config in load_site_registry().items()}
+
+# Function to load a site and run the dashboard preprocessing on it once
+def prepare_site_data(site):
+    data = sort_by_time(load_site_data(site))
+
+    # Aggregate views render from the site's cube, which is built once and cached next to the data
+    rollup = load_site_rollup(site, data)
+    data = preprocess_data(data)
+
+    # Most views work on the rows that are complete for the Z-score variables
+    zscore_data = preprocess_data_for_zscore(data)
+    if len(zscore_data) == len(data):
+        zscore_data = data
+
+    # Base histograms of the distribution views, built once so reruns and bin changes never rescan the rows
+    histograms = base_histograms(zscore_data, FLOAT_COLUMNS)
+
+    # Sufficient statistics of the regressions, the fits are solved from them in closed form and cached with the site
+    regression_stats = sufficient_statistics(zscore_data)
+    regressions = dict(zip(REGRESSION_MODELS, fit_models(regression_stats, REGRESSION_MODELS)))
+
+    # Per-day cumulative sums of the correlation columns, any date range's correlation matrix is read from them
+    correlation = build_correlation_index(zscore_data)
+
+    # Wind frequencies per day, direction sector and speed class with the direction sums per day and hour,
+    # any date range's wind rose and prevailing directions are summed from them
+    wind = build_wind_table(data)
+
+    # Sorted int64 timestamps of both frames, time ranges are sliced out of them by binary search
+    times = time_index(data)
+    zscore_times = times if zscore_data is data else time_index(zscore_data)
+
+    return {'data': data, 'zscore_data': zscore_data, 'rollup': rollup, 'histograms': histograms,
+            'regression_stats': regression_stats, 'regressions': regressions, 'correlation': correlation, 'wind': wind,
+            'times': times, 'zscore_times': zscore_times}
+
+# Function to measure the memory held by a site's frames, counting shared frames once.
+# Other entries, like the base histograms, are small next to the frames and are not counted.
+# Columns mapped from a column store live in the shared page cache, not in this process, and are not counted either.
+def frames_nbytes(frames):
+    unique_frames = {id(frame): frame for frame in frames.values() if isinstance(frame, pd.DataFrame)}
+    total = 0
+    for frame in unique_frames.values():
+        total += int(frame.index.memory_usage())
+        for column in frame.columns:
+            values = frame[column].to_numpy()
+            if not is_mapped(values):
+                total += values.nbytes
+    return total
+
+# Process-wide store of prepared site data shared by all sessions and reruns.
+# A site is only loaded when a view first asks for it, so the number of registered sites
+# does not affect startup time or memory.
+# Entries are reloaded when their source file changes or their TTL expires, and the
+# least recently used sites are evicted once the memory ceiling is exceeded.
+class SiteDataStore:
+    def __init__(self, max_bytes, ttl_seconds, loader=prepare_site_data):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.loader = loader
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._site_locks = {}
+
+    def get(self, site):
+        fingerprint = source_fingerprint(site)
+
+        with self._lock:
+            entry = self._entries.get(site)
+            if entry is not None and self._is_fresh(entry, fingerprint):
+                self._entries.move_to_end(site)
+                return entry['frames']
+            site_lock = self._site_locks.setdefault(site, threading.Lock())
+
+        # Only one session loads a given site, the others wait for its result
+        with site_lock:
+            with self._lock:
+                entry = self._entries.get(site)
+                if entry is not None and self._is_fresh(entry, fingerprint):
+                    self._entries.move_to_end(site)
+                    return entry['frames']
+
+            frames = self.loader(site)
+            # The fingerprint is taken again in case the load downloaded the file
+            entry = {
+                'frames': frames,
+                'fingerprint': source_fingerprint(site),
+                'loaded_at': time.monotonic(),
+                'nbytes': frames_nbytes(frames),
+            }
+
+            with self._lock:
+                self._entries[site] = entry
+                self._entries.move_to_end(site)
+                self._evict(keep=site)
+
+        return frames
+
+    def invalidate(self, site=None):
+        with self._lock:
+            if site is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(site, None)
+
+    def total_bytes(self):
+        with self._lock:
+            return sum(entry['nbytes'] for entry in self._entries.values())
+
+    def _is_fresh(self, entry, fingerprint):
+        return entry['fingerprint'] == fingerprint and time.monotonic() - entry['loaded_at'] < self.ttl_seconds
+
+    def _evict(self, keep):
+        total = sum(entry['nbytes'] for entry in self._entries.values())
+        for site in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if site != keep:
+                total -= self._entries.pop(site)['nbytes']
+
+# Function to get the single store instance of this server process
+@st.cache_resource
+def get_site_store():
+    return SiteDataStore(max_bytes=DATA_CACHE_MAX_MB * 1024 * 1024, ttl_seconds=DATA_CACHE_TTL_SECONDS)
+
+# Function to get the first and last date of a site's data, for the date range selector.
+# The dates come from the metadata of the site's cache, so a rerun served from the render cache never loads the site.
+# Sites that are not cached yet are loaded.
+def get_site_date_range(site):
+    bounds = load_site_time_bounds(site)
+    if bounds is None:
+        return time_index_dates(get_site_store().get(site)['times'])
+    first, last = bounds
+    return (None, None) if first is None else (first.date(), last.date())
+
+# Function to tell whether a time range covers all of a site's complete rows, so the views can use what was precomputed for the site
+def is_full_range(entry, start, end):
+    lo, hi = time_bounds(entry['zscore_times'], start, end)
+    return lo == 0 and hi == len(entry['zscore_times'])
+
+# Function to get a site's cleaned data with the Month and Hour columns, optionally limited to a time range.
+# The frame is shared between sessions, so it is handed out as a shallow copy and
+# views must not modify its values in place. Ranges are sliced by binary search without copying rows.
+def get_site_data(site, start=None, end=None):
+    entry = get_site_store().get(site)
+    return slice_time_range(entry['data'], entry['times'], start, end).copy(deep=False)
+
+# Function to get a site's data preprocessed for the Z-score and summary views, optionally limited to a time range
+def get_site_zscore_data(site, start=None, end=None):
+    entry = get_site_store().get(site)
+    return slice_time_range(entry['zscore_data'], entry['zscore_times'], start, end).copy(deep=False)
+
+# Function to get a site's aggregate cube for the month, hour and day views, optionally limited to a date range
+def get_site_rollup(site, start=None, end=None):
+    return slice_rollup(get_site_store().get(site)['rollup'], start, end).copy(deep=False)
+
+# Function to get a site's base histograms by variable for the distribution views.
+# The whole range uses the histograms built with the site, other ranges build them for the given columns from the slice.
+def get_site_histograms(site, start=None, end=None, columns=None):
+    entry = get_site_store().get(site)
+    if is_full_range(entry, start, end):
+        return entry['histograms']
+    return base_histograms(slice_time_range(entry['zscore_data'], entry['zscore_times'], start, end), columns or FLOAT_COLUMNS)
+
+# Function to get a site's wind table for the wind rose and wind direction views, optionally limited to a date range
+def get_site_wind(site, start=None, end=None):
+    return slice_wind_table(get_site_store().get(site)['wind'], start, end)
+
+# Function to get a site's correlation index for the correlation matrix views
+def get_site_correlation(site):
+    return get_site_store().get(site)['correlation']
+
+# Function to get a site's regression of target on predictors with the sufficient statistics it was solved from.
+# Regressions that were not solved with the site are solved on first use and cached with it.
+# Other time ranges than the whole data are solved from the statistics of the slice.
+def get_site_regression(site, target, predictors, start=None, end=None):
+    entry = get_site_store().get(site)
+    if not is_full_range(entry, start, end):
+        stats = sufficient_statistics(slice_time_range(entry['zscore_data'], entry['zscore_times'], start, end), list(predictors) + [target])
+        return fit_model(stats, target, predictors), stats
+
+    key = (target, tuple(predictors))
+    if key not in entry['regressions']:
+        entry['regressions'][key] = fit_model(entry['regression_stats'], target, predictors)
+    return entry['regressions'][key], entry['regression_stats']
+
+# Function to build the render cache key of a view of a site: the site, task and view parameters, the
+# fingerprint of the site's data and cleaning version, and the version of the plot function's code.
+# The data is not loaded, so a cached view is shown without reading the site.
+def site_view_key(site, task, params, plot):
+    return render_key(site, task, params, source_fingerprint(site), site_rules_version(site), code_hash(plot))
+
+# Function to drop cached data so it is reloaded on the next access
+def invalidate_site_data(site=None):
+    get_site_store().invalidate(site)
@@ -0,0 +1,112 @@
+import altair as alt
+import pandas as pd
+import streamlit as st
+import os
+import sys
+
+# Add the parent directory to the path for imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from scripts.distributions import binned_kde, rebin
+from scripts.downsampling import downsample, point_budget
+from scripts.rollups import aggregate_variable
+from scripts.wind import rose_frequencies, sector_centers, speed_class_labels
+
+# Upper limit of the rows sent to the browser for one chart. Charts are built from pre-aggregated
+# payloads (bins, downsampled points, matrix cells) that stay below it, raw rows are never sent.
+MAX_CHART_POINTS = 5000
+
+# Width in pixels the interactive time series is downsampled for, about a wide browser window
+CHART_WIDTH_PX = 1200
+
+# Chart backends of the dashboard: static figures rendered on the server, or charts drawn in the browser
+CHART_BACKENDS = {'Static (Matplotlib)': 'static', 'Interactive (Altair)': 'interactive'}
+
+# Function to make sure a chart payload stays within the point limit before it is sent
+def check_payload(payload):
+    if len(payload) > MAX_CHART_POINTS:
+        raise ValueError(f"Chart payload of {len(payload)} rows is above the limit of {MAX_CHART_POINTS}")
+    return payload
+
+# Function to build an interactive histogram from a base histogram, with its KDE curve.
+# The payload is one row per bin plus the KDE sampled at up to a few hundred points.
+def histogram_chart(histogram, bins, title, xlabel, color='steelblue', kde=True):
+    counts, edges = rebin(histogram, bins)
+    payload = check_payload(pd.DataFrame({'start': edges[:-1], 'end': edges[1:], 'count': counts}))
+    bars = alt.Chart(payload).mark_bar(color=color, opacity=0.6).encode(
+        x=alt.X('start:Q', title=xlabel, bin='binned'),
+        x2='end:Q',
+        y=alt.Y('count:Q', title='Frequency'),
+        tooltip=[alt.Tooltip('start:Q', format='.2f'), alt.Tooltip('end:Q', format='.2f'), 'count:Q'],
+    )
+    if not kde:
+        return bars.properties(title=title).interactive()
+
+    x, y = binned_kde(histogram, bin_width=edges[1] - edges[0])
+    step = max(1, len(x) // (bins * 4))
+    curve = check_payload(pd.DataFrame({'x': x[::step], 'density': y[::step]}))
+    line = alt.Chart(curve).mark_line(color=color).encode(x='x:Q', y='density:Q')
+    return (bars + line).properties(title=title).interactive()
+
+# Function to build an interactive time series, downsampled on the server to what the chart width can show.
+# Zooming and panning happen in the browser on the downsampled points.
+def time_series_chart(data, column, title, ylabel, method='minmax'):
+    budget = min(point_budget(CHART_WIDTH_PX), MAX_CHART_POINTS)
+    x, y = downsample(data['Timestamp'].to_numpy(), data[column].to_numpy(), budget, method)
+    payload = check_payload(pd.DataFrame({'Timestamp': x, column: y}))
+    return alt.Chart(payload).mark_line(strokeWidth=1).encode(
+        x=alt.X('Timestamp:T', title='Time'),
+        y=alt.Y(f'{column}:Q', title=ylabel),
+        tooltip=['Timestamp:T', alt.Tooltip(f'{column}:Q', format='.2f')],
+    ).properties(title=title).interactive(bind_y=False)
+
+# Function to build an interactive chart of a variable's means by month or by hour from the site's aggregate cube
+def rollup_chart(rollup, grain, column, title, ylabel):
+    payload = check_payload(aggregate_variable(rollup, grain, column))
+    key = 'Month' if grain == 'month' else 'Hour'
+    base = alt.Chart(payload).encode(
+        x=alt.X(f'{key}:O', title=key),
+        y=alt.Y(f'{column}:Q', title=ylabel),
+        tooltip=[f'{key}:O', alt.Tooltip(f'{column}:Q', format='.2f')],
+    )
+    chart = base.mark_bar() if grain == 'month' else base.mark_line(point=True)
+    return chart.properties(title=title)
+
+# Function to build an interactive heatmap of a correlation matrix, one cell per pair of columns
+def correlation_chart(correlation, title):
+    payload = correlation.rename_axis('row').reset_index().melt(id_vars='row', var_name='column', value_name='correlation')
+    payload = check_payload(payload)
+    order = list(correlation.columns)
+    base = alt.Chart(payload).encode(
+        x=alt.X('column:N', sort=order, title=None),
+        y=alt.Y('row:N', sort=order, title=None),
+    )
+    cells = base.mark_rect().encode(
+        color=alt.Color('correlation:Q', scale=alt.Scale(scheme='redblue', domain=[-1, 1], reverse=True)),
+        tooltip=['row:N', 'column:N', alt.Tooltip('correlation:Q', format='.3f')],
+    )
+    labels = base.mark_text().encode(text=alt.Text('correlation:Q', format='.2f'))
+    return (cells + labels).properties(title=title)
+
+# Function to build an interactive wind direction distribution from a wind table: the share of rows per
+# direction sector, stacked by speed class. The payload is one row per sector and speed class.
+def wind_direction_chart(table, title):
+    frequencies = rose_frequencies(table)
+    sectors, classes = frequencies.shape
+    labels = speed_class_labels(table.speed_edges)
+    payload = check_payload(pd.DataFrame({
+        'direction': sector_centers(sectors).repeat(classes),
+        'speed': labels * sectors,
+        'order': list(range(classes)) * sectors,
+        'share': frequencies.ravel(),
+    }))
+    return alt.Chart(payload).mark_bar().encode(
+        x=alt.X('direction:O', title='Wind Direction (degrees)'),
+        y=alt.Y('share:Q', title='Share of Rows (%)'),
+        color=alt.Color('speed:N', sort=labels, title='Wind Speed (m/s)', scale=alt.Scale(scheme='viridis')),
+        order=alt.Order('order:Q'),
+        tooltip=['direction:O', 'speed:N', alt.Tooltip('share:Q', format='.2f')],
+    ).properties(title=title)
+
+# Function to show an interactive chart in the dashboard, the browser handles zooming, panning and tooltips
+def show_chart(chart):
+    st.altair_chart(chart, width='stretch')
@@ -1,243 +1,195 @@
-import sys
-import os
+import time
 import streamlit as st
-from utils import preprocess_data_for_zscore, display_summary_statistics, preprocess_data, interactive_histograms, plot_time_series, plot_by_month, plot_by_hour, plot_tamb_correlation_matrix, plot_pair_plot, plot_scatter_matrix, plot_wind_speed_distribution, plot_wind_direction_distribution, plot_correlation_matrix, plot_rh_vs_sr_regression, plot_rh_vs_temp_regression
+from utils import display_summary_statistics, select_histogram_options, plot_histogram, plot_time_series, plot_by_month, plot_by_hour, plot_tamb_correlation_matrix, plot_pair_plot, plot_scatter_matrix, plot_wind_speed_distribution, plot_wind_direction_distribution, plot_wind_rose, plot_prevailing_wind_direction, display_zscore_outliers, plot_correlation_matrix, plot_rh_vs_sr_regression, select_date_range, plot_rh_vs_temp_regression, display_performance_panel
+
+from data_layer import get_site_choices, get_site_correlation, get_site_data, get_site_date_range, get_site_histograms, get_site_regression, get_site_rollup, get_site_wind, get_site_zscore_data, site_view_key
+from render_cache import cached_view, get_render_cache
+from interactive_charts import CHART_BACKENDS, correlation_chart, histogram_chart, rollup_chart, show_chart, time_series_chart, wind_direction_chart
+from scripts.correlation import correlation_matrix
+from scripts.schema import FLOAT_COLUMNS, column_label
+from scripts.downsampling import DOWNSAMPLING_METHODS
+from scripts.outliers import ROLLING_WINDOWS, ZSCORE_METHODS
+from scripts.instrumentation import start_collecting, stop_collecting
+
+# The stages of this rerun are collected for the performance panel when it is shown, see scripts/instrumentation.py.
+# A rerun interrupted by a widget change leaves its collection open, it is closed first.
+if 'performance_collection' in st.session_state:
+    stop_collecting(st.session_state.pop('performance_collection'))
+if st.session_state.get('show_performance', False):
+    st.session_state['performance_collection'] = start_collecting(memory=st.session_state.get('trace_memory', False))
+rerun_started = time.perf_counter()
+
+# Sites from the registry, by display name. No site data is loaded until a view needs it.
+site_choices = get_site_choices()
 
-# Add the parent directory to the path for imports
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from scripts.load_data import load_and_clean_data
+# Sidebar for dataset selection
+st.sidebar.title('Dataset and Task Selection')
+dataset = st.sidebar.selectbox('Select Dataset', list(site_choices))
+task = st.sidebar.selectbox('Select Task', ['Histogram', 'Summary Statistics', 'Time Series Analysis', 'Correlation Analysis', 'Wind Analysis', 'Temperature Analysis', 'Z-Score Analysis'])
+site = site_choices[dataset]
 
-# Load data
-benin_data, sierraleone_data, togo_data = load_and_clean_data()
+# Every view works on the selected date range, sliced out of the site's sorted time index
+start, end = select_date_range(*get_site_date_range(site))
 
-# Preprocess the data
-benin_data_cleaned = preprocess_data_for_zscore(benin_data)
-sierraleone_data_cleaned = preprocess_data_for_zscore(sierraleone_data)
-togo_data_cleaned = preprocess_data_for_zscore(togo_data)
+# Interactive charts are drawn in the browser from small pre-aggregated payloads (bins, downsampled points,
+# matrix cells), so zooming and panning cost no server work. Views without an interactive chart stay static.
+interactive = CHART_BACKENDS[st.sidebar.selectbox('Chart Backend', list(CHART_BACKENDS))] == 'interactive'
 
-# Sidebar for dataset selection
-st.sidebar.title('Dataset and Task Selection')
-dataset = st.sidebar.selectbox('Select Dataset', ['Benin', 'Sierra Leone', 'Togo'])
-task = st.sidebar.selectbox('Select Task', ['Histogram', 'Summary Statistics', 'Time Series Analysis', 'Correlation Analysis', 'Wind Analysis', 'Temperature Analysis'])
+# Figures are served from the render cache when the same view of the same data was rendered before.
+# The views below read their widgets first, then render through cached_view so a hit never touches the data.
 
 # Display summary statistics
 if task == 'Summary Statistics':
-    if dataset == 'Benin':
-        st.title('Benin Data Summary Statistics')
-        display_summary_statistics(benin_data_cleaned)
-    elif dataset == 'Sierra Leone':
-        st.title('Sierra Leone Data Summary Statistics')
-        display_summary_statistics(sierraleone_data_cleaned)
-    else:
-        st.title('Togo Data Summary Statistics')
-        display_summary_statistics(togo_data_cleaned)
+    st.title(f'{dataset} Data Summary Statistics')
+    display_summary_statistics(get_site_zscore_data(site, start, end))
 
 # Display appropriate data and visualizations based on dataset and task choice
 if task == 'Histogram':
-    if dataset == 'Benin':
-        st.title('Benin Data Visualization - Histogram')
-        interactive_histograms(benin_data_cleaned, ['GHI', 'Tamb', 'WS', 'RH', 'BP'])
-    elif dataset == 'Sierra Leone':
-        st.title('Sierra Leone Data Visualization - Histogram')
-        interactive_histograms(sierraleone_data_cleaned, ['GHI', 'Tamb', 'WS', 'RH', 'BP'])
+    st.title(f'{dataset} Data Visualization - Histogram')
+    variable, bins = select_histogram_options(['GHI', 'Tamb', 'WS', 'RH', 'BP'])
+    st.write(f"**Histogram for {variable}**")
+    if interactive:
+        show_chart(histogram_chart(get_site_histograms(site, start, end, [variable])[variable], bins, f"Histogram of {variable}", variable, color='blue'))
     else:
-        st.title('Togo Data Visualization - Histogram')
-        interactive_histograms(togo_data_cleaned, ['GHI', 'Tamb', 'WS', 'RH', 'BP'])
+        cached_view(site_view_key(site, task, [variable, bins, start, end], plot_histogram),
+                    lambda: plot_histogram(get_site_histograms(site, start, end, [variable]), variable, bins))
 
-# Preprocess the data for time series analysis
+# Time series analysis of the rows in the selected date range, or of their hourly rollup
 elif task == 'Time Series Analysis':
-    if dataset == 'Benin':
-        st.title('Benin Data - Time Series Analysis')
-        benin_data_cleaned = preprocess_data(benin_data)
-        
-        # Dropdown to select time series plot type
-        time_series_type = st.sidebar.selectbox(
-            'Select Time Series Analysis Type',
-            ['Over Time', 'By Month', 'By Hour']
-        )
-
-        if time_series_type == 'Over Time':
-            plot_time_series(benin_data_cleaned, 'GHI', 'Benin', 'GHI (W/m^2)')
-        elif time_series_type == 'By Month':
-            plot_by_month(benin_data_cleaned, 'GHI', 'Benin', 'GHI (W/m^2)')
+    st.title(f'{dataset} Data - Time Series Analysis')
+
+    # Dropdown to select time series plot type
+    time_series_type = st.sidebar.selectbox(
+        'Select Time Series Analysis Type',
+        ['Over Time', 'By Month', 'By Hour']
+    )
+
+    # Dropdown to select the variable to plot
+    variable = st.sidebar.selectbox('Select Variable', FLOAT_COLUMNS)
+
+    if time_series_type == 'Over Time':
+        # Dropdown to select how the series is reduced to the plot's width
+        downsampling = st.sidebar.selectbox('Select Downsampling', list(DOWNSAMPLING_METHODS))
+        if interactive:
+            show_chart(time_series_chart(get_site_data(site, start, end), variable, f"{dataset} - {variable} Over Time", column_label(variable), DOWNSAMPLING_METHODS[downsampling]))
         else:
-            plot_by_hour(benin_data_cleaned, 'GHI', 'Benin', 'GHI (W/m^2)')
-
-    elif dataset == 'Sierra Leone':
-        st.title('Sierra Leone Data - Time Series Analysis')
-        sierraleone_data_cleaned = preprocess_data(sierraleone_data)
-        
-        # Dropdown to select time series plot type
-        time_series_type = st.sidebar.selectbox(
-            'Select Time Series Analysis Type',
-            ['Over Time', 'By Month', 'By Hour']
-        )
-
-        if time_series_type == 'Over Time':
-            plot_time_series(sierraleone_data_cleaned, 'GHI', 'Sierra Leone', 'GHI (W/m^2)')
-        elif time_series_type == 'By Month':
-            plot_by_month(sierraleone_data_cleaned, 'GHI', 'Sierra Leone', 'GHI (W/m^2)')
-        else:
-            plot_by_hour(sierraleone_data_cleaned, 'GHI', 'Sierra Leone', 'GHI (W/m^2)')
-
+            cached_view(site_view_key(site, task, [time_series_type, variable, downsampling, dataset, start, end], plot_time_series),
+                        lambda: plot_time_series(get_site_data(site, start, end), variable, dataset, column_label(variable), DOWNSAMPLING_METHODS[downsampling]))
+    elif interactive:
+        grain = 'month' if time_series_type == 'By Month' else 'hour'
+        show_chart(rollup_chart(get_site_rollup(site, start, end), grain, variable, f"{dataset} - {variable} {time_series_type}", column_label(variable)))
+    elif time_series_type == 'By Month':
+        cached_view(site_view_key(site, task, [time_series_type, variable, dataset, start, end], plot_by_month),
+                    lambda: plot_by_month(get_site_rollup(site, start, end), variable, dataset, column_label(variable)))
     else:
-        st.title('Togo Data - Time Series Analysis')
-        togo_data_cleaned = preprocess_data(togo_data)
-        
-        # Dropdown to select time series plot type
-        time_series_type = st.sidebar.selectbox(
-            'Select Time Series Analysis Type',
-            ['Over Time', 'By Month', 'By Hour']
-        )
-
-        if time_series_type == 'Over Time':
-            plot_time_series(togo_data_cleaned, 'GHI', 'Togo', 'GHI (W/m^2)')
-        elif time_series_type == 'By Month':
-            plot_by_month(togo_data_cleaned, 'GHI', 'Togo', 'GHI (W/m^2)')
-        else:
-            plot_by_hour(togo_data_cleaned, 'GHI', 'Togo', 'GHI (W/m^2)')
+        cached_view(site_view_key(site, task, [time_series_type, variable, dataset, start, end], plot_by_hour),
+                    lambda: plot_by_hour(get_site_rollup(site, start, end), variable, dataset, column_label(variable)))
 
 # Display correlation analysis
 elif task == 'Correlation Analysis':
-    if dataset == 'Benin':
-        st.title('Benin - Correlation Analysis')
-        
-        # Dropdown to select which plot to display
-        correlation_plot_type = st.sidebar.selectbox(
-            'Select Correlation Plot Type',
-            ['Correlation Matrix', 'Pair Plot', 'Scatter Matrix']
-        )
-
-        if correlation_plot_type == 'Correlation Matrix':
-            plot_tamb_correlation_matrix(benin_data_cleaned, ['GHI', 'DNI', 'DHI', 'TModA', 'TModB'], 'Benin - Correlation Matrix (Solar Radiation & Temperature)')
-        elif correlation_plot_type == 'Pair Plot':
-            plot_pair_plot(benin_data_cleaned, ['GHI', 'DNI', 'DHI', 'TModA', 'TModB'], 'Benin - Pair Plot (Solar Radiation & Temperature)')
-        elif correlation_plot_type == 'Scatter Matrix':
-            plot_scatter_matrix(benin_data_cleaned, ['GHI', 'DNI', 'DHI', 'TModA', 'TModB'], 'Benin - Scatter Matrix (Solar Radiation & Temperature)')
-
-    elif dataset == 'Sierra Leone':
-        st.title('Sierra Leone - Correlation Analysis')
-        
-        # Dropdown to select which plot to display
-        correlation_plot_type = st.sidebar.selectbox(
-            'Select Correlation Plot Type',
-            ['Correlation Matrix', 'Pair Plot', 'Scatter Matrix']
-        )
-
-        if correlation_plot_type == 'Correlation Matrix':
-            plot_tamb_correlation_matrix(sierraleone_data_cleaned, ['GHI', 'DNI', 'DHI', 'TModA', 'TModB'], 'Sierra Leone - Correlation Matrix (Solar Radiation & Temperature)')
-        elif correlation_plot_type == 'Pair Plot':
-            plot_pair_plot(sierraleone_data_cleaned, ['GHI', 'DNI', 'DHI', 'TModA', 'TModB'], 'Sierra Leone - Pair Plot (Solar Radiation & Temperature)')
-        elif correlation_plot_type == 'Scatter Matrix':
-            plot_scatter_matrix(sierraleone_data_cleaned, ['GHI', 'DNI', 'DHI', 'TModA', 'TModB'], 'Sierra Leone - Scatter Matrix (Solar Radiation & Temperature)')
-
+    st.title(f'{dataset} - Correlation Analysis')
+
+    # Dropdown to select which plot to display
+    correlation_plot_type = st.sidebar.selectbox(
+        'Select Correlation Plot Type',
+        ['Correlation Matrix', 'Pair Plot', 'Scatter Matrix']
+    )
+
+    if correlation_plot_type == 'Correlation Matrix':
+        # Any date range is read from the site's correlation index without scanning the rows
+        if interactive:
+            show_chart(correlation_chart(correlation_matrix(get_site_correlation(site), ['GHI', 'DNI', 'DHI', 'TModA', 'TModB'], start, end), f'{dataset} - Correlation Matrix (Solar Radiation & Temperature)'))
+        else:
+            cached_view(site_view_key(site, task, [correlation_plot_type, dataset, start, end], plot_tamb_correlation_matrix),
+                        lambda: plot_tamb_correlation_matrix(get_site_correlation(site), ['GHI', 'DNI', 'DHI', 'TModA', 'TModB'], f'{dataset} - Correlation Matrix (Solar Radiation & Temperature)', start, end))
     else:
-        st.title('Togo - Correlation Analysis')
-        
-        # Dropdown to select which plot to display
-        correlation_plot_type = st.sidebar.selectbox(
-            'Select Correlation Plot Type',
-            ['Correlation Matrix', 'Pair Plot', 'Scatter Matrix']
-        )
-
-        if correlation_plot_type == 'Correlation Matrix':
-            plot_tamb_correlation_matrix(togo_data_cleaned, ['GHI', 'DNI', 'DHI', 'TModA', 'TModB'], 'Togo - Correlation Matrix (Solar Radiation & Temperature)')
-        elif correlation_plot_type == 'Pair Plot':
-            plot_pair_plot(togo_data_cleaned, ['GHI', 'DNI', 'DHI', 'TModA', 'TModB'], 'Togo - Pair Plot (Solar Radiation & Temperature)')
+        # The pair plots are drawn as binned densities, shaded by count or by the mean of another variable
+        shade_by = st.sidebar.selectbox('Shade Bins By', ['Count', 'Tamb', 'RH', 'WS', 'BP'])
+        show_outliers = st.sidebar.checkbox('Overlay Points in Sparse Bins')
+        color_by = None if shade_by == 'Count' else shade_by
+
+        params = [correlation_plot_type, color_by, show_outliers, dataset, start, end]
+        if correlation_plot_type == 'Pair Plot':
+            cached_view(site_view_key(site, task, params, plot_pair_plot),
+                        lambda: plot_pair_plot(get_site_zscore_data(site, start, end), ['GHI', 'DNI', 'DHI', 'TModA', 'TModB'], f'{dataset} - Pair Plot (Solar Radiation & Temperature)', color_by, show_outliers))
         elif correlation_plot_type == 'Scatter Matrix':
-            plot_scatter_matrix(togo_data_cleaned, ['GHI', 'DNI', 'DHI', 'TModA', 'TModB'], 'Togo - Scatter Matrix (Solar Radiation & Temperature)')
+            cached_view(site_view_key(site, task, params, plot_scatter_matrix),
+                        lambda: plot_scatter_matrix(get_site_zscore_data(site, start, end), ['GHI', 'DNI', 'DHI', 'TModA', 'TModB'], f'{dataset} - Scatter Matrix (Solar Radiation & Temperature)', color_by, show_outliers))
 
 # Display wind analysis
 elif task == 'Wind Analysis':
-    if dataset == 'Benin':
-        st.title('Benin - Wind Analysis')
-        
-        # Dropdown to select wind analysis type
-        wind_analysis_type = st.sidebar.selectbox(
-            'Select Wind Analysis Type',
-            ['Wind Speed Distribution', 'Wind Direction Distribution']
-        )
-
-        if wind_analysis_type == 'Wind Speed Distribution':
-            plot_wind_speed_distribution(benin_data_cleaned, 'Benin')
-        elif wind_analysis_type == 'Wind Direction Distribution':
-            plot_wind_direction_distribution(benin_data_cleaned, 'Benin')
-
-    elif dataset == 'Sierra Leone':
-        st.title('Sierra Leone - Wind Analysis')
-        
-        # Dropdown to select wind analysis type
-        wind_analysis_type = st.sidebar.selectbox(
-            'Select Wind Analysis Type',
-            ['Wind Speed Distribution', 'Wind Direction Distribution']
-        )
-
-        if wind_analysis_type == 'Wind Speed Distribution':
-            plot_wind_speed_distribution(sierraleone_data_cleaned, 'Sierra Leone')
-        elif wind_analysis_type == 'Wind Direction Distribution':
-            plot_wind_direction_distribution(sierraleone_data_cleaned, 'Sierra Leone')
-
-    else:
-        st.title('Togo - Wind Analysis')
-        
-        # Dropdown to select wind analysis type
-        wind_analysis_type = st.sidebar.selectbox(
-            'Select Wind Analysis Type',
-            ['Wind Speed Distribution', 'Wind Direction Distribution']
-        )
-
-        if wind_analysis_type == 'Wind Speed Distribution':
-            plot_wind_speed_distribution(togo_data_cleaned, 'Togo')
-        elif wind_analysis_type == 'Wind Direction Distribution':
-            plot_wind_direction_distribution(togo_data_cleaned, 'Togo')
+    st.title(f'{dataset} - Wind Analysis')
+
+    # Dropdown to select wind analysis type
+    wind_analysis_type = st.sidebar.selectbox(
+        'Select Wind Analysis Type',
+        ['Wind Speed Distribution', 'Wind Direction Distribution', 'Wind Rose', 'Prevailing Wind Direction']
+    )
+
+    # The direction views draw from the site's wind table, counted per direction sector and speed class once per site
+    if interactive and wind_analysis_type == 'Wind Speed Distribution':
+        show_chart(histogram_chart(get_site_histograms(site, start, end, ['WS'])['WS'], 30, f"{dataset} - {wind_analysis_type}", 'Wind Speed (m/s)', color='blue'))
+    elif interactive and wind_analysis_type == 'Wind Direction Distribution':
+        show_chart(wind_direction_chart(get_site_wind(site, start, end), f"{dataset} - {wind_analysis_type}"))
+    elif wind_analysis_type == 'Wind Speed Distribution':
+        cached_view(site_view_key(site, task, [wind_analysis_type, dataset, start, end], plot_wind_speed_distribution),
+                    lambda: plot_wind_speed_distribution(get_site_histograms(site, start, end, ['WS']), dataset))
+    elif wind_analysis_type == 'Wind Direction Distribution':
+        cached_view(site_view_key(site, task, [wind_analysis_type, dataset, start, end], plot_wind_direction_distribution),
+                    lambda: plot_wind_direction_distribution(get_site_wind(site, start, end), dataset))
+    elif wind_analysis_type == 'Wind Rose':
+        cached_view(site_view_key(site, task, [wind_analysis_type, dataset, start, end], plot_wind_rose),
+                    lambda: plot_wind_rose(get_site_wind(site, start, end), dataset))
+    elif wind_analysis_type == 'Prevailing Wind Direction':
+        cached_view(site_view_key(site, task, [wind_analysis_type, dataset, start, end], plot_prevailing_wind_direction),
+                    lambda: plot_prevailing_wind_direction(get_site_wind(site, start, end), dataset))
 
 # Temperature Analysis
 elif task == 'Temperature Analysis':
-    if dataset == 'Benin':
-        st.title('Benin - Temperature Analysis')
-        
-        # Dropdown to select temperature analysis type
-        temp_analysis_type = st.sidebar.selectbox(
-            'Select Temperature Analysis Type',
-            ['Correlation Matrix', 'RH vs Solar Radiation Regression', 'RH vs Temperature Regression']
-        )
-
-        if temp_analysis_type == 'Correlation Matrix':
-            plot_correlation_matrix(benin_data_cleaned, 'Benin')
-        elif temp_analysis_type == 'RH vs Solar Radiation Regression':
-            plot_rh_vs_sr_regression(benin_data_cleaned, 'Benin')
-        elif temp_analysis_type == 'RH vs Temperature Regression':
-            plot_rh_vs_temp_regression(benin_data_cleaned, 'Benin')
-
-    elif dataset == 'Sierra Leone':
-        st.title('Sierra Leone - Temperature Analysis')
-        
-        # Dropdown to select temperature analysis type
-        temp_analysis_type = st.sidebar.selectbox(
-            'Select Temperature Analysis Type',
-            ['Correlation Matrix', 'RH vs Solar Radiation Regression', 'RH vs Temperature Regression']
-        )
-
-        if temp_analysis_type == 'Correlation Matrix':
-            plot_correlation_matrix(sierraleone_data_cleaned, 'Sierra Leone')
-        elif temp_analysis_type == 'RH vs Solar Radiation Regression':
-            plot_rh_vs_sr_regression(sierraleone_data_cleaned, 'Sierra Leone')
-        elif temp_analysis_type == 'RH vs Temperature Regression':
-            plot_rh_vs_temp_regression(sierraleone_data_cleaned, 'Sierra Leone')
-
-    else:
-        st.title('Togo - Temperature Analysis')
-        
-        # Dropdown to select temperature analysis type
-        temp_analysis_type = st.sidebar.selectbox(
-            'Select Temperature Analysis Type',
-            ['Correlation Matrix', 'RH vs Solar Radiation Regression', 'RH vs Temperature Regression']
-        )
-
-        if temp_analysis_type == 'Correlation Matrix':
-            plot_correlation_matrix(togo_data_cleaned, 'Togo')
-        elif temp_analysis_type == 'RH vs Solar Radiation Regression':
-            plot_rh_vs_sr_regression(togo_data_cleaned, 'Togo')
-        elif temp_analysis_type == 'RH vs Temperature Regression':
-            plot_rh_vs_temp_regression(togo_data_cleaned, 'Togo')
-
+    st.title(f'{dataset} - Temperature Analysis')
+
+    # Dropdown to select temperature analysis type
+    temp_analysis_type = st.sidebar.selectbox(
+        'Select Temperature Analysis Type',
+        ['Correlation Matrix', 'RH vs Solar Radiation Regression', 'RH vs Temperature Regression']
+    )
+
+    params = [temp_analysis_type, dataset, start, end]
+    if temp_analysis_type == 'Correlation Matrix' and interactive:
+        show_chart(correlation_chart(correlation_matrix(get_site_correlation(site), ['RH', 'Tamb', 'GHI'], start, end),
+                                     f'Correlation Matrix: RH, Temperature (Tamb), and Solar Radiation (GHI) ({dataset})'))
+    elif temp_analysis_type == 'Correlation Matrix':
+        cached_view(site_view_key(site, task, params, plot_correlation_matrix),
+                    lambda: plot_correlation_matrix(get_site_correlation(site), dataset, start, end))
+    elif temp_analysis_type == 'RH vs Solar Radiation Regression':
+        cached_view(site_view_key(site, task, params, plot_rh_vs_sr_regression),
+                    lambda: plot_rh_vs_sr_regression(get_site_zscore_data(site, start, end), *get_site_regression(site, 'GHI', ['RH'], start, end), dataset))
+    elif temp_analysis_type == 'RH vs Temperature Regression':
+        cached_view(site_view_key(site, task, params, plot_rh_vs_temp_regression),
+                    lambda: plot_rh_vs_temp_regression(get_site_zscore_data(site, start, end), *get_site_regression(site, 'Tamb', ['RH'], start, end), dataset))
+
+# Z-score outliers of the variables of interest
+elif task == 'Z-Score Analysis':
+    st.title(f'{dataset} - Z-Score Analysis')
+
+    method = st.sidebar.selectbox('Select Z-Score Method', list(ZSCORE_METHODS))
+    threshold = st.sidebar.slider('Z-Score Threshold', min_value=2.0, max_value=5.0, value=3.0, step=0.5)
+
+    # Rolling scores compare each row with its time window, optionally with the same hour on the surrounding days
+    window, by_hour = '1D', False
+    if ZSCORE_METHODS[method] == 'rolling':
+        window = st.sidebar.selectbox('Rolling Window', ROLLING_WINDOWS, index=ROLLING_WINDOWS.index('1D'))
+        by_hour = st.sidebar.checkbox('Condition on Hour of Day')
+
+    display_zscore_outliers(get_site_zscore_data(site, start, end), ['Tamb', 'GHI', 'WS', 'RH', 'BP'], dataset, ZSCORE_METHODS[method], threshold, window, by_hour)
+
+# Render cache counters of this server process, after this run's view
+render_stats = get_render_cache().stats()
+st.sidebar.caption(f"Render cache: {render_stats['hits'] + render_stats['disk_hits']} hits, {render_stats['misses']} misses, "
+                   f"{render_stats['entries']} figures ({render_stats['bytes'] / 1024 / 1024:.1f} MB)")
+
+# Breakdown of this rerun's stages, tracing memory slows allocation-heavy stages down
+if st.sidebar.checkbox('Show Performance Panel', key='show_performance'):
+    st.sidebar.checkbox('Trace Memory', key='trace_memory')
+    if 'performance_collection' in st.session_state:
+        display_performance_panel(stop_collecting(st.session_state.pop('performance_collection')), time.perf_counter() - rerun_started)
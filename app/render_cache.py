@@ -0,0 +1,175 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import matplotlib.pyplot as plt
+import streamlit as st
+
+from scripts.instrumentation import span
+
+# Limits of the process-wide render cache, configurable through the environment.
+# Rendered figures are also kept on disk across restarts when a directory is set.
+RENDER_CACHE_MAX_MB = float(os.environ.get('DASHBOARD_RENDER_CACHE_MB', 256))
+RENDER_CACHE_DIR = os.environ.get('DASHBOARD_RENDER_CACHE_DIR') or None
+
+# Options figures are saved with, the same as st.pyplot uses so cached and rendered figures look alike
+SAVEFIG_OPTIONS = {'format': 'png', 'bbox_inches': 'tight', 'dpi': 200}
+
+# Figures shown by the current thread while a render is recorded
+_recording = threading.local()
+
+# Function to build a cache key from its parts, e.g. the site, task, parameters, data fingerprint and code version
+def render_key(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+# Function to render a matplotlib figure to PNG bytes
+def figure_png(figure):
+    image = io.BytesIO()
+    figure.savefig(image, **SAVEFIG_OPTIONS)
+    return image.getvalue()
+
+# Function to show a figure in the dashboard as a PNG and close it.
+# The PNG is also handed to the render being recorded, if any, so it can be cached.
+def show_figure(figure):
+    png = figure_png(figure)
+    plt.close(figure)
+    if getattr(_recording, 'images', None) is not None:
+        _recording.images.append(png)
+    st.image(png, width='stretch')
+
+# Context manager collecting the PNGs of the figures shown in the current thread
+@contextmanager
+def recording():
+    previous = getattr(_recording, 'images', None)
+    _recording.images = []
+    try:
+        yield _recording.images
+    finally:
+        _recording.images = previous
+
+# Process-wide cache of rendered figures as PNG bytes, shared by all sessions and reruns.
+# The least recently used figures are evicted once the total size exceeds max_bytes. With a cache
+# directory, figures are also written to disk and read back after a restart, the directory is kept
+# under the same size limit.
+class RenderCache:
+    def __init__(self, max_bytes, cache_dir=None):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, key):
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return png
+
+        png = self._read_disk(key)
+        with self._lock:
+            if png is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, png)
+        return png
+
+    def put(self, key, png):
+        with self._lock:
+            self._store(key, png)
+        self._write_disk(key, png)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'hits': self.hits, 'disk_hits': self.disk_hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+    def _store(self, key, png):
+        if key in self._entries:
+            self._bytes -= len(self._entries.pop(key))
+        self._entries[key] = png
+        self._bytes += len(png)
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def _read_disk(self, key):
+        if self.cache_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                png = f.read()
+            # The modification time orders the files for eviction
+            os.utime(path)
+            return png
+        except OSError:
+            return None
+
+    def _write_disk(self, key, png):
+        if self.cache_dir is None:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(png)
+        os.replace(tmp_path, path)
+
+        # Remove the least recently used files beyond the size limit
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.png'):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                files.append((stat.st_mtime_ns, stat.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            total -= size
+
+# Function to get the single render cache of this server process
+@st.cache_resource
+def get_render_cache():
+    return RenderCache(max_bytes=RENDER_CACHE_MAX_MB * 1024 * 1024, cache_dir=RENDER_CACHE_DIR)
+
+# Function to show a view from the render cache, or render it and cache it.
+# render draws the view through show_figure. Views that show exactly one figure are cached under key,
+# repeat views are then served as an image without touching the data or matplotlib.
+def cached_view(key, render):
+    cache = get_render_cache()
+    with span('render_cache.cached_view') as current:
+        png = cache.get(key)
+        current.set(hit=png is not None)
+        if png is not None:
+            st.image(png, width='stretch')
+            return
+
+        with recording() as images:
+            render()
+        if len(images) == 1:
+            cache.put(key, images[0])
@@ -1,17 +1,29 @@
-import pandas as pd
 import streamlit as st
 import numpy as np
 import matplotlib.pyplot as plt
-from sklearn.linear_model import LinearRegression
 import seaborn as sns
+import os
+import sys
+
+# Add the parent directory to the path for imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from scripts.schema import add_time_parts, ensure_numeric
+from scripts.rollups import aggregate_variable
+from scripts.downsampling import downsample, figure_width_px, point_budget
+from scripts.density import bin_edges, bin_index, draw_density, plot_density_pair_grid
+from scripts.distributions import BIN_CHOICES, draw_distribution
+from scripts.outliers import find_outliers, flagged_rows, outlier_summary
+from scripts.regression import regression_line
+from scripts.correlation import correlation_matrix
+from scripts.wind import direction_stats, draw_wind_rose, rose_frequencies, sector_centers
+from scripts.instrumentation import instrumented, spans_frame
+from render_cache import show_figure
 
 # Function to preprocess data for Z-score analysis
+@instrumented
 def preprocess_data_for_zscore(data):
-    data['Tamb'] = pd.to_numeric(data['Tamb'], errors='coerce')
-    data['GHI'] = pd.to_numeric(data['GHI'], errors='coerce')
-    data['WS'] = pd.to_numeric(data['WS'], errors='coerce')
-    data['RH'] = pd.to_numeric(data['RH'], errors='coerce')
-    data['BP'] = pd.to_numeric(data['BP'], errors='coerce')
+    # The loaded data is already numeric, only other columns are converted
+    ensure_numeric(data, ['Tamb', 'GHI', 'WS', 'RH', 'BP'])
     
     # Drop rows with missing values
     data = data.dropna(subset=['Tamb', 'GHI', 'WS', 'RH', 'BP'])
@@ -19,61 +31,71 @@ def preprocess_data_for_zscore(data):
     return data
 
 # Function to preprocess data for time series analysis
+# The timestamp is only parsed when it is not parsed yet, and Month and Hour are added as small integers once
+@instrumented
 def preprocess_data(data):
-    data['Timestamp'] = pd.to_datetime(data['Timestamp'])
-    data['Month'] = data['Timestamp'].dt.month
-    data['Hour'] = data['Timestamp'].dt.hour
-    return data
+    return add_time_parts(data)
 
-# Function to plot interactive histograms using Streamlit widgets
-def interactive_histograms(data, variables):
+# Function to select the variable and number of bins of the histogram with Streamlit widgets.
+# Returns (variable, bins). The widgets are read before the histogram is drawn, so a cached histogram can be shown instead.
+def select_histogram_options(variables):
     st.sidebar.subheader('Select Variable for Histogram')
     selected_var = st.sidebar.selectbox('Choose Variable', variables)
+    bins = st.sidebar.select_slider('Number of Bins', BIN_CHOICES, value=30)
+    return selected_var, bins
 
-    st.write(f"**Histogram for {selected_var}**")
+# Function to plot the histogram of a variable.
+# The histograms are drawn from the site's base histograms, so changing the bin count does not rescan the data
+@instrumented
+def plot_histogram(histograms, selected_var, bins):
     plt.figure(figsize=(10, 6))
-    sns.histplot(data[selected_var], kde=True, color='blue', bins=30)
+    draw_distribution(plt.gca(), histograms[selected_var], bins=bins, color='blue')
     plt.title(f"Histogram of {selected_var}")
     plt.xlabel(selected_var)
     plt.ylabel("Frequency")
-    st.pyplot(plt)
-    plt.clf()  # Clear the figure to prevent overlap
+    show_figure(plt.gcf())
 
-# Function to plot time series analysis
-def plot_time_series(data, column, title_prefix, ylabel):
-    plt.figure(figsize=(12, 6))
-    sns.lineplot(data=data, x='Timestamp', y=column)
+# Function to plot time series analysis.
+# The series is downsampled to what the figure's pixel width can show, and drawn as a plain line
+# since the downsampled points are unique in time and need no confidence interval.
+@instrumented
+def plot_time_series(data, column, title_prefix, ylabel, method='minmax'):
+    figure = plt.figure(figsize=(12, 6))
+    x, y = downsample(data['Timestamp'].to_numpy(), data[column].to_numpy(), point_budget(figure_width_px(figure)), method)
+    plt.plot(x, y, linewidth=1)
     plt.title(f"{title_prefix} - {column} Over Time")
     plt.xlabel('Time')
     plt.ylabel(ylabel)
     plt.xticks(rotation=45)
     plt.tight_layout()
-    st.pyplot(plt)
-    plt.clf()  # Clear the figure to prevent overlap
+    show_figure(plt.gcf())
 
-def plot_by_month(data, column, title_prefix, ylabel):
-    monthly_data = data.groupby('Month')[column].mean().reset_index()
+# Function to plot the monthly means of a variable from the site's aggregate cube
+@instrumented
+def plot_by_month(rollup, column, title_prefix, ylabel):
+    monthly_data = aggregate_variable(rollup, 'month', column)
     plt.figure(figsize=(8, 6))
     sns.barplot(data=monthly_data, x='Month', y=column, palette='viridis')
     plt.title(f"{title_prefix} - {column} by Month")
     plt.xlabel('Month')
     plt.ylabel(ylabel)
     plt.tight_layout()
-    st.pyplot(plt)
-    plt.clf()
+    show_figure(plt.gcf())
 
-def plot_by_hour(data, column, title_prefix, ylabel):
-    hourly_data = data.groupby('Hour')[column].mean().reset_index()
+# Function to plot the hourly means of a variable from the site's aggregate cube
+@instrumented
+def plot_by_hour(rollup, column, title_prefix, ylabel):
+    hourly_data = aggregate_variable(rollup, 'hour', column)
     plt.figure(figsize=(8, 6))
     sns.lineplot(data=hourly_data, x='Hour', y=column, marker='o')
     plt.title(f"{title_prefix} - {column} by Hour")
     plt.xlabel('Hour')
     plt.ylabel(ylabel)
     plt.tight_layout()
-    st.pyplot(plt)
-    plt.clf()
+    show_figure(plt.gcf())
 
 # Function to display summary statistics (updated)
+@instrumented
 def display_summary_statistics(data):
     st.write("**Summary Statistics**")
     
@@ -85,110 +107,171 @@ def display_summary_statistics(data):
     
     st.write(summary)
 
-# Function to plot correlation matrix
-def plot_tamb_correlation_matrix(data, columns, title):
-    correlation = data[columns].corr()
+# Function to select the date range of the views in the sidebar, between the first and last date of a site's data.
+# Returns (start, end), both inclusive. While only the first date is picked the range runs to the last date.
+def select_date_range(first, last):
+    if first is None:
+        return None, None
+    selected = st.sidebar.date_input('Date Range', value=(first, last), min_value=first, max_value=last)
+    if len(selected) == 2:
+        return selected
+    return selected[0], last
+
+# Function to plot correlation matrix over a date range, read from the site's correlation index
+@instrumented
+def plot_tamb_correlation_matrix(index, columns, title, start=None, end=None):
+    correlation = correlation_matrix(index, columns, start, end)
     plt.figure(figsize=(10, 8))
     sns.heatmap(correlation, annot=True, cmap='coolwarm', fmt='.2f', cbar=True)
     plt.title(title)
     plt.tight_layout()
-    st.pyplot(plt)
-    plt.clf()
+    show_figure(plt.gcf())
 
-# Function to plot pair plot
-def plot_pair_plot(data, columns, title):
-    sns.pairplot(data[columns])
-    plt.suptitle(title, y=1.02)
-    plt.tight_layout()
-    st.pyplot(plt)
-    plt.clf()
+# Function to plot pair plot.
+# The panels are binned densities shaded by count, or by the mean of color_by, so the rendering cost
+# does not grow with the number of rows. Rows in sparse bins can be overlaid as points.
+@instrumented
+def plot_pair_plot(data, columns, title, color_by=None, show_outliers=False):
+    figure = plot_density_pair_grid(data, columns, color_by=color_by, show_outliers=show_outliers)
+    figure.suptitle(title, y=1.02)
+    show_figure(figure)
 
-# Function to plot scatter matrix
-def plot_scatter_matrix(data, columns, title):
-    sns.pairplot(data[columns], kind="scatter")
-    plt.suptitle(title, y=1.02)
-    plt.tight_layout()
-    st.pyplot(plt)
-    plt.clf()
+# Function to plot scatter matrix, as binned densities like the pair plot
+@instrumented
+def plot_scatter_matrix(data, columns, title, color_by=None, show_outliers=False):
+    figure = plot_density_pair_grid(data, columns, color_by=color_by, show_outliers=show_outliers)
+    figure.suptitle(title, y=1.02)
+    show_figure(figure)
 
 # Function to plot wind speed distribution
-def plot_wind_speed_distribution(data, title_prefix):
+@instrumented
+def plot_wind_speed_distribution(histograms, title_prefix):
     plt.figure(figsize=(10, 6))
-    sns.histplot(data['WS'], kde=True, color='blue', bins=30)
+    draw_distribution(plt.gca(), histograms['WS'], bins=30, color='blue')
     plt.title(f"{title_prefix} - Wind Speed Distribution")
     plt.xlabel('Wind Speed (m/s)')
     plt.ylabel('Frequency')
     plt.tight_layout()
-    st.pyplot(plt)
-    plt.clf()
+    show_figure(plt.gcf())
+
+# Function to plot the wind direction distribution from the site's wind table.
+# Direction is circular, so the rows are counted per compass sector and summarized by their vector mean
+# rather than a linear KDE, which would split the winds around north between both ends of the axis.
+@instrumented
+def plot_wind_direction_distribution(table, title_prefix):
+    frequencies = rose_frequencies(table).sum(axis=1)
+    centers = sector_centers(len(frequencies))
+    stats = direction_stats(table)
 
-# Function to plot wind direction distribution
-def plot_wind_direction_distribution(data, title_prefix):
     plt.figure(figsize=(10, 6))
-    sns.histplot(data['WD'], kde=True, color='green', bins=30)
+    plt.bar(centers, frequencies, width=360 / len(frequencies) * 0.9, color='green', alpha=0.6)
+    plt.axvline(stats['mean_direction'], color='black', linestyle='--',
+                label=f"Vector mean {stats['mean_direction']:.0f}° (resultant length {stats['resultant_length']:.2f}, circular std {stats['circular_std']:.0f}°)")
+    plt.xticks(np.arange(0, 360, 45), ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW'])
     plt.title(f"{title_prefix} - Wind Direction Distribution")
     plt.xlabel('Wind Direction (degrees)')
-    plt.ylabel('Frequency')
+    plt.ylabel('Share of Rows (%)')
+    plt.legend(loc='upper right')
     plt.tight_layout()
-    st.pyplot(plt)
-    plt.clf()
+    show_figure(plt.gcf())
 
-# Function to plot the temperature correlation matrix
-def plot_correlation_matrix(data, data_name):
-    # Calculate the correlation matrix
-    correlation_matrix = data[['RH', 'Tamb', 'GHI']].corr()
+# Function to plot the wind rose of the site's wind table, by direction sector and speed class
+@instrumented
+def plot_wind_rose(table, title_prefix):
+    figure = plt.figure(figsize=(8, 8))
+    draw_wind_rose(figure.add_subplot(projection='polar'), table)
+    plt.title(f"{title_prefix} - Wind Rose")
+    show_figure(figure)
 
-    # Plot the correlation matrix using a heatmap
-    plt.figure(figsize=(8, 6))
-    sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', fmt='.2f', linewidths=0.5)
-    plt.title(f'Correlation Matrix: RH, Temperature (Tamb), and Solar Radiation (GHI) ({data_name})')
-    plt.tight_layout()
-    st.pyplot(plt)
-    plt.clf()
+# Function to plot the prevailing wind direction by hour of day and by month, with how steady it is.
+# The directions come from the grouped sums of the direction unit vectors in the site's wind table.
+@instrumented
+def plot_prevailing_wind_direction(table, title_prefix):
+    figure, axes = plt.subplots(1, 2, figsize=(14, 5), sharey=True)
+    for ax, grain in zip(axes, ['hour', 'month']):
+        stats = direction_stats(table, grain)
+        points = ax.scatter(stats.index, stats['mean_direction'], c=stats['resultant_length'], cmap='viridis', vmin=0, vmax=1, s=60)
+        ax.set_title(f"Prevailing Direction by {grain.capitalize()}")
+        ax.set_xlabel(grain.capitalize())
+        ax.set_xticks(stats.index)
+    axes[0].set_ylim(0, 360)
+    axes[0].set_yticks(np.arange(0, 361, 45), ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW', 'N'])
+    axes[0].set_ylabel('Vector-Mean Wind Direction')
+    figure.colorbar(points, ax=axes, label='Resultant Length (steadiness)')
+    figure.suptitle(f"{title_prefix} - Prevailing Wind Direction")
+    show_figure(figure)
 
-# Function to plot the rh vs sr regression
-def plot_rh_vs_sr_regression(data, data_name):
-    # Prepare the data
-    X_sr = data[['RH']]  # Independent variable (Relative Humidity)
-    y_sr = data['GHI']  # Dependent variable (Solar Radiation - GHI)
+# Function to display the Z-score outliers of several variables.
+# The Z-scores of all variables are computed in one pass, only the counts and up to max_rows flagged rows are shown.
+# Rolling scores use the given time window, restricted to the same hour of day with by_hour.
+@instrumented
+def display_zscore_outliers(data, variables, title_prefix, method='population', threshold=3, window='1D', by_hour=False, max_rows=1000):
+    result = find_outliers(data, variables, threshold, method, window=window, by_hour=by_hour)
 
-    # Create a linear regression model
-    model_sr = LinearRegression()
-    model_sr.fit(X_sr, y_sr)
+    st.write("**Outliers per Variable**")
+    st.write(outlier_summary(result))
 
-    # Plot the regression line
-    plt.figure(figsize=(8, 6))
-    sns.scatterplot(data=data, x='RH', y='GHI', color='g', label='Data points')
-    plt.plot(data['RH'], model_sr.predict(X_sr), color='r', label='Regression line')
-    plt.title(f'Linear Regression: RH vs. Solar Radiation (GHI) ({data_name})')
-    plt.xlabel('Relative Humidity (%)')
-    plt.ylabel('Solar Radiation (W/m²)')
-    plt.legend(loc='upper right')
+    plt.figure(figsize=(10, 4))
+    plt.bar(result.counts.index, result.counts.to_numpy(), color='tab:red')
+    plt.title(f"{title_prefix} - Rows with |Z| > {threshold:g}")
+    plt.ylabel('Outliers')
     plt.tight_layout()
-    st.pyplot(plt)
-    plt.clf()
+    show_figure(plt.gcf())
 
-# Function to plot the rh vs temp regression
-def plot_rh_vs_temp_regression(data, data_name):
-    # Prepare the data
-    X = data[['RH']]  # Independent variable (Relative Humidity)
-    y = data['Tamb']  # Dependent variable (Temperature - Tamb)
+    st.write(f"**Flagged Rows** ({len(result.rows)} rows flagged in any variable, first {min(max_rows, len(result.rows))} shown)")
+    st.dataframe(flagged_rows(data, result, max_rows))
 
-    # Create a linear regression model
-    model = LinearRegression()
-    model.fit(X, y)
+# Function to plot the temperature correlation matrix over a date range
+@instrumented
+def plot_correlation_matrix(index, data_name, start=None, end=None):
+    # Read the correlation matrix of the date range from the site's correlation index
+    correlation = correlation_matrix(index, ['RH', 'Tamb', 'GHI'], start, end)
 
-    # Plot the regression line
+    # Plot the correlation matrix using a heatmap
     plt.figure(figsize=(8, 6))
-    sns.scatterplot(data=data, x='RH', y='Tamb', color='b', label='Data points')
-    plt.plot(data['RH'], model.predict(X), color='r', label='Regression line')
-    plt.title(f'Linear Regression: RH vs. Temperature (Tamb) ({data_name})')
-    plt.xlabel('Relative Humidity (%)')
-    plt.ylabel('Temperature (°C)')
-    plt.legend(loc='upper right')
+    sns.heatmap(correlation, annot=True, cmap='coolwarm', fmt='.2f', linewidths=0.5)
+    plt.title(f'Correlation Matrix: RH, Temperature (Tamb), and Solar Radiation (GHI) ({data_name})')
     plt.tight_layout()
-    st.pyplot(plt)
-    plt.clf()
+    show_figure(plt.gcf())
+
+# Function to plot a univariate regression over the binned density of its data.
+# The fit comes from the site's sufficient statistics and the line is drawn from its two endpoints.
+@instrumented
+def plot_regression(data, fit, stats, title, xlabel, ylabel, cmap):
+    predictor, target = fit['predictors'][0], fit['target']
+    x = data[predictor].to_numpy(dtype='float64')
+    y = data[target].to_numpy(dtype='float64')
+    x_edges, y_edges = bin_edges(x), bin_edges(y)
 
+    figure, ax = plt.subplots(figsize=(8, 6))
+    image = draw_density(ax, x, y, x_edges, y_edges, bin_index(x, x_edges), bin_index(y, y_edges), cmap=cmap)
+    figure.colorbar(image, ax=ax, label='Data points')
+    line_x, line_y = regression_line(fit, stats)
+    ax.plot(line_x, line_y, color='r', label=f"Regression line (R² = {fit['r2']:.3f})")
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.legend(loc='upper right')
+    figure.tight_layout()
+    show_figure(figure)
 
+# Function to plot the rh vs sr regression
+@instrumented
+def plot_rh_vs_sr_regression(data, fit, stats, data_name):
+    plot_regression(data, fit, stats, f'Linear Regression: RH vs. Solar Radiation (GHI) ({data_name})',
+                    'Relative Humidity (%)', 'Solar Radiation (W/m²)', 'Greens')
+
+# Function to plot the rh vs temp regression
+@instrumented
+def plot_rh_vs_temp_regression(data, fit, stats, data_name):
+    plot_regression(data, fit, stats, f'Linear Regression: RH vs. Temperature (Tamb) ({data_name})',
+                    'Relative Humidity (%)', 'Temperature (°C)', 'Blues')
 
+# Function to display the stages of the last rerun in a sidebar panel: their wall and CPU time, peak memory and rows.
+# Nested stages are indented under the stage that called them, so the top-level ones add up to the traced time.
+def display_performance_panel(spans, seconds):
+    with st.sidebar.expander('Performance', expanded=True):
+        traced = sum(record['wall_s'] for record in spans if record['depth'] == 0)
+        st.caption(f"Last rerun: {seconds * 1000:.0f} ms, {traced * 1000:.0f} ms in {len(spans)} traced stages")
+        if spans:
+            st.dataframe(spans_frame(spans).round(2), hide_index=True)
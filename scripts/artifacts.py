@@ -0,0 +1,205 @@
+import dis
+import hashlib
+import inspect
+import json
+import os
+import types
+
+import numpy as np
+
+try:
+    from scripts.data_cache import file_fingerprint
+    from scripts.load_data import site_rules_version, site_source_path
+    from scripts.results import RESULTS_DIR
+except ImportError:
+    from data_cache import file_fingerprint
+    from load_data import site_rules_version, site_source_path
+    from results import RESULTS_DIR
+
+# Manifest recording the inputs each result file was generated from
+MANIFEST_FILE = 'manifest.json'
+
+# Directories of the project's own modules, the scripts and the dashboard, only their functions and classes are followed when hashing code
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIRS = [SCRIPTS_DIR, os.path.join(os.path.dirname(SCRIPTS_DIR), 'app')]
+
+# Code hashes already computed, per function
+_code_hashes = {}
+
+# Function to tell whether a function or class is defined in one of the project's modules
+def is_project_object(value):
+    try:
+        path = inspect.getfile(value)
+    except TypeError:
+        # Built-in functions and classes have no file
+        return False
+    # Frozen standard modules have a pseudo path like '<frozen os>'
+    return not path.startswith('<') and os.path.dirname(os.path.abspath(path)) in PROJECT_DIRS
+
+# Function to tell whether a global is a constant the code depends on: an UPPER_CASE module global holding data,
+# e.g. a bin count, a threshold or a rule table
+def is_constant(name, value):
+    return name.isupper() and not callable(value) and not isinstance(value, types.ModuleType)
+
+# Function to represent a constant the same way in every process. Sets are sorted, arrays are written out in full
+# and objects without a repr of their own are represented by their type, their default repr holds their address.
+def constant_repr(value):
+    if isinstance(value, np.ndarray):
+        return f"ndarray({value.dtype}, {value.tolist()!r})"
+    if isinstance(value, (set, frozenset)):
+        return '{' + ', '.join(sorted(constant_repr(item) for item in value)) + '}'
+    if isinstance(value, dict):
+        return '{' + ', '.join(f"{constant_repr(key)}: {constant_repr(item)}" for key, item in value.items()) + '}'
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}(" + ', '.join(constant_repr(item) for item in value) + ')'
+    if callable(value):
+        return f"<{getattr(value, '__module__', None)}.{getattr(value, '__qualname__', type(value).__qualname__)}>"
+    if type(value).__repr__ is object.__repr__:
+        return f"<{type(value).__module__}.{type(value).__qualname__}>"
+    return repr(value)
+
+# Function to list what a function refers to, by name or as an attribute of a module (e.g. distributions.BASE_BINS),
+# including in nested code like comprehensions: the project functions and classes, and the constants as
+# (qualified name, value) pairs. Default argument values count as constants, e.g. bins=BASE_BINS.
+# Decorated functions, e.g. instrumented ones, are followed into the function they wrap.
+def referenced_objects(function):
+    function = inspect.unwrap(function)
+    references = {}
+    constants = []
+    defaults = list(function.__defaults__ or ()) + list((function.__kwdefaults__ or {}).values())
+    if defaults:
+        constants.append((f"{function.__module__}.{function.__qualname__} defaults", tuple(defaults)))
+    for value in defaults:
+        if isinstance(value, (types.FunctionType, type)):
+            references[(value.__module__, value.__qualname__)] = value
+    codes = [function.__code__]
+    while codes:
+        code = codes.pop()
+        module = None
+        for instruction in dis.get_instructions(code):
+            if instruction.opname == 'LOAD_GLOBAL' and instruction.argval in function.__globals__:
+                owner, name = function.__module__, instruction.argval
+                value = function.__globals__[name]
+            elif instruction.opname in ('LOAD_ATTR', 'LOAD_METHOD') and module is not None and hasattr(module, instruction.argval):
+                owner, name = module.__name__, instruction.argval
+                value = getattr(module, name)
+            else:
+                module = None
+                continue
+            module = value if isinstance(value, types.ModuleType) else None
+            references[(owner, name)] = value
+        codes.extend(const for const in code.co_consts if isinstance(const, types.CodeType))
+
+    objects = []
+    for (owner, name), value in sorted(references.items(), key=lambda item: item[0]):
+        if isinstance(value, (types.FunctionType, type)) and is_project_object(value):
+            objects.append(value)
+        elif is_constant(name, value):
+            constants.append((f"{owner}.{name}", value))
+    return objects, constants
+
+# Function to get the source of a function or class. Classes made by a factory, like namedtuples, have no source
+# of their own and are represented by their fields.
+def object_source(value):
+    try:
+        return inspect.getsource(value)
+    except (OSError, TypeError):
+        return repr(getattr(value, '_fields', None))
+
+# Function to hash the source code of a function together with the project functions and classes it uses and the
+# constants they read, so a change to a shared helper or a setting like a bin count also marks the figures drawn
+# with it as stale
+def code_hash(function):
+    key = (function.__module__, function.__qualname__)
+    if key in _code_hashes:
+        return _code_hashes[key]
+
+    digest = hashlib.sha256()
+    seen = set()
+    pending = [function]
+    while pending:
+        current = pending.pop()
+        current_key = (current.__module__, current.__qualname__)
+        if current_key in seen:
+            continue
+        seen.add(current_key)
+        digest.update(f"{current.__module__}.{current.__qualname__}\n".encode())
+        digest.update(object_source(current).encode())
+
+        # The methods of a class are followed like functions
+        functions = [method for method in vars(current).values() if isinstance(method, types.FunctionType)
+                     and is_project_object(method)] if isinstance(current, type) else [current]
+        for code_function in functions:
+            objects, constants = referenced_objects(code_function)
+            pending.extend(objects)
+            for name, value in constants:
+                if name not in seen:
+                    seen.add(name)
+                    digest.update(f"{name} = {constant_repr(value)}\n".encode())
+
+    _code_hashes[key] = digest.hexdigest()[:16]
+    return _code_hashes[key]
+
+# Function to fingerprint the data a site's results are made from: the source file's content and the cleaning version.
+# Returns None when the source file has not been downloaded yet. With persist=False nothing is written.
+def data_fingerprint(site, persist=True):
+    path = site_source_path(site)
+    if not os.path.exists(path):
+        return None
+    return f"{file_fingerprint(path, persist=persist)['sha256'][:16]}-{site_rules_version(site)}"
+
+# Function to describe the inputs of a job, everything that changes its output when it changes
+def job_inputs(job, data_fingerprints):
+    return {
+        'data': data_fingerprints[job.site],
+        'prepare': code_hash(job.prepare) if job.prepare is not None else None,
+        'plot': code_hash(job.plot),
+        'params': json.dumps(job.args, default=str),
+    }
+
+# Function to read the manifest of a results directory
+def read_manifest(results_dir=RESULTS_DIR):
+    try:
+        with open(os.path.join(results_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+# Function to write the manifest of a results directory atomically
+def write_manifest(manifest, results_dir=RESULTS_DIR):
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, MANIFEST_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+# Function to tell why a job's outputs are stale, or None when they are up to date.
+# The manifest is keyed by the job's first output, relative to the results directory.
+def stale_reason(job, inputs, manifest, results_dir=RESULTS_DIR):
+    if inputs['data'] is None:
+        return 'source not downloaded'
+
+    entry = manifest.get(job.outputs[0])
+    if entry is None:
+        return 'new'
+    changed = [name for name in ['data', 'prepare', 'plot', 'params'] if entry.get(name) != inputs[name]]
+    if changed:
+        return 'changed ' + ', '.join(changed)
+    if not all(os.path.exists(os.path.join(results_dir, output)) for output in job.outputs):
+        return 'missing output'
+    return None
+
+# Function to find the stale jobs.
+# Returns (job, inputs, reason) for every job whose outputs need to be generated, all jobs when force is set.
+# With persist=False the source fingerprints are computed without being remembered, e.g. for a dry run.
+def stale_jobs(jobs, manifest, force=False, results_dir=RESULTS_DIR, persist=True):
+    data_fingerprints = {site: data_fingerprint(site, persist) for site in {job.site for job in jobs}}
+    stale = []
+    for job in jobs:
+        inputs = job_inputs(job, data_fingerprints)
+        reason = 'forced' if force else stale_reason(job, inputs, manifest, results_dir)
+        if reason is not None:
+            stale.append((job, inputs, reason))
+    return stale
@@ -0,0 +1,319 @@
+import argparse
+import gc
+import inspect
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+
+# Render without a display, plots are rendered to PNG bytes like the dashboard does
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+import streamlit.logger
+
+# The dashboard modules import each other by name and import scripts as a package
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT_DIR)
+sys.path.append(os.path.join(ROOT_DIR, 'app'))
+
+from data_cache import CACHE_DIR
+from load_data import load_and_clean_data, load_site_data
+from results import results_path
+from site_registry import get_site, list_sites
+from streaming import DEFAULT_CHUNKSIZE
+from synthetic_data import write_synthetic_sites
+import bubble_chart
+import histogram
+import temperature_analysis
+import time_series_analysis
+import wind_analysis
+import zscore_analysis
+import utils
+from data_layer import REGRESSION_MODELS, prepare_site_data
+
+# Groups of benchmarks: loading and cleaning, the preprocess_* functions and the dashboard's plot functions
+BENCHMARK_GROUPS = ['load', 'preprocess', 'plot']
+
+# Rows per site of the scales the suite is meant to run at, the default run only uses the first
+BENCHMARK_SCALES = [100_000, 1_000_000, 10_000_000, 50_000_000]
+
+# Timed runs of each benchmark, the memory is measured in one extra run
+DEFAULT_REPEAT = 3
+
+# A benchmark is reported as a regression when its median time grows by more than this factor,
+# benchmarks faster than MIN_COMPARED_SECONDS are too noisy to compare
+REGRESSION_THRESHOLD = 1.2
+MIN_COMPARED_SECONDS = 0.05
+
+# Modules whose preprocess_* functions are benchmarked
+PREPROCESS_MODULES = [bubble_chart, histogram, temperature_analysis, time_series_analysis, wind_analysis, zscore_analysis, utils]
+
+# One benchmark: its group and name, setup() returning the arguments of a run (not timed), and run(*arguments)
+Benchmark = namedtuple('Benchmark', ['group', 'name', 'setup', 'run'])
+
+# Function to remove the cleaned data cache, so the next load parses and cleans the CSVs again
+def clear_cache():
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    return ()
+
+# Function to list the benchmarks of loading and cleaning the sites' data, cold and from each cache backend
+def load_benchmarks(sites):
+    def warm(backend):
+        load_and_clean_data(sites, backend=backend)
+        return ()
+
+    return [
+        Benchmark('load', 'load_and_clean_data (csv)', clear_cache, lambda: load_and_clean_data(sites)),
+        Benchmark('load', 'load_and_clean_data (streaming)', clear_cache, lambda: load_and_clean_data(sites, chunksize=DEFAULT_CHUNKSIZE)),
+        Benchmark('load', 'load_and_clean_data (parquet cache)', lambda: warm('parquet'), lambda: load_and_clean_data(sites, backend='parquet')),
+        Benchmark('load', 'load_and_clean_data (memmap)', lambda: warm('memmap'), lambda: load_and_clean_data(sites, backend='memmap')),
+        Benchmark('load', 'prepare_site_data', lambda: warm('parquet'), lambda: prepare_site_data(sites[0])),
+    ]
+
+# Function to find the preprocess_* functions of the analysis scripts and the dashboard
+def preprocess_functions():
+    functions = []
+    for module in PREPROCESS_MODULES:
+        for name, function in inspect.getmembers(module, inspect.isfunction):
+            if name.startswith('preprocess') and function.__module__ == module.__name__:
+                functions.append((f"{module.__name__}.{name}", function))
+    return functions
+
+# Function to list the benchmarks of the preprocess_* functions, each runs on a fresh copy of the cleaned data
+def preprocess_benchmarks(sites):
+    data = load_site_data(sites[0])
+    return [Benchmark('preprocess', name, lambda: (data.copy(),), function) for name, function in preprocess_functions()]
+
+# Function to get the arguments of each plot function of the dashboard from a site's prepared data, by function name
+def plot_arguments(site, prepared):
+    name = get_site(site).display_name
+    columns = ['GHI', 'DNI', 'DHI', 'TModA', 'TModB']
+    fits = dict(zip(REGRESSION_MODELS, prepared['regressions'].values()))
+    sr_fit, temp_fit = fits[('GHI', ('RH',))], fits[('Tamb', ('RH',))]
+    return {
+        'plot_histogram': (prepared['histograms'], 'GHI', 30),
+        'plot_time_series': (prepared['data'], 'GHI', name, 'GHI (W/m^2)'),
+        'plot_by_month': (prepared['rollup'], 'GHI', name, 'GHI (W/m^2)'),
+        'plot_by_hour': (prepared['rollup'], 'GHI', name, 'GHI (W/m^2)'),
+        'display_summary_statistics': (prepared['zscore_data'],),
+        'plot_tamb_correlation_matrix': (prepared['correlation'], columns, f'{name} - Correlation Matrix'),
+        'plot_pair_plot': (prepared['zscore_data'], columns, f'{name} - Pair Plot'),
+        'plot_scatter_matrix': (prepared['zscore_data'], columns, f'{name} - Scatter Matrix'),
+        'plot_wind_speed_distribution': (prepared['histograms'], name),
+        'plot_wind_direction_distribution': (prepared['wind'], name),
+        'plot_wind_rose': (prepared['wind'], name),
+        'plot_prevailing_wind_direction': (prepared['wind'], name),
+        'display_zscore_outliers': (prepared['zscore_data'], ['Tamb', 'GHI', 'WS', 'RH', 'BP'], name),
+        'plot_correlation_matrix': (prepared['correlation'], name),
+        'plot_regression': (prepared['zscore_data'], sr_fit, prepared['regression_stats'], name, 'RH', 'GHI', 'Blues'),
+        'plot_rh_vs_sr_regression': (prepared['zscore_data'], sr_fit, prepared['regression_stats'], name),
+        'plot_rh_vs_temp_regression': (prepared['zscore_data'], temp_fit, prepared['regression_stats'], name),
+        'display_performance_panel': ([], 0.0),
+    }
+
+# Function to list the plot and display functions of the dashboard that have no benchmark yet
+def uncovered_plot_functions(covered):
+    return sorted(name for name, function in inspect.getmembers(utils, inspect.isfunction)
+                  if name.startswith(('plot_', 'display_')) and function.__module__ == utils.__name__ and name not in covered)
+
+# Function to list the benchmarks of the dashboard's plot functions on the first site's prepared data.
+# The figures are rendered to PNG as the dashboard does, outside of Streamlit the display calls do nothing.
+def plot_benchmarks(sites):
+    arguments = plot_arguments(sites[0], prepare_site_data(sites[0]))
+    return [Benchmark('plot', f"utils.{name}", lambda args=args: args, getattr(utils, name)) for name, args in arguments.items()]
+
+# Function to get the peak resident memory of this process so far in MB
+def max_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1024 / 1024
+
+# Function to time a benchmark over repeat runs and measure its peak memory in one more run.
+# The peak counts the allocations traced by tracemalloc during the run, which cover Python objects and NumPy
+# arrays but not Arrow's own memory pool. Returns the result as a dict, with the error if the benchmark failed.
+def run_benchmark(benchmark, repeat=DEFAULT_REPEAT):
+    result = {'group': benchmark.group, 'name': benchmark.name}
+    try:
+        runs = []
+        for _ in range(repeat):
+            args = benchmark.setup()
+            gc.collect()
+            start = time.perf_counter()
+            benchmark.run(*args)
+            runs.append(time.perf_counter() - start)
+
+        args = benchmark.setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            benchmark.run(*args)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        return result
+
+    result.update({
+        'seconds': {'min': min(runs), 'median': float(np.median(runs)), 'runs': runs},
+        'peak_alloc_mb': peak / 1024 / 1024,
+        'max_rss_mb': max_rss_mb(),
+    })
+    return result
+
+# Logger of the warning Streamlit gives on every display call made outside of a script run
+SCRIPT_RUN_CONTEXT_LOGGER = 'streamlit.runtime.scriptrunner_utils.script_run_context'
+
+# Function to run the benchmarks of some groups on the sites of the current data directory, in this process.
+# Used by the worker process of every scale, which gets the data and cache directories through the environment.
+def run_benchmarks(sites, groups=BENCHMARK_GROUPS, repeat=DEFAULT_REPEAT):
+    # The dashboard modules warn about running outside of Streamlit on every display call.
+    # Streamlit resets the levels of its loggers when it parses its config, so that warning's logger is disabled as well.
+    streamlit.logger.set_log_level('error')
+    logging.getLogger(SCRIPT_RUN_CONTEXT_LOGGER).disabled = True
+    builders = {'load': load_benchmarks, 'preprocess': preprocess_benchmarks, 'plot': plot_benchmarks}
+
+    results = []
+    for group in groups:
+        for benchmark in builders[group](sites):
+            result = run_benchmark(benchmark, repeat)
+            results.append(result)
+            status = result['error'] if 'error' in result else f"{result['seconds']['median']:.3f}s, {result['peak_alloc_mb']:.1f} MB"
+            print(f"  {benchmark.name}: {status}", flush=True)
+
+    covered = {result['name'].split('.', 1)[1] for result in results if result['group'] == 'plot'}
+    return {'benchmarks': results, 'uncovered': uncovered_plot_functions(covered) if 'plot' in groups else []}
+
+# Function to get the commit of the working tree, or None outside of a git checkout
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(dirty)
+
+# Function to describe the environment of a run, so results of different machines are not compared by mistake
+def environment():
+    import matplotlib as mpl
+    import pyarrow
+    commit, dirty = git_commit()
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'packages': {'numpy': np.__version__, 'pandas': pd.__version__, 'matplotlib': mpl.__version__, 'pyarrow': pyarrow.__version__},
+    }
+
+# Function to run the suite at each scale on synthetic data. Every scale runs in a fresh worker process
+# with its own data and cache directories, so no scale sees another's caches and the peak memory of each
+# process is its own. Generated CSVs are kept under data_dir/<rows>/ and reused when data_dir is given.
+# Returns the run as a dict ready to be saved as JSON.
+def run_suite(scales=BENCHMARK_SCALES[:1], sites=None, groups=BENCHMARK_GROUPS, repeat=DEFAULT_REPEAT, data_dir=None):
+    sites = list_sites()[:1] if sites is None else list(sites)
+    run = {'created': pd.Timestamp.now(tz='UTC').isoformat(), **environment(), 'sites': sites, 'groups': list(groups), 'repeat': repeat, 'scales': []}
+
+    work_dir = tempfile.mkdtemp(prefix='solar-benchmark-')
+    try:
+        for rows in scales:
+            scale_dir = os.path.join(data_dir or work_dir, str(rows))
+            paths = [os.path.join(scale_dir, get_site(site).file_name) for site in sites]
+            missing = [site for site, path in zip(sites, paths) if not os.path.exists(path)]
+
+            print(f"{rows} rows per site")
+            start = time.perf_counter()
+            write_synthetic_sites(scale_dir, rows, missing)
+            generate_seconds = time.perf_counter() - start
+
+            output = os.path.join(work_dir, f"{rows}.json")
+            env = {**os.environ, 'SOLAR_DATA_DIR': scale_dir, 'SOLAR_CACHE_DIR': os.path.join(work_dir, f"cache-{rows}"),
+                   'STREAMLIT_GLOBAL_SHOW_WARNING_ON_DIRECT_EXECUTION': 'false'}
+            command = [sys.executable, os.path.abspath(__file__), '--worker', output, '--sites', *sites,
+                       '--groups', *groups, '--repeat', str(repeat)]
+            returncode = subprocess.run(command, env=env).returncode
+
+            scale = {'rows': rows, 'csv_mb': sum(os.path.getsize(path) for path in paths) / 1024 / 1024,
+                     'generate_seconds': generate_seconds if missing else None}
+            if returncode == 0:
+                with open(output) as f:
+                    scale.update(json.load(f))
+            else:
+                # The worker itself died, e.g. it ran out of memory at this scale
+                scale['error'] = f"Worker exited with code {returncode}"
+            run['scales'].append(scale)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return run
+
+# Function to compare a run with an earlier one. Returns a DataFrame with the median seconds of both runs
+# and their ratio for every benchmark they share, with a flag for regressions beyond threshold.
+def compare_runs(run, baseline, threshold=REGRESSION_THRESHOLD):
+    def medians(results):
+        return {(scale['rows'], benchmark['name']): benchmark['seconds']['median']
+                for scale in results['scales'] for benchmark in scale.get('benchmarks', []) if 'seconds' in benchmark}
+
+    current, previous = medians(run), medians(baseline)
+    keys = [key for key in current if key in previous]
+    comparison = pd.DataFrame({
+        'rows': [rows for rows, _ in keys],
+        'benchmark': [name for _, name in keys],
+        'baseline_seconds': [previous[key] for key in keys],
+        'seconds': [current[key] for key in keys],
+    })
+    comparison['ratio'] = comparison['seconds'] / comparison['baseline_seconds']
+    comparison['regression'] = (comparison['ratio'] > threshold) & (comparison['baseline_seconds'] >= MIN_COMPARED_SECONDS)
+    return comparison
+
+# Function to get the default path of a run's results: results/benchmarks/benchmark-<commit>.json,
+# so runs of different commits sit side by side
+def default_output_path(run):
+    commit = run['commit'][:10] if run['commit'] else 'worktree'
+    return results_path('benchmarks', None, f"benchmark-{commit}{'-dirty' if run['dirty'] else ''}.json")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time and memory-profile loading, preprocessing and plotting on synthetic station data.')
+    parser.add_argument('--rows', type=int, nargs='+', default=BENCHMARK_SCALES[:1],
+                        help=f"rows per site of each scale, e.g. {' '.join(map(str, BENCHMARK_SCALES))}; {BENCHMARK_SCALES[0]} by default")
+    parser.add_argument('--sites', nargs='+', help='sites to generate and load, the first registered site by default')
+    parser.add_argument('--groups', nargs='+', choices=BENCHMARK_GROUPS, default=BENCHMARK_GROUPS, help='benchmark groups to run, all by default')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='timed runs per benchmark')
+    parser.add_argument('--data-dir', help='directory keeping the generated CSVs between runs, a temporary directory by default')
+    parser.add_argument('--output', help='JSON file to write, results/benchmarks/benchmark-<commit>.json by default')
+    parser.add_argument('--compare', help='JSON file of an earlier run to compare with, exits with 1 on regressions')
+    parser.add_argument('--worker', metavar='OUTPUT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Worker process of one scale, see run_suite
+    if args.worker:
+        result = run_benchmarks(args.sites, args.groups, args.repeat)
+        with open(args.worker, 'w') as f:
+            json.dump(result, f)
+        sys.exit(0)
+
+    run = run_suite(args.rows, args.sites, args.groups, args.repeat, args.data_dir)
+    output = args.output or default_output_path(run)
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=2)
+        f.write('\n')
+    print(f"Wrote {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            comparison = compare_runs(run, json.load(f))
+        print(comparison.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+        regressions = comparison[comparison['regression']]
+        if not regressions.empty:
+            print(f"{len(regressions)} benchmarks are more than {REGRESSION_THRESHOLD:g}x slower than in {args.compare}")
+            sys.exit(1)
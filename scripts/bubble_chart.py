@@ -1,14 +1,15 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from density import binned_bubbles
 
 # Import load_data.py as a module
 from load_data import load_and_clean_data
-
-# Load and assign the cleaned data
-benin_data, sierraleone_data, togo_data = load_and_clean_data()
+from results import results_path
+from instrumentation import instrumented
 
 # Preprocess Data
+@instrumented
 def preprocess_data_for_bubble_chart(data):
     data['GHI'] = pd.to_numeric(data['GHI'], errors='coerce')
     data['Tamb'] = pd.to_numeric(data['Tamb'], errors='coerce')
@@ -21,32 +22,42 @@ def preprocess_data_for_bubble_chart(data):
     return data
 
 # Bubble Chart: GHI vs. Tamb vs. WS with RH as bubble size
+@instrumented
 def plot_bubble_chart(data, data_name, save_as):
     # Preprocess data
     data = preprocess_data_for_bubble_chart(data)
     
+    # Aggregate the rows into GHI x Tamb bins, each bubble shows the mean RH and WS of its bin
+    bubbles = binned_bubbles(data['GHI'].to_numpy(dtype='float64'), data['Tamb'].to_numpy(dtype='float64'),
+                             data['RH'].to_numpy(dtype='float64'), data['WS'].to_numpy(dtype='float64'))
+
     # Bubble chart plotting
     plt.figure(figsize=(10, 8))
-    plt.scatter(data['GHI'], data['Tamb'], s=data['RH']*10, c=data['WS'], cmap='viridis', alpha=0.6, edgecolors="w", linewidth=0.5)
+    plt.scatter(bubbles['x'], bubbles['y'], s=bubbles['size']*10, c=bubbles['color'], cmap='viridis', alpha=0.6, edgecolors="w", linewidth=0.5)
     
     # Title and labels
-    plt.title(f'Bubble Chart: GHI vs. Tamb vs. WS with RH as bubble size ({data_name})', fontsize=14)
+    plt.title(f'Bubble Chart: GHI vs. Tamb vs. WS with mean RH as bubble size ({data_name})', fontsize=14)
     plt.xlabel('Global Horizontal Irradiance (GHI) (W/m²)', fontsize=12)
     plt.ylabel('Ambient Temperature (Tamb) (°C)', fontsize=12)
     
     # Colorbar for Wind Speed (WS)
-    plt.colorbar(label='Wind Speed (WS) (m/s)')
+    plt.colorbar(label='Mean Wind Speed (WS) (m/s)')
     
     # Display the plot and save it
     plt.tight_layout()
-    plt.savefig(f"../results/bubble_charts/{data_name}/{save_as}")
+    plt.savefig(results_path('bubble_charts', data_name, save_as))
     plt.close()
 
-########################### Bubble Chart for Benin ###########################
-plot_bubble_chart(benin_data, 'benin', 'Benin_GHI_vs_Tamb_vs_WS_bubble_chart.png')
+# Run the analysis for all sites when executed as a script, importing the module only defines its functions
+if __name__ == '__main__':
+    # Load and assign the cleaned data
+    benin_data, sierraleone_data, togo_data = load_and_clean_data(["benin", "sierraleone", "togo"])
+
+    ########################### Bubble Chart for Benin ###########################
+    plot_bubble_chart(benin_data, 'benin', 'Benin_GHI_vs_Tamb_vs_WS_bubble_chart.png')
 
-########################### Bubble Chart for Sierraleone ###########################
-plot_bubble_chart(sierraleone_data, 'sierraleone', 'Sierraleone_GHI_vs_Tamb_vs_WS_bubble_chart.png')
+    ########################### Bubble Chart for Sierraleone ###########################
+    plot_bubble_chart(sierraleone_data, 'sierraleone', 'Sierraleone_GHI_vs_Tamb_vs_WS_bubble_chart.png')
 
-########################### Bubble Chart for Togo ###########################
-plot_bubble_chart(togo_data, 'togo', 'Togo_GHI_vs_Tamb_vs_WS_bubble_chart.png')
+    ########################### Bubble Chart for Togo ###########################
+    plot_bubble_chart(togo_data, 'togo', 'Togo_GHI_vs_Tamb_vs_WS_bubble_chart.png')
@@ -0,0 +1,168 @@
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+# Version of the cleaning engine. Bump it whenever the engine changes so that cached cleaned
+# data produced by an older engine is rebuilt. Changes to a site's rules are picked up on their own.
+CLEANING_RULES_VERSION = 3
+
+# Define a list of columns where negative values are acceptable
+NEGATIVE_ALLOWED_COLUMNS = ['Tamb', 'TModA', 'TModB']
+
+# Binary columns whose values outside the expected range are replaced with the most frequent value
+MODE_COLUMNS = ['Cleaning']
+
+# Rule table: column -> expected (lower, upper) range. None caps the column at the IQR fences
+# (Q1 - 1.5 * IQR, Q3 + 1.5 * IQR) instead, and a None bound leaves that side open.
+# The rules of each site are set in the site registry (scripts/sites.json), these are used
+# for sites that do not set their own.
+DEFAULT_RULES = {
+    'GHI': (0, 1000),
+    'DNI': (0, 2000),
+    'DHI': (0, 2000),
+    'ModA': None,
+    'ModB': None,
+    'Tamb': (-50, 50),
+    'RH': (0, 100),
+    'WS': (0, 100),
+    'WSgust': (0, 100),
+    'WSstdev': (0, 100),
+    'WD': (0, 360),
+    'WDstdev': (0, 360),
+    'BP': (900, 1050),
+    'Cleaning': (0, 1),
+    'Precipitation': (0, None),
+    'TModA': (-50, 50),
+    'TModB': (-50, 50),
+}
+
+# Columns of the cleaning report
+REPORT_COLUMNS = ['rule', 'lower_bound', 'upper_bound', 'negatives_fixed', 'below_lower', 'above_upper', 'replacement']
+
+# Function to fingerprint a rule table, so cached data is rebuilt when a site's rules change
+def rules_fingerprint(rules):
+    payload = json.dumps({column: rules[column] for column in sorted(rules)})
+    return hashlib.sha256(payload.encode()).hexdigest()[:12]
+
+# Function to describe how a column is cleaned
+def rule_name(column, rules):
+    if rules[column] is None:
+        return 'iqr'
+    return 'mode' if column in MODE_COLUMNS else 'range'
+
+# Function to convert negative values to positive in the columns where they are not valid.
+# Works in place on a 2-D block holding one column per row and returns the number of values fixed per column.
+def fix_negatives(block, columns):
+    negative = block < 0
+    negative[np.isin(columns, NEGATIVE_ALLOWED_COLUMNS)] = False
+    counts = np.count_nonzero(negative, axis=1)
+    for j in np.flatnonzero(counts):
+        np.abs(block[j], out=block[j], where=negative[j])
+    return counts
+
+# Function to compute the lower and upper bound of every column.
+# Quantiles holds the 0.25 and 0.75 quantiles of the IQR columns as rows.
+def rule_bounds(columns, rules, quantiles=None):
+    lower = np.full(len(columns), -np.inf)
+    upper = np.full(len(columns), np.inf)
+
+    for j, column in enumerate(columns):
+        expected_range = rules[column]
+        if expected_range is None:
+            Q1 = quantiles.loc[0.25, column]
+            Q3 = quantiles.loc[0.75, column]
+            IQR = Q3 - Q1
+            lower[j] = Q1 - 1.5 * IQR
+            upper[j] = Q3 + 1.5 * IQR
+        else:
+            if expected_range[0] is not None:
+                lower[j] = expected_range[0]
+            if expected_range[1] is not None:
+                upper[j] = expected_range[1]
+
+    # Columns without any values have no quantiles and are left as they are
+    lower[np.isnan(lower)] = -np.inf
+    upper[np.isnan(upper)] = np.inf
+    return lower, upper
+
+# Function to cap a 2-D block holding one column per row at its bounds, in place.
+# Mode columns are not clipped, their values outside the bounds are replaced with mode_values[column].
+# Returns the number of values below and above the bounds per column.
+def cap_block(block, columns, lower, upper, mode_values):
+    below = block < lower[:, None]
+    above = block > upper[:, None]
+
+    is_mode = np.isin(columns, MODE_COLUMNS)
+    clip_lower = np.where(is_mode, -np.inf, lower)[:, None]
+    clip_upper = np.where(is_mode, np.inf, upper)[:, None]
+    np.clip(block, clip_lower, clip_upper, out=block)
+
+    for j in np.flatnonzero(is_mode):
+        outliers = below[j] | above[j]
+        if outliers.any():
+            block[j, outliers] = mode_values[columns[j]]
+
+    return below.sum(axis=1), above.sum(axis=1)
+
+# Function to get the most frequent value of a column, or 0 when there is none
+def mode_value(values):
+    mode = pd.Series(values).mode()
+    return 0 if mode.empty else mode.iloc[0]
+
+# Function to build the per-column cleaning report
+def build_report(columns, rules, lower, upper, negatives, below, above, mode_values):
+    report = pd.DataFrame({
+        'rule': [rule_name(column, rules) for column in columns],
+        'lower_bound': lower,
+        'upper_bound': upper,
+        'negatives_fixed': negatives,
+        'below_lower': below,
+        'above_upper': above,
+        'replacement': [mode_values.get(column, np.nan) for column in columns],
+    }, index=pd.Index(columns, name='column'))
+    return report[REPORT_COLUMNS]
+
+# Function to write changed rows of a block back into their columns, keeping integer columns integer where possible
+def write_back(data, columns, block, rows):
+    for j in rows:
+        column = columns[j]
+        dtype = data[column].dtype
+        if np.issubdtype(dtype, np.integer) and not np.array_equal(block[j], np.round(block[j])):
+            dtype = np.float64
+        data[column] = block[j].astype(dtype, copy=False)
+
+# Function to copy the columns to clean into a 2-D block with one column per row
+def to_block(data, columns):
+    block = np.empty((len(columns), len(data)), dtype='float64')
+    for j, column in enumerate(columns):
+        block[j] = data[column].to_numpy(dtype='float64')
+    return block
+
+# Function to apply the cleaning rules to a dataset in a single pass.
+# The data is cleaned in place and a report with one row per cleaned column is returned.
+def apply_cleaning_rules(data, rules):
+    columns = [column for column in rules if column in data.columns]
+    block = to_block(data, columns)
+
+    negatives = fix_negatives(block, columns)
+
+    # Quantiles of all IQR-capped columns in one DataFrame.quantile call, after the negative values were fixed
+    iqr_rows = [j for j, column in enumerate(columns) if rules[column] is None]
+    quantiles = pd.DataFrame(block[iqr_rows].T, columns=[columns[j] for j in iqr_rows], copy=False).quantile([0.25, 0.75])
+
+    lower, upper = rule_bounds(columns, rules, quantiles)
+
+    # The mode is taken over the whole column, only for columns that have values out of range
+    mode_values = {}
+    for j, column in enumerate(columns):
+        if column in MODE_COLUMNS and ((block[j] < lower[j]) | (block[j] > upper[j])).any():
+            mode_values[column] = mode_value(block[j])
+
+    below, above = cap_block(block, columns, lower, upper, mode_values)
+
+    # Write back only the columns that changed
+    write_back(data, columns, block, np.flatnonzero(negatives + below + above))
+
+    return build_report(columns, rules, lower, upper, negatives, below, above, mode_values)
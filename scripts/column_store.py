@@ -0,0 +1,160 @@
+import json
+import mmap
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scripts.data_cache import CACHE_DIR, cache_key, is_stale_entry
+    from scripts.instrumentation import instrumented
+except ImportError:
+    from data_cache import CACHE_DIR, cache_key, is_stale_entry
+    from instrumentation import instrumented
+
+# Subdirectory of the cache holding the column stores, one directory per site holding one store per cache key
+STORE_SUBDIR = 'columns'
+
+# Header of a column store: format, row count, sort column and the dtype and file of every column
+HEADER_FILE = 'header.json'
+
+# Version of the column store layout, stores of other versions are not read
+STORE_FORMAT_VERSION = 1
+
+# Function to get the directory of the column stores
+def store_dir(cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, STORE_SUBDIR)
+
+# Function to get the column store directory of a site for a given key, in the site's own directory
+def column_store_path(site, key, cache_dir=CACHE_DIR):
+    return os.path.join(store_dir(cache_dir), site, key)
+
+# Function to write a site's cleaned data as a column store: one raw little-endian array file per column
+# and a JSON header. Only numeric and timestamp columns can be stored, timestamps keep their resolution.
+# The store is written to a temporary directory and renamed into place, older stores of the site's variant are removed.
+@instrumented
+def write_column_store(site, source_path, rules_version, data, cache_dir=CACHE_DIR):
+    path = column_store_path(site, cache_key(source_path, rules_version, cache_dir), cache_dir)
+    if os.path.exists(os.path.join(path, HEADER_FILE)):
+        return path
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+    try:
+        columns = []
+        for name in data.columns:
+            values = data[name].to_numpy()
+            if values.dtype.kind not in 'biufM':
+                raise ValueError(f"Column {name} of {site} has dtype {values.dtype}, the column store only holds numeric and timestamp columns")
+
+            dtype = values.dtype.newbyteorder('<')
+            file_name = f"{name}.bin"
+            np.ascontiguousarray(values, dtype=dtype).tofile(os.path.join(tmp_path, file_name))
+            columns.append({'name': name, 'dtype': dtype.str, 'file': file_name})
+
+        header = {
+            'format': STORE_FORMAT_VERSION,
+            'site': site,
+            'rows': len(data),
+            'sorted_by': 'Timestamp' if 'Timestamp' in data.columns and data['Timestamp'].is_monotonic_increasing else None,
+            'columns': columns,
+        }
+        with open(os.path.join(tmp_path, HEADER_FILE), 'w') as f:
+            json.dump(header, f, indent=2)
+            f.write('\n')
+
+        os.replace(tmp_path, path)
+    except OSError:
+        # Another process published the same store first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not os.path.exists(os.path.join(path, HEADER_FILE)):
+            raise
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    # Drop the stores of older source files or cleaning rules for this site, the other variant keeps its store.
+    # Processes that still map their files keep reading them, the space is freed once the last mapping is closed.
+    directory = os.path.dirname(path)
+    for name in os.listdir(directory):
+        if is_stale_entry(name, os.path.basename(path)):
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+    return path
+
+# Function to map the columns of a column store read-only.
+# Returns the header and a dict of the mapped arrays by column, Timestamp first. Mapping costs no reads,
+# pages are loaded on first use and shared with every other process mapping the same files.
+def open_column_store(path, columns=None):
+    with open(os.path.join(path, HEADER_FILE)) as f:
+        header = json.load(f)
+    if header.get('format') != STORE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported column store format {header.get('format')} in {path}")
+
+    stored = {column['name']: column for column in header['columns']}
+    if columns is None:
+        names = list(stored)
+    else:
+        names = ['Timestamp'] + [column for column in columns if column != 'Timestamp']
+
+    arrays = {}
+    for name in names:
+        column = stored[name]
+        if header['rows'] == 0:
+            arrays[name] = np.empty(0, dtype=column['dtype'])
+        else:
+            arrays[name] = np.memmap(os.path.join(path, column['file']), dtype=column['dtype'], mode='r', shape=(header['rows'],))
+    return header, arrays
+
+# Function to get the first and last timestamp of a site's column store. A store sorted by time only reads its
+# first and last timestamps. Returns None when there is no store, (None, None) when it holds no rows.
+def read_column_store_time_bounds(site, source_path, rules_version, cache_dir=CACHE_DIR):
+    path = column_store_path(site, cache_key(source_path, rules_version, cache_dir), cache_dir)
+    if not os.path.exists(os.path.join(path, HEADER_FILE)):
+        return None
+
+    header, arrays = open_column_store(path, ['Timestamp'])
+    times = arrays['Timestamp']
+    if len(times) == 0:
+        return None, None
+    if header['sorted_by'] == 'Timestamp':
+        return pd.Timestamp(times[0]), pd.Timestamp(times[-1])
+    return pd.Timestamp(times.min()), pd.Timestamp(times.max())
+
+# Function to tell whether an array is backed by a memory-mapped file rather than process memory
+def is_mapped(values):
+    while values is not None:
+        if isinstance(values, mmap.mmap):
+            return True
+        values = getattr(values, 'base', None)
+    return False
+
+# Function to read a site's cleaned data from its column store without copying it.
+# Returns None when there is no store for the current source file and rules version.
+# A time range of a store sorted by time is sliced from the mapped arrays by binary search, otherwise it is masked.
+@instrumented
+def read_column_store(site, source_path, rules_version, columns=None, start=None, end=None, cache_dir=CACHE_DIR):
+    path = column_store_path(site, cache_key(source_path, rules_version, cache_dir), cache_dir)
+    if not os.path.exists(os.path.join(path, HEADER_FILE)):
+        return None
+
+    header, arrays = open_column_store(path, columns)
+    if start is not None or end is not None:
+        times = arrays['Timestamp']
+        start = None if start is None else pd.Timestamp(start).to_datetime64().astype(times.dtype)
+        end = None if end is None else pd.Timestamp(end).to_datetime64().astype(times.dtype)
+        if header['sorted_by'] == 'Timestamp':
+            lo = 0 if start is None else np.searchsorted(times, start, 'left')
+            hi = len(times) if end is None else np.searchsorted(times, end, 'right')
+            arrays = {name: values[lo:hi] for name, values in arrays.items()}
+        else:
+            keep = np.ones(len(times), dtype=bool)
+            if start is not None:
+                keep &= times >= start
+            if end is not None:
+                keep &= times <= end
+            arrays = {name: values[keep] for name, values in arrays.items()}
+
+    # Building the frame from a dict with copy=False keeps one block per column on the mapped memory
+    return pd.DataFrame(arrays, copy=False)
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+# Columns of the correlation views, their pairwise sums are kept per day
+CORRELATION_COLUMNS = ['GHI', 'DNI', 'DHI', 'TModA', 'TModB', 'RH', 'Tamb', 'WS', 'WSgust', 'WD']
+
+# Function to build the correlation index of a dataset: cumulative per-day sums for every pair of columns.
+# For columns i and j, over the rows where both are present, it keeps the count, the sum of i, the sum of
+# squares of i and the sum of i * j, so pairwise NaN handling matches DataFrame.corr(). Values are shifted
+# by their column mean first, which keeps the sums of squares from cancelling out.
+# Any date range is then answered from two rows of the cumulative arrays.
+def build_correlation_index(data, columns=CORRELATION_COLUMNS):
+    columns = [column for column in columns if column in data.columns]
+    days = data['Timestamp'].to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+    order = np.argsort(days, kind='stable') if np.any(days[1:] < days[:-1]) else None
+
+    values = np.column_stack([data[column].to_numpy(dtype='float64') for column in columns]) if columns else np.empty((len(data), 0))
+    if order is not None:
+        days, values = days[order], values[order]
+    valid = ~np.isnan(values)
+    offset = np.where(valid, values, 0.0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+    shifted = np.where(valid, values - offset, 0.0)
+    present = valid.astype('float64')
+
+    unique_days, starts = np.unique(days, return_index=True)
+    bounds = np.r_[starts, len(days)]
+    k = len(columns)
+    sums = {name: np.zeros((len(unique_days) + 1, k, k)) for name in ['count', 'sum', 'square', 'product']}
+    for d in range(len(unique_days)):
+        rows = slice(bounds[d], bounds[d + 1])
+        x, v = shifted[rows], present[rows]
+        sums['count'][d + 1] = v.T @ v
+        sums['sum'][d + 1] = x.T @ v
+        sums['square'][d + 1] = (x * x).T @ v
+        sums['product'][d + 1] = x.T @ x
+
+    return {'columns': columns, 'days': unique_days, **{name: np.cumsum(array, axis=0) for name, array in sums.items()}}
+
+# Function to compute the Pearson correlation matrix of some columns over a date range, both ends inclusive.
+# Costs two binary searches and O(k²) arithmetic whatever the number of rows. Missing ends mean the whole range.
+def correlation_matrix(index, columns=None, start=None, end=None):
+    columns = index['columns'] if columns is None else [column for column in columns if column in index['columns']]
+    positions = [index['columns'].index(column) for column in columns]
+    days = index['days']
+    lo = 0 if start is None else np.searchsorted(days, np.datetime64(pd.Timestamp(start).date(), 'D'), 'left')
+    hi = len(days) if end is None else np.searchsorted(days, np.datetime64(pd.Timestamp(end).date(), 'D'), 'right')
+
+    window = np.ix_(positions, positions)
+    n, s, q, p = [(index[name][hi] - index[name][lo])[window] for name in ['count', 'sum', 'square', 'product']]
+
+    # s[i, j] is the sum of column i over the rows where i and j are present, so s.T holds the sums of j
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = n * p - s * s.T
+        variance_i = n * q - s * s
+        correlation = covariance / np.sqrt(variance_i * variance_i.T)
+    correlation[n < 2] = np.nan
+    return pd.DataFrame(np.clip(correlation, -1, 1), index=columns, columns=columns)
@@ -2,33 +2,41 @@ import pandas as pd
 
 # Import load_data.py as a module
 from load_data import load_and_clean_data
-
-# Load and assign the cleaned data
-benin_data, sierraleone_data, togo_data = load_and_clean_data()
-
-# Generate summary statistics for each country's dataset (excluding the timestamp table)
-benin_stats = benin_data.select_dtypes(include='number').describe()
-sierraleone_stats = sierraleone_data.select_dtypes(include='number').describe()
-togo_stats = togo_data.select_dtypes(include='number').describe()
-
-# Drop the count row
-benin_stats = benin_stats.drop('count')
-sierraleone_stats = sierraleone_stats.drop('count')
-togo_stats = togo_stats.drop('count')
-
-# Display the summary statistics
-print("Benin Summary Statistics:")
-print(benin_stats)
-
-print("\nSierraleone Summary Statistics:")
-print(sierraleone_stats)
-
-print("\nTogo Summary Statistics:")
-print(togo_stats)
-
-"""
-# Save the summary statistics to CSV files
-benin_stats.to_csv('../results/summary_stats/benin_summary_stats.csv', index=True)  
-sierraleone_stats.to_csv('../results/summary_stats/sierraleone_summary_stats.csv', index=True)  
-togo_stats.to_csv('../results/summary_stats/togo_summary_stats.csv', index=True)
-"""
\ No newline at end of file
+from results import results_path
+from instrumentation import instrumented
+
+# Function to generate the summary statistics of a dataset (excluding the timestamp table), without the count row
+def summary_statistics(data):
+    return data.select_dtypes(include='number').describe().drop('count')
+
+# Function to save the summary statistics of a dataset to results/summary_stats/<site>_summary_stats.csv
+@instrumented
+def save_summary_statistics(data, data_name):
+    summary_statistics(data).to_csv(results_path('summary_stats', None, f"{data_name}_summary_stats.csv"), index=True)
+
+# Run the analysis for all sites when executed as a script, importing the module only defines its functions
+if __name__ == '__main__':
+    # Load and assign the cleaned data
+    benin_data, sierraleone_data, togo_data = load_and_clean_data(["benin", "sierraleone", "togo"])
+
+    # Generate summary statistics for each country's dataset
+    benin_stats = summary_statistics(benin_data)
+    sierraleone_stats = summary_statistics(sierraleone_data)
+    togo_stats = summary_statistics(togo_data)
+
+    # Display the summary statistics
+    print("Benin Summary Statistics:")
+    print(benin_stats)
+
+    print("\nSierraleone Summary Statistics:")
+    print(sierraleone_stats)
+
+    print("\nTogo Summary Statistics:")
+    print(togo_stats)
+
+    """
+    # Save the summary statistics to CSV files
+    save_summary_statistics(benin_data, 'benin')
+    save_summary_statistics(sierraleone_data, 'sierraleone')
+    save_summary_statistics(togo_data, 'togo')
+    """
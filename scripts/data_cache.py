@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    from scripts.instrumentation import instrumented
+except ImportError:
+    from instrumentation import instrumented
+
+# Directory holding the cleaned, columnar copies of each site's data, can be pointed elsewhere through the environment
+CACHE_DIR = os.environ.get('SOLAR_CACHE_DIR') or os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'temp_data', 'cache'))
+
+# Number of rows per Parquet row group. The station files are written in time order,
+# so each row group covers a contiguous time window and time-range reads can skip
+# whole row groups using their min/max statistics.
+ROW_GROUP_SIZE = 64 * 1024
+
+# Subdirectories of the cache holding the cleaned data and the precomputed aggregates, one directory per site
+SITE_SUBDIR = 'sites'
+ROLLUP_SUBDIR = 'rollups'
+
+# Sidecar file remembering the content hash of each source file for a given size/mtime
+FINGERPRINTS_FILE = 'fingerprints.json'
+
+# Function to hash a file's content in fixed-size blocks
+def hash_file(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Function to read the remembered source fingerprints
+def _read_fingerprints(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, FINGERPRINTS_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+# Function to write the remembered source fingerprints atomically
+def _write_fingerprints(cache_dir, fingerprints):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, FINGERPRINTS_FILE)
+    # Source files are fingerprinted from several threads while they are fetched
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(fingerprints, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+# Function to fingerprint a source file by size, modification time and content hash.
+# The content hash is only recomputed when the size or mtime changed since the last call.
+# With persist=False a new hash is not remembered, nothing is written to the cache directory.
+def file_fingerprint(path, cache_dir=CACHE_DIR, persist=True):
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    fingerprints = _read_fingerprints(cache_dir)
+    known = fingerprints.get(path)
+
+    if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+        return known
+
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': hash_file(path)}
+    if persist:
+        fingerprints[path] = fingerprint
+        _write_fingerprints(cache_dir, fingerprints)
+    return fingerprint
+
+# Function to get the variant of a cache entry from its rules version. Streaming mode caps with approximate
+# quartiles and caches its results next to the exact ones, its rules versions end with '-streaming'.
+def cache_variant(rules_version):
+    return 'streaming' if rules_version.endswith('-streaming') else 'exact'
+
+# Function to build the cache key from the source fingerprint and the cleaning rules version, as '<variant>-<hash>'
+def cache_key(source_path, rules_version, cache_dir=CACHE_DIR):
+    fingerprint = file_fingerprint(source_path, cache_dir)
+    payload = json.dumps({'source': fingerprint, 'rules_version': rules_version}, sort_keys=True)
+    return f"{cache_variant(rules_version)}-{hashlib.sha256(payload.encode()).hexdigest()[:16]}"
+
+# Function to get the directory of the cached cleaned data
+def site_dir(cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, SITE_SUBDIR)
+
+# Function to get the cache file path of a site for a given key, in the site's own directory
+def cache_path(site, key, directory):
+    return os.path.join(directory, site, f"{key}.parquet")
+
+# Function to tell whether an entry of a site's cache directory is an older entry of the same variant as the current one
+def is_stale_entry(name, current_name):
+    return name != current_name and not name.endswith('.tmp') and name.split('-', 1)[0] == current_name.split('-', 1)[0]
+
+# Function to read a site's cleaned data from the cache.
+# Returns None when there is no cache entry for the current source file and rules version.
+@instrumented
+def read_cached_site(site, source_path, rules_version, columns=None, start=None, end=None, cache_dir=CACHE_DIR):
+    path = cache_path(site, cache_key(source_path, rules_version, cache_dir), site_dir(cache_dir))
+    if not os.path.exists(path):
+        return None
+
+    # Always keep the timestamp so the result can still be filtered and plotted over time
+    if columns is not None:
+        columns = ['Timestamp'] + [column for column in columns if column != 'Timestamp']
+
+    # Row groups whose timestamp statistics fall outside the range are never read
+    filters = []
+    if start is not None:
+        filters.append(('Timestamp', '>=', pd.Timestamp(start)))
+    if end is not None:
+        filters.append(('Timestamp', '<=', pd.Timestamp(end)))
+
+    return pd.read_parquet(path, engine='pyarrow', columns=columns, filters=filters or None)
+
+# Function to get the first and last timestamp of a site's cached data from the Parquet footer, without reading any rows.
+# Returns None when there is no cache entry or a row group has no timestamp statistics, (None, None) when it holds no rows.
+def read_cached_time_bounds(site, source_path, rules_version, cache_dir=CACHE_DIR):
+    path = cache_path(site, cache_key(source_path, rules_version, cache_dir), site_dir(cache_dir))
+    if not os.path.exists(path):
+        return None
+
+    metadata = pq.read_metadata(path)
+    column = metadata.schema.names.index('Timestamp')
+    bounds = []
+    for group in range(metadata.num_row_groups):
+        row_group = metadata.row_group(group)
+        if row_group.num_rows == 0:
+            continue
+        statistics = row_group.column(column).statistics
+        if statistics is None or not statistics.has_min_max:
+            return None
+        bounds.append((pd.Timestamp(statistics.min), pd.Timestamp(statistics.max)))
+    if not bounds:
+        return None, None
+    return min(low for low, _ in bounds), max(high for _, high in bounds)
+
+# Function to move a finished cache file into place and drop the older entries of the same site and variant.
+# Every site has its own directory, so other sites' entries are never touched.
+def publish_cache_file(tmp_path, path):
+    os.replace(tmp_path, path)
+
+    # Drop cache entries of older source files or cleaning rules for this site
+    directory = os.path.dirname(path)
+    for name in os.listdir(directory):
+        if name.endswith('.parquet') and is_stale_entry(name, os.path.basename(path)):
+            os.remove(os.path.join(directory, name))
+
+    return path
+
+# Function to write a site's cleaned data to the cache, replacing older entries for the site
+@instrumented
+def write_cached_site(site, source_path, rules_version, data, cache_dir=CACHE_DIR):
+    path = cache_path(site, cache_key(source_path, rules_version, cache_dir), site_dir(cache_dir))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Write to a temporary file first so readers never see a partially written cache entry
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    data.to_parquet(tmp_path, engine='pyarrow', index=False, row_group_size=ROW_GROUP_SIZE)
+
+    return publish_cache_file(tmp_path, path)
+
+# Function to write a site's cleaned data to the cache one chunk at a time.
+# Only the current chunk is held in memory, every chunk is stored as one or more row groups.
+@instrumented
+def write_cached_site_chunks(site, source_path, rules_version, chunks, cache_dir=CACHE_DIR):
+    path = cache_path(site, cache_key(source_path, rules_version, cache_dir), site_dir(cache_dir))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            else:
+                table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+            writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+    except BaseException:
+        # Never leave a partially written file behind
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if writer is None:
+        raise ValueError(f"No data to cache for {site}")
+    writer.close()
+
+    return publish_cache_file(tmp_path, path)
+
+# Function to get the directory of the cached aggregates
+def rollup_dir(cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, ROLLUP_SUBDIR)
+
+# Function to read a site's aggregate cube from the cache.
+# Returns None when there is no cube for the current source file and rules version.
+def read_cached_rollup(site, source_path, rules_version, cache_dir=CACHE_DIR):
+    path = cache_path(site, cache_key(source_path, rules_version, cache_dir), rollup_dir(cache_dir))
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path, engine='pyarrow')
+
+# Function to write a site's aggregate cube next to its cleaned data, replacing older cubes of the site
+def write_cached_rollup(site, source_path, rules_version, cube, cache_dir=CACHE_DIR):
+    path = cache_path(site, cache_key(source_path, rules_version, cache_dir), rollup_dir(cache_dir))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    cube.to_parquet(tmp_path, engine='pyarrow', index=False)
+    return publish_cache_file(tmp_path, path)
@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import gdown
+import pandas as pd
+
+try:
+    from scripts.data_cache import file_fingerprint, hash_file
+    from scripts.instrumentation import instrumented
+    from scripts.site_registry import get_site, list_sites
+except ImportError:
+    from data_cache import file_fingerprint, hash_file
+    from instrumentation import instrumented
+    from site_registry import get_site, list_sites
+
+# Directory the sites' source files are published to, can be pointed elsewhere through the environment
+DATA_DIR = os.environ.get('SOLAR_DATA_DIR') or os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'temp_data'))
+
+# Mirror to fetch every site's file from instead of its registered source, by file name.
+# Either a local directory or an http(s) URL prefix, e.g. an internal file server.
+DATA_MIRROR = os.environ.get('SOLAR_DATA_MIRROR') or None
+
+# Record of the files fetched into a data directory: their size and content hash when they were published
+SOURCES_MANIFEST = 'sources.json'
+
+# Files fetched at the same time, fetching is bound by the network rather than the CPU
+DEFAULT_FETCH_WORKERS = 4
+
+# Block size of copies and downloads, and the timeout of HTTP requests
+FETCH_BLOCK_SIZE = 1024 * 1024
+HTTP_TIMEOUT_SECONDS = 60
+
+# Serializes updates of the sources manifest between fetch threads
+_manifest_lock = threading.Lock()
+
+# Function to get the local path of a site's source file
+def site_source_path(site, data_dir=DATA_DIR):
+    return os.path.join(data_dir, get_site(site).file_name)
+
+# Function to get where a site's file is fetched from: its registered source, or the mirror when one is set.
+# The checksum and size of the registered source, or its opt-out of verification, still apply to the mirrored file.
+def resolve_source(site, mirror=DATA_MIRROR):
+    config = get_site(site)
+    source = dict(config.source)
+    if mirror is None:
+        return source
+
+    checks = {key: source[key] for key in ('sha256', 'size', 'verify') if key in source}
+    if mirror.startswith(('http://', 'https://')):
+        return {'type': 'http', 'url': f"{mirror.rstrip('/')}/{config.file_name}", **checks}
+    return {'type': 'local', 'path': os.path.join(mirror, config.file_name), **checks}
+
+# Function to get the size of a partly fetched file, 0 when there is none
+def part_size(part_path):
+    try:
+        return os.path.getsize(part_path)
+    except FileNotFoundError:
+        return 0
+
+# Function to fetch a file from Google Drive. gdown resumes its own partial download.
+def fetch_gdrive(source, part_path):
+    url = f"https://drive.google.com/uc?id={source['file_id']}"
+    gdown.download(url, part_path, quiet=False, resume=True)
+    return None
+
+# Function to fetch a file over HTTP, resuming a partial file with a Range request.
+# Servers that ignore the range send the whole file, which then replaces the partial one.
+# Returns the full size of the file when the server tells it.
+def fetch_http(source, part_path):
+    offset = part_size(part_path)
+    request = urllib.request.Request(source['url'], headers={'Range': f"bytes={offset}-"} if offset else {})
+    try:
+        response = urllib.request.urlopen(request, timeout=HTTP_TIMEOUT_SECONDS)
+    except urllib.error.HTTPError as e:
+        # The partial file already holds the whole file
+        if e.code == 416 and offset:
+            return None
+        raise
+
+    with response:
+        if offset and response.status != 206:
+            offset = 0
+        length = response.headers.get('Content-Length')
+        with open(part_path, 'ab' if offset else 'wb') as f:
+            shutil.copyfileobj(response, f, FETCH_BLOCK_SIZE)
+    return offset + int(length) if length is not None else None
+
+# Function to fetch a file from a local directory or a mounted share, resuming a partial copy.
+# Returns the size of the file.
+def fetch_local(source, part_path):
+    size = os.path.getsize(source['path'])
+    offset = part_size(part_path)
+    if offset > size:
+        offset = 0
+    with open(source['path'], 'rb') as src, open(part_path, 'ab' if offset else 'wb') as dst:
+        src.seek(offset)
+        shutil.copyfileobj(src, dst, FETCH_BLOCK_SIZE)
+    return size
+
+# Fetch function of each source type. A fetch function writes or completes the partial file at
+# part_path and returns the file's expected size, or None when it does not know it.
+SOURCE_FETCHERS = {'gdrive': fetch_gdrive, 'http': fetch_http, 'local': fetch_local}
+
+# Function to check a file's size and SHA-256 against the expected ones, where known.
+# Raises ValueError on a mismatch, returns the file's SHA-256.
+def verify_file(path, size=None, sha256=None):
+    actual_size = os.path.getsize(path)
+    if size is not None and actual_size != size:
+        raise ValueError(f"{path} has {actual_size} bytes, expected {size}")
+    actual_sha256 = hash_file(path)
+    if sha256 is not None and actual_sha256 != sha256.lower():
+        raise ValueError(f"{path} has SHA-256 {actual_sha256}, expected {sha256}")
+    return actual_sha256
+
+# Function to read the record of the files fetched into a data directory
+def read_sources_manifest(data_dir):
+    try:
+        with open(os.path.join(data_dir, SOURCES_MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+# Function to record a published file in its directory's sources manifest, written atomically
+def record_source(path, record):
+    data_dir, file_name = os.path.split(path)
+    with _manifest_lock:
+        manifest = read_sources_manifest(data_dir)
+        manifest[file_name] = record
+        manifest_path = os.path.join(data_dir, SOURCES_MANIFEST)
+        tmp_path = f"{manifest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+            f.write('\n')
+        os.replace(tmp_path, manifest_path)
+
+# Function to check a site's published source file. Returns None when it is fine, otherwise why it is not.
+# The file is checked against the checksum and size of the registry, or else against the record of its
+# fetch, so a file damaged after it was fetched is noticed. Files placed by hand without either are trusted.
+# The content hash is only recomputed when the file's size or modification time changed.
+def source_problem(site, path):
+    if not os.path.exists(path):
+        return 'missing'
+
+    expected = {key: value for key, value in get_site(site).source.items() if key in ('sha256', 'size')}
+    if not expected:
+        record = read_sources_manifest(os.path.dirname(path)).get(os.path.basename(path))
+        expected = {key: record[key] for key in ('sha256', 'size')} if record else {}
+
+    fingerprint = file_fingerprint(path)
+    if 'size' in expected and fingerprint['size'] != expected['size']:
+        return f"{fingerprint['size']} bytes, expected {expected['size']}"
+    if 'sha256' in expected and fingerprint['sha256'] != expected['sha256'].lower():
+        return f"SHA-256 {fingerprint['sha256'][:12]}..., expected {expected['sha256'][:12]}..."
+    return None
+
+# Function to fetch a site's source file and publish it. The file is fetched to <path>.part, resuming what
+# an interrupted fetch left there, verified against the registry's checksum and size and only then renamed
+# into place, so a truncated or corrupt file is never published. A resumed file that fails verification is
+# fetched once more from scratch. A source without a sha256 is refused unless it sets "verify": false.
+# Returns the path of the published file.
+@instrumented
+def fetch_site_source(site, path=None, source=None):
+    path = site_source_path(site) if path is None else path
+    source = resolve_source(site) if source is None else source
+    fetcher = SOURCE_FETCHERS.get(source.get('type'))
+    if fetcher is None:
+        raise ValueError(f"Site '{site}' has no supported source: {source}")
+    if source.get('sha256') is None and source.get('verify', True):
+        raise ValueError(f"Site '{site}' has no sha256 to verify its file against, pin it in the source or set \"verify\": false")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    part_path = f"{path}.part"
+    for attempt in range(2):
+        resumed = part_size(part_path) > 0
+        size = fetcher(source, part_path)
+        try:
+            sha256 = verify_file(part_path, source.get('size', size), source.get('sha256'))
+            break
+        except ValueError:
+            os.remove(part_path)
+            if attempt or not resumed:
+                raise
+
+    os.replace(part_path, path)
+    record_source(path, {'size': os.path.getsize(path), 'sha256': sha256, 'source': source.get('type'), 'fetched_at': time.time()})
+    return path
+
+# Function to make sure a site's source file is published and intact, fetching it when it is missing or damaged
+def ensure_site_source(site, path=None):
+    path = site_source_path(site) if path is None else path
+    problem = source_problem(site, path)
+    if problem is None:
+        return path
+
+    if problem != 'missing':
+        print(f"{site} source file {path} is damaged ({problem}), fetching it again")
+        os.remove(path)
+    else:
+        print(f"Fetching {site} data...")
+    return fetch_site_source(site, path)
+
+# Function to check one site's source file and fetch it when needed, timed.
+# Errors are returned instead of raised so that one failing site does not affect the others.
+def ensure_site_source_timed(site, data_dir, force):
+    start = time.perf_counter()
+    path = site_source_path(site, data_dir)
+    try:
+        if force or source_problem(site, path) is not None:
+            fetch_site_source(site, path)
+            status = 'fetched'
+        else:
+            status = 'present'
+        error = None
+    except Exception as e:
+        status, error = 'failed', f"{type(e).__name__}: {e}"
+    return status, error, time.perf_counter() - start
+
+# Function to make sure the source files of several sites are published and intact, all registered sites by default.
+# Missing or damaged files are fetched concurrently with up to max_workers fetches at a time, so a fresh
+# deployment waits about as long as its slowest file. With force=True every file is fetched again.
+# Returns a report with the status, size, seconds and error of each site.
+def fetch_site_sources(sites=None, max_workers=DEFAULT_FETCH_WORKERS, force=False, data_dir=DATA_DIR):
+    sites = list_sites() if sites is None else list(sites)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sites) or 1))) as executor:
+        futures = {site: executor.submit(ensure_site_source_timed, site, data_dir, force) for site in sites}
+        results = {site: future.result() for site, future in futures.items()}
+
+    paths = {site: site_source_path(site, data_dir) for site in sites}
+    return pd.DataFrame({
+        'status': [status for status, _, _ in results.values()],
+        'bytes': [os.path.getsize(paths[site]) if os.path.exists(paths[site]) else 0 for site in sites],
+        'seconds': [seconds for _, _, seconds in results.values()],
+        'error': [error for _, error, _ in results.values()],
+    }, index=pd.Index(sites, name='site'))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fetch and verify the sites' source files.")
+    parser.add_argument('--sites', nargs='+', help='sites to fetch, all registered sites by default')
+    parser.add_argument('--workers', type=int, default=DEFAULT_FETCH_WORKERS, help='files fetched at the same time')
+    parser.add_argument('--force', action='store_true', help='fetch every file again, intact or not')
+    args = parser.parse_args()
+
+    report = fetch_site_sources(args.sites, args.workers, args.force)
+    print(report.to_string())
@@ -0,0 +1,148 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.colors import LogNorm
+
+# Number of bins along each axis of the density plots
+DEFAULT_BINS = 60
+
+# Bins with at most this many rows are sparse, their rows can be overlaid as individual points
+SPARSE_BIN_COUNT = 3
+
+# Upper limit of the outlier points overlaid on a panel
+MAX_OUTLIER_POINTS = 2000
+
+# Function to get equal-width bin edges covering the values of a column, ignoring NaN
+def bin_edges(values, bins=DEFAULT_BINS):
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return np.linspace(0, 1, bins + 1)
+    low, high = values.min(), values.max()
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    return np.linspace(low, high, bins + 1)
+
+# Function to get the bin of every row along one axis for equal-width edges, -1 for values outside the edges or NaN.
+# The bins are computed arithmetically, which is much faster than the binary search np.histogram2d does.
+def bin_index(values, edges):
+    bins = len(edges) - 1
+    with np.errstate(invalid='ignore'):
+        scaled = (values - edges[0]) * (bins / (edges[-1] - edges[0]))
+        index = np.floor(scaled).astype('int64')
+    # The last edge is inclusive, like np.histogram
+    index[scaled == bins] = bins - 1
+    index[np.isnan(values) | (index < 0) | (index >= bins)] = -1
+    return index
+
+# Function to aggregate rows into 2-D bins from their bin indices along each axis.
+# Returns the count per bin, and the mean of a third column per bin when values are given (NaN for empty bins).
+def binned_statistic(x_bins, y_bins, shape, values=None):
+    valid = (x_bins >= 0) & (y_bins >= 0)
+    if values is not None:
+        valid &= ~np.isnan(values)
+    flat = x_bins[valid] * shape[1] + y_bins[valid]
+    counts = np.bincount(flat, minlength=shape[0] * shape[1]).reshape(shape)
+    if values is None:
+        return counts, None
+
+    sums = np.bincount(flat, weights=values[valid], minlength=shape[0] * shape[1]).reshape(shape)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(counts > 0, sums / counts, np.nan)
+    return counts, means
+
+# Function to select the rows that fall into sparse bins, where a density plot hides them.
+# The sample is stratified by bin: every sparse bin keeps its rows up to an equal share of max_points.
+def sparse_bin_sample(x_bins, y_bins, counts, max_points=MAX_OUTLIER_POINTS, sparse_count=SPARSE_BIN_COUNT, seed=0):
+    rows = np.flatnonzero((x_bins >= 0) & (y_bins >= 0))
+    bins = x_bins[rows] * counts.shape[1] + y_bins[rows]
+    sparse = counts.ravel()[bins] <= sparse_count
+    rows, bins = rows[sparse], bins[sparse]
+    if len(rows) <= max_points:
+        return rows
+
+    # Shuffle, then keep the first rows of every bin up to the per-bin share
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(rows))
+    rows, bins = rows[order], bins[order]
+    share = max(1, max_points // len(np.unique(bins)))
+    order = np.argsort(bins, kind='stable')
+    rows, bins = rows[order], bins[order]
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    rank = np.arange(len(bins)) - np.repeat(starts, np.diff(np.r_[starts, len(bins)]))
+    return np.sort(rows[rank < share][:max_points])
+
+# Function to draw the density of two columns on an axis as a rasterized image of their bins.
+# Bins are shaded by their count on a log scale, or by the mean of a third column.
+# Returns the image so a colorbar can be added.
+def draw_density(ax, x, y, x_edges, y_edges, x_bins, y_bins, values=None, show_outliers=False, cmap='viridis'):
+    counts, means = binned_statistic(x_bins, y_bins, (len(x_edges) - 1, len(y_edges) - 1), values)
+    if means is None:
+        shading = np.ma.masked_equal(counts, 0)
+        norm = LogNorm(vmin=1, vmax=max(1, counts.max()))
+    else:
+        shading = np.ma.masked_invalid(means)
+        norm = None
+    image = ax.imshow(shading.T, origin='lower', aspect='auto', interpolation='nearest', cmap=cmap, norm=norm,
+                      extent=(x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]), rasterized=True)
+
+    if show_outliers:
+        rows = sparse_bin_sample(x_bins, y_bins, counts)
+        ax.scatter(x[rows], y[rows], s=4, c='red', alpha=0.7, linewidths=0, rasterized=True)
+
+    return image
+
+# Function to draw the histogram of a column on an axis from its bin counts
+def draw_histogram(ax, index, edges):
+    counts = np.bincount(index[index >= 0], minlength=len(edges) - 1)
+    ax.stairs(counts, edges, fill=True, alpha=0.7)
+
+# Function to plot a pair grid of columns as binned densities, in the layout of sns.pairplot.
+# The diagonal shows each column's histogram. The other panels show the 2-D density of the two
+# columns, shaded by count or by the mean of color_by. Drawing cost depends on the bins, not the rows.
+def plot_density_pair_grid(data, columns, bins=DEFAULT_BINS, color_by=None, show_outliers=False):
+    values = {column: data[column].to_numpy(dtype='float64') for column in columns}
+    edges = {column: bin_edges(values[column], bins) for column in columns}
+    indices = {column: bin_index(values[column], edges[column]) for column in columns}
+    shade = data[color_by].to_numpy(dtype='float64') if color_by is not None else None
+
+    k = len(columns)
+    figure, axes = plt.subplots(k, k, figsize=(2.5 * k, 2.5 * k), squeeze=False)
+    image = None
+    for i, row_column in enumerate(columns):
+        for j, column in enumerate(columns):
+            ax = axes[i, j]
+            if i == j:
+                draw_histogram(ax, indices[column], edges[column])
+            else:
+                image = draw_density(ax, values[column], values[row_column], edges[column], edges[row_column],
+                                    indices[column], indices[row_column], shade, show_outliers)
+            if i == k - 1:
+                ax.set_xlabel(column)
+            else:
+                ax.tick_params(labelbottom=False)
+            if j == 0:
+                ax.set_ylabel(row_column)
+            elif i != j:
+                ax.tick_params(labelleft=False)
+
+    if image is not None:
+        figure.colorbar(image, ax=axes, shrink=0.6, label=f"Mean {color_by}" if color_by else 'Count')
+    return figure
+
+# Function to aggregate a bubble chart into 2-D bins of x and y.
+# Returns the bin centers of the occupied bins with the mean size and color values of their rows.
+def binned_bubbles(x, y, sizes, colors, bins=DEFAULT_BINS // 2):
+    x_edges = bin_edges(x, bins)
+    y_edges = bin_edges(y, bins)
+    x_bins = bin_index(x, x_edges)
+    y_bins = bin_index(y, y_edges)
+    counts, mean_sizes = binned_statistic(x_bins, y_bins, (bins, bins), sizes)
+    _, mean_colors = binned_statistic(x_bins, y_bins, (bins, bins), colors)
+
+    x_index, y_index = np.nonzero(counts > 0)
+    return {
+        'x': (x_edges[x_index] + x_edges[x_index + 1]) / 2,
+        'y': (y_edges[y_index] + y_edges[y_index + 1]) / 2,
+        'count': counts[x_index, y_index],
+        'size': mean_sizes[x_index, y_index],
+        'color': mean_colors[x_index, y_index],
+    }
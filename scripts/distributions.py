@@ -0,0 +1,86 @@
+import numpy as np
+
+# Number of bins of the base histogram. Every bin count that divides it is derived exactly by
+# merging neighbouring bins, and the KDE is evaluated on its grid.
+BASE_BINS = 3600
+
+# Bin counts offered by the distribution views, all divisors of BASE_BINS
+BIN_CHOICES = [10, 15, 20, 24, 30, 36, 40, 45, 50, 60, 72, 90, 120, 180, 360]
+
+# Function to build the base histogram of a column once.
+# Holds the fine-grained bin counts over the range of the values together with the count, mean and
+# standard deviation needed for the KDE bandwidth, so views never have to scan the values again.
+def base_histogram(values, bins=BASE_BINS):
+    values = np.asarray(values, dtype='float64')
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return {'edges': np.linspace(0, 1, bins + 1), 'counts': np.zeros(bins, dtype='int64'), 'n': 0, 'mean': np.nan, 'std': np.nan}
+
+    low, high = values.min(), values.max()
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    edges = np.linspace(low, high, bins + 1)
+
+    # Equal-width bins are computed arithmetically, the last edge is inclusive like np.histogram
+    index = np.minimum(((values - low) * (bins / (high - low))).astype('int64'), bins - 1)
+    counts = np.bincount(index, minlength=bins)
+
+    return {'edges': edges, 'counts': counts, 'n': len(values), 'mean': values.mean(), 'std': values.std(ddof=1) if len(values) > 1 else 0.0}
+
+# Function to re-bin a base histogram to a coarser number of equal-width bins over the same range.
+# Bin counts that divide the base bins are exact, others split base bins proportionally.
+def rebin(histogram, bins):
+    counts = histogram['counts']
+    edges = np.linspace(histogram['edges'][0], histogram['edges'][-1], bins + 1)
+    if len(counts) % bins == 0:
+        return counts.reshape(bins, -1).sum(axis=1), edges
+
+    # Interpolate the cumulative counts at the new edges
+    cumulative = np.r_[0, np.cumsum(counts)].astype('float64')
+    return np.diff(np.interp(edges, histogram['edges'], cumulative)), edges
+
+# Function to get the Scott's rule bandwidth of a histogram's values, like scipy's gaussian_kde uses by default
+def scott_bandwidth(histogram):
+    if histogram['n'] < 2:
+        return 0.0
+    return histogram['std'] * histogram['n'] ** (-1 / 5)
+
+# Function to compute a Gaussian KDE on the base histogram's grid by FFT convolution, in O(bins log bins).
+# The curve is scaled to counts per bin of the given width, so it overlays a histogram with that bin width.
+# Returns the bin centers and the curve.
+def binned_kde(histogram, bin_width=None, bandwidth=None):
+    counts = histogram['counts'].astype('float64')
+    edges = histogram['edges']
+    centers = (edges[:-1] + edges[1:]) / 2
+    step = edges[1] - edges[0]
+    bandwidth = scott_bandwidth(histogram) if bandwidth is None else bandwidth
+    bin_width = step if bin_width is None else bin_width
+
+    if histogram['n'] == 0 or bandwidth <= 0:
+        return centers, counts * (bin_width / step)
+
+    # Gaussian kernel sampled on the grid out to 4 bandwidths, or the whole range when that is shorter
+    half_width = min(len(counts) - 1, int(np.ceil(4 * bandwidth / step)))
+    offsets = np.arange(-half_width, half_width + 1) * step
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+
+    # Linear convolution through zero-padded real FFTs
+    size = len(counts) + len(kernel) - 1
+    fft_size = 1 << (size - 1).bit_length()
+    convolved = np.fft.irfft(np.fft.rfft(counts, fft_size) * np.fft.rfft(kernel, fft_size), fft_size)
+    density = convolved[half_width:half_width + len(counts)]
+
+    return centers, np.maximum(density, 0) * bin_width
+
+# Function to draw a histogram from a base histogram on an axis, with its KDE curve on top
+def draw_distribution(ax, histogram, bins=30, color='blue', kde=True, label=None):
+    counts, edges = rebin(histogram, bins)
+    ax.stairs(counts, edges, fill=True, color=color, alpha=0.4, label=label)
+    ax.stairs(counts, edges, color=color, linewidth=0.8)
+    if kde:
+        x, y = binned_kde(histogram, bin_width=edges[1] - edges[0])
+        ax.plot(x, y, color=color, linewidth=1.5)
+
+# Function to build the base histograms of several columns of a dataset
+def base_histograms(data, columns):
+    return {column: base_histogram(data[column].to_numpy()) for column in columns if column in data.columns}
@@ -0,0 +1,81 @@
+import numpy as np
+
+# Points drawn per horizontal pixel. Two per pixel lets the min/max envelope show the low and the
+# high of every pixel column, more points cannot be told apart on screen.
+POINTS_PER_PIXEL = 2
+
+# Downsampling modes by the name shown in the dashboard
+DOWNSAMPLING_METHODS = {'Min/Max Envelope': 'minmax', 'LTTB': 'lttb'}
+
+# Function to get the number of points worth drawing for a plot that is width_px pixels wide
+def point_budget(width_px, points_per_pixel=POINTS_PER_PIXEL):
+    return max(3, int(width_px * points_per_pixel))
+
+# Function to get the pixel width of a matplotlib figure
+def figure_width_px(figure):
+    return figure.get_size_inches()[0] * figure.dpi
+
+# Function to drop the points where either coordinate is missing
+def drop_missing(x, y):
+    valid = ~np.isnan(y)
+    if np.issubdtype(x.dtype, np.floating):
+        valid &= ~np.isnan(x)
+    elif np.issubdtype(x.dtype, np.datetime64):
+        valid &= ~np.isnat(x)
+    return x[valid], y[valid]
+
+# Function to reduce a series to the minimum and maximum of each of n_out / 2 equal-count buckets.
+# The two points of a bucket are kept in their original order, so peaks and dips always survive.
+def minmax_downsample(x, y, n_out):
+    buckets = max(1, n_out // 2)
+    size = int(np.ceil(len(y) / buckets))
+    buckets = int(np.ceil(len(y) / size))
+
+    # Pad the last bucket so the values can be viewed as a (buckets, size) block
+    padded = np.full(buckets * size, np.nan)
+    padded[:len(y)] = y
+    block = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    lows = offsets + np.argmin(np.where(np.isnan(block), np.inf, block), axis=1)
+    highs = offsets + np.argmax(np.where(np.isnan(block), -np.inf, block), axis=1)
+
+    keep = np.unique(np.concatenate([lows, highs]))
+    return x[keep], y[keep]
+
+# Function to reduce a series with Largest-Triangle-Three-Buckets (Steinarsson, 2013).
+# The first and last points are kept, and from each bucket in between the point that forms the
+# largest triangle with the previously kept point and the mean of the next bucket.
+def lttb_downsample(x, y, n_out):
+    n = len(y)
+    xs = x.astype('int64').astype('float64') if np.issubdtype(x.dtype, np.datetime64) else x.astype('float64')
+    edges = np.linspace(1, n - 1, n_out - 1).astype('int64')
+
+    keep = np.empty(n_out, dtype='int64')
+    keep[0] = 0
+    keep[-1] = n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = xs[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+
+        # Twice the triangle area, the factor does not change which point is largest
+        area = np.abs((xs[previous] - next_x) * (y[start:end] - y[previous])
+                      - (xs[previous] - xs[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        keep[i + 1] = previous
+
+    return x[keep], y[keep]
+
+# Function to reduce a series to at most n_out points for plotting.
+# Missing values are dropped and series that already fit the budget are returned as they are.
+def downsample(x, y, n_out, method='minmax'):
+    x, y = drop_missing(np.asarray(x), np.asarray(y, dtype='float64'))
+    if len(y) <= n_out:
+        return x, y
+    if method == 'minmax':
+        return minmax_downsample(x, y, n_out)
+    if method == 'lttb':
+        return lttb_downsample(x, y, n_out)
+    raise ValueError(f"Unknown downsampling method '{method}'")
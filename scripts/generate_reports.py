@@ -0,0 +1,196 @@
+import argparse
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+# Render without a display, in this process and in the workers
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from artifacts import data_fingerprint, read_manifest, stale_jobs, write_manifest
+from instrumentation import span
+from load_data import load_site_data
+from site_registry import get_site, list_sites
+import bubble_chart
+import correlation_analysis
+import data_analysis
+import histogram
+import temperature_analysis
+import time_series_analysis
+import wind_analysis
+import zscore_analysis
+
+# One figure (or table) of the reports: the analysis and site it belongs to, the function that
+# prepares the site's cleaned data for it (None to use the data as loaded), the plot function
+# that is called with the prepared data followed by args, and the files it writes relative to
+# the results directory (by default results/<analysis>/<site>/<last argument>)
+FigureJob = namedtuple('FigureJob', ['analysis', 'site', 'prepare', 'plot', 'args', 'outputs'], defaults=[None])
+
+# Analyses in the order their jobs are listed
+ANALYSES = ['summary_stats', 'histograms', 'time_series_analysis', 'correlation_analysis', 'wind_analysis',
+            'temperature_analysis', 'zscore_analysis', 'bubble_charts']
+
+# Data of the sites loaded by this worker process, and the same data prepared per job kind
+_site_data = {}
+_prepared_data = {}
+
+# Function to list the report jobs of a site, with the file names the analysis scripts use
+def site_jobs(site):
+    name = site.capitalize()
+    prefix = get_site(site).result_prefix
+    jobs = [FigureJob('summary_stats', site, None, data_analysis.save_summary_statistics, (site,),
+                      [f"summary_stats/{site}_summary_stats.csv"])]
+
+    for variable in ['GHI', 'DNI', 'DHI', 'WS', 'Tamb']:
+        jobs.append(FigureJob('histograms', site, histogram.preprocess_data, histogram.plot_histogram,
+                              (variable, site, f"{name}_{variable}_Histogram.png")))
+
+    labels = {'GHI': 'GHI (W/m^2)', 'Tamb': 'Temperature (°C)', 'DHI': 'DHI (W/m^2)', 'DNI': 'DNI (W/m^2)'}
+    for column, ylabel in labels.items():
+        jobs.append(FigureJob('time_series_analysis', site, time_series_analysis.preprocess_data, time_series_analysis.plot_time_series,
+                              (column, site, ylabel, f"{prefix}_{column}_Time_Series.png")))
+    for column, ylabel in labels.items():
+        jobs.append(FigureJob('time_series_analysis', site, time_series_analysis.time_series_rollup, time_series_analysis.plot_by_month,
+                              (column, site, ylabel, f"{prefix}_{column}_by_Month.png")))
+        jobs.append(FigureJob('time_series_analysis', site, time_series_analysis.time_series_rollup, time_series_analysis.plot_by_hour,
+                              (column, site, ylabel, f"{prefix}_{column}_by_Hour.png")))
+    jobs.append(FigureJob('time_series_analysis', site, time_series_analysis.preprocess_data, time_series_analysis.evaluate_cleaning_impact,
+                          (['ModA', 'ModB'], site, prefix),
+                          [f"time_series_analysis/{site}/{prefix}_{sensor}_cleaning_impact.png" for sensor in ['ModA', 'ModB']]))
+
+    solar_columns = correlation_analysis.solar_columns
+    wind_columns = correlation_analysis.wind_columns
+    jobs += [
+        FigureJob('correlation_analysis', site, None, correlation_analysis.plot_correlation_matrix,
+                  (site, solar_columns, f'{name} - Correlation Matrix (Solar Radiation & Temperature)', f'{name}_Correlation_Matrix.png')),
+        FigureJob('correlation_analysis', site, None, correlation_analysis.plot_pair_plot,
+                  (site, solar_columns, f'{name} - Pair Plot (Solar Radiation & Temperature)', f'{name}_Pair_Plot.png')),
+        FigureJob('correlation_analysis', site, None, correlation_analysis.plot_scatter_matrix,
+                  (site, wind_columns, f'{name} - Scatter Matrix (Wind Conditions & Solar Irradiance)', f'{name}_Scatter_Matrix.png')),
+    ]
+
+    jobs += [
+        FigureJob('wind_analysis', site, wind_analysis.preprocess_wind_data, wind_analysis.plot_radial_bar_wind_speed,
+                  (site, f'{name}_Wind_Speed_Distribution.png')),
+        FigureJob('wind_analysis', site, wind_analysis.preprocess_wind_data, wind_analysis.plot_wind_rose,
+                  (site, f'{name}_Wind_Rose.png')),
+    ]
+
+    temperature_plots = [
+        (temperature_analysis.plot_scatter_rh_temp, 'RH_vs_Temperature'),
+        (temperature_analysis.plot_scatter_rh_sr, 'RH_vs_Solar_Radiation'),
+        (temperature_analysis.plot_correlation_matrix, 'Correlation_Matrix'),
+        (temperature_analysis.plot_rh_vs_temp_regression, 'RH_vs_Temperature_Regression'),
+        (temperature_analysis.plot_rh_vs_sr_regression, 'RH_vs_Solar_Radiation_Regression'),
+    ]
+    for plot, suffix in temperature_plots:
+        jobs.append(FigureJob('temperature_analysis', site, temperature_analysis.preprocess_temp_data, plot,
+                              (site, f'{name}_{suffix}.png')))
+
+    jobs.append(FigureJob('zscore_analysis', site, zscore_analysis.site_z_scores, zscore_analysis.plot_z_scores,
+                          (site, f'{name}_Zscore_Distribution.png')))
+    jobs.append(FigureJob('bubble_charts', site, None, bubble_chart.plot_bubble_chart,
+                          (site, f'{name}_GHI_vs_Tamb_vs_WS_bubble_chart.png')))
+
+    return [job if job.outputs else job._replace(outputs=[f"{job.analysis}/{site}/{job.args[-1]}"]) for job in jobs]
+
+# Function to list the report jobs of several sites, optionally limited to some analyses
+def build_jobs(sites, analyses=None):
+    jobs = [job for site in sites for job in site_jobs(site)]
+    if analyses is not None:
+        jobs = [job for job in jobs if job.analysis in analyses]
+    return jobs
+
+# Function to load and clean a site into the cache (in a worker), returning its number of rows
+def load_site(site):
+    _site_data[site] = load_site_data(site)
+    return len(_site_data[site])
+
+# Function to get a site's data prepared for a job, once per worker process.
+# The preparation works on a shallow copy since the preprocessing functions add and replace columns.
+def prepared_data(site, prepare):
+    if site not in _site_data:
+        _site_data[site] = load_site_data(site)
+    if prepare is None:
+        return _site_data[site]
+
+    key = (site, prepare.__module__, prepare.__name__)
+    if key not in _prepared_data:
+        _prepared_data[key] = prepare(_site_data[site].copy(deep=False))
+    return _prepared_data[key]
+
+# Function to run a single job in a worker process. Errors are returned so one failing figure does not stop the others.
+def run_job(job):
+    start = time.perf_counter()
+    try:
+        with span(f"generate_reports.{job.analysis}", key=job.site, plot=job.plot.__name__):
+            job.plot(prepared_data(job.site, job.prepare), *job.args)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        plt.close('all')
+    return time.perf_counter() - start, error
+
+# Function to regenerate the stale results of the given sites (all registered sites by default).
+# A result is stale when its source data, cleaning version, plot code or parameters changed since the
+# manifest recorded it, or when its file is missing. Only the sites with stale results are loaded, each
+# once, then the stale jobs run on a process pool. With dry_run nothing is loaded or written.
+# Returns a report with the reason, seconds and error of every stale job.
+def generate_reports(sites=None, analyses=None, max_workers=None, force=False, dry_run=False):
+    sites = list_sites() if sites is None else list(sites)
+    manifest = read_manifest()
+    stale = stale_jobs(build_jobs(sites, analyses), manifest, force, persist=not dry_run)
+
+    results = [(float('nan'), None)] * len(stale)
+    if stale and not dry_run:
+        stale_sites = list(dict.fromkeys(job.site for job, _, _ in stale))
+        max_workers = max_workers or os.cpu_count() or 1
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # Clean the sites first so the figure jobs only read the cache
+            for site, rows in zip(stale_sites, executor.map(load_site, stale_sites)):
+                print(f"Loaded {site}: {rows} rows")
+
+            results = list(executor.map(run_job, [job for job, _, _ in stale]))
+
+        # Sites that were downloaded by the load only have a fingerprint now
+        fingerprints = {site: data_fingerprint(site) for site in stale_sites}
+        for (job, inputs, _), (_, error) in zip(stale, results):
+            if error is None:
+                manifest[job.outputs[0]] = {**inputs, 'data': fingerprints[job.site], 'outputs': job.outputs}
+        write_manifest(manifest)
+
+    return pd.DataFrame({
+        'analysis': [job.analysis for job, _, _ in stale],
+        'site': [job.site for job, _, _ in stale],
+        'output': [job.outputs[0] for job, _, _ in stale],
+        'reason': [reason for _, _, reason in stale],
+        'seconds': [seconds for seconds, _ in results],
+        'error': [error for _, error in results],
+    })
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Regenerate the figures and tables in results/ whose inputs changed.')
+    parser.add_argument('--sites', nargs='+', help='sites to generate, all registered sites by default')
+    parser.add_argument('--analyses', nargs='+', choices=ANALYSES, help='analyses to generate, all by default')
+    parser.add_argument('--workers', type=int, help='number of worker processes, the CPU count by default')
+    parser.add_argument('--force', action='store_true', help='regenerate all results, stale or not')
+    parser.add_argument('--dry-run', action='store_true', help='only list the results that would be regenerated')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = generate_reports(args.sites, args.analyses, args.workers, args.force, args.dry_run)
+
+    if args.dry_run:
+        for _, row in report.iterrows():
+            print(f"Would regenerate {row['output']} ({row['reason']})")
+        print(f"{len(report)} results are stale")
+    else:
+        failed = report[report['error'].notna()]
+        print(f"Regenerated {len(report) - len(failed)} of {len(report)} stale results in {time.perf_counter() - start:.1f}s")
+        for _, row in failed.iterrows():
+            print(f"Failed {row['output']}: {row['error']}")
@@ -1,14 +1,14 @@
 import pandas as pd
 import matplotlib.pyplot as plt
-import seaborn as sns
+from distributions import base_histogram, draw_distribution
 
 # Import load_data.py as a module
 from load_data import load_and_clean_data
-
-# Load and assign the cleaned data
-benin_data, sierraleone_data, togo_data = load_and_clean_data()
+from results import results_path
+from instrumentation import instrumented
 
 # Preprocess Data to Extract Relevant Variables
+@instrumented
 def preprocess_data(data):
     data['GHI'] = pd.to_numeric(data['GHI'], errors='coerce')
     data['DNI'] = pd.to_numeric(data['DNI'], errors='coerce')
@@ -21,45 +21,52 @@ def preprocess_data(data):
     return data
 
 # Function to plot histograms for different variables
+@instrumented
 def plot_histogram(data, variable, data_name, save_as):
     plt.figure(figsize=(8, 6))
-    sns.histplot(data[variable], kde=True, bins=30)
+    # The KDE is computed by FFT on the binned values instead of over every sample
+    draw_distribution(plt.gca(), base_histogram(data[variable].to_numpy()), bins=30, color='C0')
     plt.title(f'Histogram of {variable} ({data_name})')
     plt.xlabel(variable)
     plt.ylabel('Frequency')
     plt.tight_layout()
-    plt.savefig(f"../results/histograms/{data_name}/{save_as}")
+    plt.savefig(results_path('histograms', data_name, save_as))
     plt.close()
 
-# ########################### Histograms for Benin ###########################
+# Run the analysis for all sites when executed as a script, importing the module only defines its functions
+if __name__ == '__main__':
+    # Load and assign the cleaned data
+    benin_data, sierraleone_data, togo_data = load_and_clean_data(["benin", "sierraleone", "togo"])
+
+    # ########################### Histograms for Benin ###########################
 
-data1 = preprocess_data(benin_data)
+    data1 = preprocess_data(benin_data)
 
-# Plot Histograms for each variable
-plot_histogram(data1, 'GHI', 'benin', 'Benin_GHI_Histogram.png')
-plot_histogram(data1, 'DNI', 'benin', 'Benin_DNI_Histogram.png')
-plot_histogram(data1, 'DHI', 'benin', 'Benin_DHI_Histogram.png')
-plot_histogram(data1, 'WS', 'benin', 'Benin_WS_Histogram.png')
-plot_histogram(data1, 'Tamb', 'benin', 'Benin_Tamb_Histogram.png')
+    # Plot Histograms for each variable
+    plot_histogram(data1, 'GHI', 'benin', 'Benin_GHI_Histogram.png')
+    plot_histogram(data1, 'DNI', 'benin', 'Benin_DNI_Histogram.png')
+    plot_histogram(data1, 'DHI', 'benin', 'Benin_DHI_Histogram.png')
+    plot_histogram(data1, 'WS', 'benin', 'Benin_WS_Histogram.png')
+    plot_histogram(data1, 'Tamb', 'benin', 'Benin_Tamb_Histogram.png')
 
-# ########################### Histograms for Sierraleone ###########################
+    # ########################### Histograms for Sierraleone ###########################
 
-data2 = preprocess_data(sierraleone_data)
+    data2 = preprocess_data(sierraleone_data)
 
-# Plot Histograms for each variable
-plot_histogram(data2, 'GHI', 'sierraleone', 'Sierraleone_GHI_Histogram.png')
-plot_histogram(data2, 'DNI', 'sierraleone', 'Sierraleone_DNI_Histogram.png')
-plot_histogram(data2, 'DHI', 'sierraleone', 'Sierraleone_DHI_Histogram.png')
-plot_histogram(data2, 'WS', 'sierraleone', 'Sierraleone_WS_Histogram.png')
-plot_histogram(data2, 'Tamb', 'sierraleone', 'Sierraleone_Tamb_Histogram.png')
+    # Plot Histograms for each variable
+    plot_histogram(data2, 'GHI', 'sierraleone', 'Sierraleone_GHI_Histogram.png')
+    plot_histogram(data2, 'DNI', 'sierraleone', 'Sierraleone_DNI_Histogram.png')
+    plot_histogram(data2, 'DHI', 'sierraleone', 'Sierraleone_DHI_Histogram.png')
+    plot_histogram(data2, 'WS', 'sierraleone', 'Sierraleone_WS_Histogram.png')
+    plot_histogram(data2, 'Tamb', 'sierraleone', 'Sierraleone_Tamb_Histogram.png')
 
-# ########################### Histograms for Togo ###########################
+    # ########################### Histograms for Togo ###########################
 
-data3 = preprocess_data(togo_data)
+    data3 = preprocess_data(togo_data)
 
-# Plot Histograms for each variable
-plot_histogram(data3, 'GHI', 'togo', 'Togo_GHI_Histogram.png')
-plot_histogram(data3, 'DNI', 'togo', 'Togo_DNI_Histogram.png')
-plot_histogram(data3, 'DHI', 'togo', 'Togo_DHI_Histogram.png')
-plot_histogram(data3, 'WS', 'togo', 'Togo_WS_Histogram.png')
-plot_histogram(data3, 'Tamb', 'togo', 'Togo_Tamb_Histogram.png')
\ No newline at end of file
+    # Plot Histograms for each variable
+    plot_histogram(data3, 'GHI', 'togo', 'Togo_GHI_Histogram.png')
+    plot_histogram(data3, 'DNI', 'togo', 'Togo_DNI_Histogram.png')
+    plot_histogram(data3, 'DHI', 'togo', 'Togo_DHI_Histogram.png')
+    plot_histogram(data3, 'WS', 'togo', 'Togo_WS_Histogram.png')
+    plot_histogram(data3, 'Tamb', 'togo', 'Togo_Tamb_Histogram.png')
@@ -0,0 +1,221 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Instrumentation switch from the environment: off when empty, 'on' to record time and rows, 'memory' to also
+# trace peak allocations with tracemalloc, which slows allocation-heavy code down
+INSTRUMENTATION = os.environ.get('SOLAR_INSTRUMENTATION', '').strip().lower()
+
+# File the spans are logged to as JSON lines, standard error by default
+INSTRUMENTATION_LOG = os.environ.get('SOLAR_INSTRUMENTATION_LOG') or None
+
+# Logger of the finished spans, one JSON object per line
+logger = logging.getLogger('solar.instrumentation')
+
+# Whether spans are recorded and logged in every thread, and whether they trace memory
+_settings = {'enabled': False, 'memory': False}
+
+# Spans of the current thread: the open ones, the list collecting the finished ones for a caller
+# (e.g. one dashboard rerun), and whether that collector traces memory
+_open_spans = contextvars.ContextVar('open_spans', default=())
+_collector = contextvars.ContextVar('span_collector', default=None)
+_collect_memory = contextvars.ContextVar('span_collect_memory', default=False)
+
+# Function to turn the instrumentation on for every thread of this process, logging each finished span as JSON.
+# Spans are logged to log_path when given, otherwise to standard error.
+def enable_instrumentation(memory=False, log_path=None):
+    _settings['enabled'] = True
+    _settings['memory'] = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    if not logger.handlers:
+        handler = logging.FileHandler(log_path) if log_path else logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+# Function to turn the process-wide instrumentation off again, collectors keep working
+def disable_instrumentation():
+    _settings['enabled'] = False
+    _settings['memory'] = False
+
+# Function to tell whether spans are recorded in the current thread, the only check made when they are not
+def is_recording():
+    return _settings['enabled'] or _collector.get() is not None
+
+# Function to get the number of rows of a DataFrame, Series or array, None for anything else
+def count_rows(value):
+    shape = getattr(value, 'shape', None)
+    return int(shape[0]) if shape else None
+
+# A stage of the pipeline being measured: its wall time, the CPU time of its thread, the peak of the
+# memory it allocated while tracemalloc traces, and the rows it took in and gave out.
+# Spans nest, each records its parent. A finished span is logged as JSON when the instrumentation is
+# on and handed to the current thread's collector, if any. With several threads allocating at the same
+# time, the traced peak of a span also counts the other threads' allocations.
+class Span:
+    __slots__ = ('name', 'fields', 'parent', 'depth', '_wall', '_cpu', '_memory', '_start_traced', '_peak', '_token')
+
+    def __init__(self, name, rows_in=None, **fields):
+        self.name = name
+        self.fields = {'rows_in': rows_in, 'rows_out': None, **fields}
+
+    # Record rows_out or other fields of the span while it runs
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def __enter__(self):
+        stack = _open_spans.get()
+        self.parent = stack[-1].name if stack else None
+        self.depth = len(stack)
+        self._memory = tracemalloc.is_tracing() and (_settings['memory'] or _collect_memory.get())
+        if self._memory:
+            _fold_peak(stack)
+            self._start_traced = tracemalloc.get_traced_memory()[0]
+            self._peak = self._start_traced
+        self._token = _open_spans.set(stack + (self,))
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.thread_time() - self._cpu
+        _open_spans.reset(self._token)
+        peak_mb = None
+        if self._memory and tracemalloc.is_tracing():
+            _fold_peak(_open_spans.get() + (self,))
+            peak_mb = (self._peak - self._start_traced) / 1024 / 1024
+
+        record = {'span': self.name, 'parent': self.parent, 'depth': self.depth, 'wall_s': wall, 'cpu_s': cpu,
+                  'peak_mb': peak_mb, **self.fields, 'error': exc_type.__name__ if exc_type else None,
+                  'time': time.time(), 'pid': os.getpid(), 'thread': threading.current_thread().name}
+        collector = _collector.get()
+        if collector is not None:
+            collector.append(record)
+        if _settings['enabled']:
+            logger.info(json.dumps(record, default=str))
+        return False
+
+# Function to fold tracemalloc's peak since the last fold into the open spans, then restart the peak.
+# tracemalloc keeps a single peak, so it is folded at every span boundary to give each span its own.
+def _fold_peak(spans):
+    peak = tracemalloc.get_traced_memory()[1]
+    for span in spans:
+        if span._memory:
+            span._peak = max(span._peak, peak)
+    tracemalloc.reset_peak()
+
+# Span that records nothing, handed out while the instrumentation is off
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+# Function to measure a stage of the pipeline in a with block, e.g. with span('read_csv', site=site) as s: ... s.set(rows_out=len(data))
+# Costs a single check and returns a span that records nothing while the instrumentation is off.
+def span(name, rows_in=None, **fields):
+    if not is_recording():
+        return NULL_SPAN
+    return Span(name, rows_in, **fields)
+
+# Decorator measuring every call of a function as a span named after its module and function.
+# The rows of the first argument with rows and of the result are recorded, and the first argument is recorded
+# as the span's key when it is a string, e.g. the site. Calls go straight through while the instrumentation is off.
+def instrumented(function=None, *, name=None):
+    def decorate(function):
+        span_name = name or f"{function.__module__.rsplit('.', 1)[-1]}.{function.__name__}"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not is_recording():
+                return function(*args, **kwargs)
+            fields = {'key': args[0]} if args and isinstance(args[0], str) else {}
+            rows_in = next((rows for rows in map(count_rows, args) if rows is not None), None)
+            with Span(span_name, rows_in, **fields) as current:
+                result = function(*args, **kwargs)
+                current.set(rows_out=count_rows(result))
+            return result
+        return wrapper
+
+    return decorate(function) if function is not None else decorate
+
+# Function to start collecting the finished spans of the current thread, e.g. at the top of a dashboard rerun.
+# With memory=True the spans also trace their peak allocations. Returns a handle for stop_collecting().
+def start_collecting(memory=False):
+    spans = []
+    started = memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    return spans, _collector.set(spans), _collect_memory.set(memory), started
+
+# Function to stop collecting spans, returns the finished spans in the order they finished
+def stop_collecting(handle):
+    spans, token, memory_token, started = handle
+    try:
+        _collector.reset(token)
+        _collect_memory.reset(memory_token)
+    except ValueError:
+        # The handle was made in another context, e.g. by a dashboard rerun that was interrupted in another thread
+        pass
+    if started and not _settings['memory']:
+        tracemalloc.stop()
+    return spans
+
+# Context manager collecting the finished spans of the current thread into a list
+@contextmanager
+def collect_spans(memory=False):
+    handle = start_collecting(memory)
+    try:
+        yield handle[0]
+    finally:
+        stop_collecting(handle)
+
+# Function to put finished spans back in call order. Spans finish after their children, so the children
+# finished at depth d + 1 since the last span at depth d are that span's, and come right after it.
+def call_order(spans):
+    subtrees = {}
+    for record in spans:
+        children = subtrees.pop(record['depth'] + 1, [])
+        subtrees.setdefault(record['depth'], []).append([record] + [child for subtree in children for child in subtree])
+    return [record for depth in sorted(subtrees) for subtree in subtrees[depth] for record in subtree]
+
+# Fields every span records, the others are shown as the details of a stage
+SPAN_FIELDS = {'span', 'parent', 'depth', 'wall_s', 'cpu_s', 'peak_mb', 'rows_in', 'rows_out', 'key', 'time', 'pid', 'thread'}
+
+# Function to arrange finished spans as a table in call order, each stage indented by its depth
+def spans_frame(spans):
+    ordered = call_order(spans)
+    return pd.DataFrame({
+        'stage': ['  ' * record['depth'] + record['span'] + (f" ({record['key']})" if record.get('key') else '') for record in ordered],
+        'wall_ms': [record['wall_s'] * 1000 for record in ordered],
+        'cpu_ms': [record['cpu_s'] * 1000 for record in ordered],
+        'peak_mb': pd.array([record['peak_mb'] for record in ordered], dtype='Float64'),
+        'rows_in': pd.array([record.get('rows_in') for record in ordered], dtype='Int64'),
+        'rows_out': pd.array([record.get('rows_out') for record in ordered], dtype='Int64'),
+        'details': [', '.join(f"{field}={value}" for field, value in record.items() if field not in SPAN_FIELDS and value is not None)
+                    for record in ordered],
+    })
+
+# Turn the instrumentation on from the environment, e.g. SOLAR_INSTRUMENTATION=on for a report run
+if INSTRUMENTATION:
+    enable_instrumentation(memory=INSTRUMENTATION == 'memory', log_path=INSTRUMENTATION_LOG)
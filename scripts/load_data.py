@@ -1,186 +1,252 @@
-import gdown
 import pandas as pd
 import os
-
-def download_from_gdrive(file_id, output_path):
-    url = f"https://drive.google.com/uc?id={file_id}"
-    gdown.download(url, output_path, quiet=False)
-
-def load_and_clean_data():
-
-    file_ids = {
-        "benin": "1fpqN0RjgTaXGcz-LoueOy0nlvGa_BbWV",  
-        "sierraleone": "1uV5DbK2XOHdzYZewJw31nxSuFuOCOZ9B",  
-        "togo": "1UFoqU5jN6OYt64Fy0kpFYrzj3pITXMQR"  
-    }
-
-    # Define local paths to save the data temporarily
-    base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'temp_data'))
-    os.makedirs(base_path, exist_ok=True)  
-    
-    # Define file paths for each dataset
-    benin_path = os.path.join(base_path, 'benin-malanville.csv')
-    sierraleone_path = os.path.join(base_path, 'sierraleone-bumbuna.csv')
-    togo_path = os.path.join(base_path, 'togo-dapaong_qc.csv')
-
-    # Download files only if they don't exist
-    if not os.path.exists(benin_path):
-        print("Downloading Benin data...")
-        download_from_gdrive(file_ids["benin"], benin_path)
-
-    if not os.path.exists(sierraleone_path):
-        print("Downloading Sierra Leone data...")
-        download_from_gdrive(file_ids["sierraleone"], sierraleone_path)
-
-    if not os.path.exists(togo_path):
-        print("Downloading Togo data...")
-        download_from_gdrive(file_ids["togo"], togo_path)
-    
-    # Load the data (after confirming they are downloaded)
-    data1 = pd.read_csv(benin_path)
-    data2 = pd.read_csv(sierraleone_path)
-    data3 = pd.read_csv(togo_path)
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from scripts.cleaning import CLEANING_RULES_VERSION, apply_cleaning_rules, rules_fingerprint
+    from scripts.schema import DROPPED_COLUMNS, SCHEMA_VERSION, apply_schema, parse_timestamps, read_dtypes
+    from scripts.site_registry import get_site, list_sites
+    from scripts.data_sources import DATA_DIR, ensure_site_source, fetch_site_sources, site_source_path
+    from scripts.column_store import read_column_store, read_column_store_time_bounds, write_column_store
+    from scripts.data_cache import read_cached_rollup, read_cached_site, read_cached_time_bounds, write_cached_rollup, write_cached_site, write_cached_site_chunks
+    from scripts.rollups import build_rollup, update_rollup
+    from scripts.streaming import DEFAULT_CHUNKSIZE, stream_clean
+    from scripts.instrumentation import instrumented, span
+except ImportError:
+    from cleaning import CLEANING_RULES_VERSION, apply_cleaning_rules, rules_fingerprint
+    from schema import DROPPED_COLUMNS, SCHEMA_VERSION, apply_schema, parse_timestamps, read_dtypes
+    from site_registry import get_site, list_sites
+    from data_sources import DATA_DIR, ensure_site_source, fetch_site_sources, site_source_path
+    from column_store import read_column_store, read_column_store_time_bounds, write_column_store
+    from data_cache import read_cached_rollup, read_cached_site, read_cached_time_bounds, write_cached_rollup, write_cached_site, write_cached_site_chunks
+    from rollups import build_rollup, update_rollup
+    from streaming import DEFAULT_CHUNKSIZE, stream_clean
+    from instrumentation import instrumented, span
+
+# Define local paths to save the data temporarily, see DATA_DIR in data_sources.py
+base_path = DATA_DIR
+
+# Backends serving the cleaned data: the Parquet cache, read into memory by every process, or the column
+# store, memory-mapped read-only so all processes on a host share one copy in the page cache
+DATA_BACKENDS = ['parquet', 'memmap']
+DEFAULT_BACKEND = os.environ.get('SOLAR_DATA_BACKEND', 'parquet')
+
+# Function to get the version of a site's cleaned data, which covers the cleaning engine, the column schema and the site's rules.
+# Streaming mode caps with approximate quartiles, so its results are cached under their own version.
+def site_rules_version(site, streaming=False):
+    version = f"{CLEANING_RULES_VERSION}-{SCHEMA_VERSION}-{rules_fingerprint(get_site(site).cleaning_rules)}"
+    return f"{version}-streaming" if streaming else version
+
+# Function to apply the cleaning rules of a single site.
+# The data is cleaned in place and cast to the schema dtypes, and a per-column cleaning report is returned.
+def clean_site_data(site, data):
+    with span('load_data.clean_site_data', rows_in=len(data), key=site) as current:
+        report = apply_cleaning_rules(data, get_site(site).cleaning_rules)
+        apply_schema(data)
+        current.set(rows_out=len(data))
+    return report
+
+# Function to prepare a raw site dataset or chunk for cleaning
+def prepare_raw_data(data):
+    # Change the data type of the timestamp column to pandas datetime object, using the station format
+    with span('load_data.parse_timestamps', rows_in=len(data)):
+        data['Timestamp'] = parse_timestamps(data['Timestamp'])
 
     """
-    # Print the first few rows of each data set to verify successful load
-    print(data1.head())
-    print(data2.head())
-    print(data3.head()) """
-
-    # Change the data type of the timestamp column to pandas datetime object (datetime64[ns])
-    data1['Timestamp'] = pd.to_datetime(data1['Timestamp'])
-    data2['Timestamp'] = pd.to_datetime(data2['Timestamp'])
-    data3['Timestamp'] = pd.to_datetime(data3['Timestamp'])
-
-    """
-    # Check the data types of the columns
-    print(data1.dtypes)
-    print(data2.dtypes)
-    print(data3.dtypes)
-
     # Check for missing data
-    print(data1.isnull().sum())
-    print(data2.isnull().sum())
-    print(data3.isnull().sum())
+    print(data.isnull().sum())
 
     Result: The column called 'Comments' is empty.
     """
 
     # Drop the 'Comments' column
-    data1.drop(columns=['Comments'], inplace=True)
-    data2.drop(columns=['Comments'], inplace=True)
-    data3.drop(columns=['Comments'], inplace=True)
-
-    # Define a function to check for negative values and outliers
-    def check_negative_and_outliers(data, column, expected_range=None):
-        # Define a list of columns where negative values are acceptable
-        valid_negative_columns = ['Tamb', 'TModA', 'TModB']
-
-        # Check for negative values only if the column is not in the valid list
-        if column not in valid_negative_columns and (data[column] < 0).any():
-            print(f"Negative values found in {column}. Converting to positive.")
-            data[column] = data[column].abs()
-
-        # Check for outliers using IQR (Interquartile Range) method, if no expected range is provided
-        if expected_range is None:
-            Q1 = data[column].quantile(0.25)
-            Q3 = data[column].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-            outliers = data[(data[column] < lower_bound) | (data[column] > upper_bound)]
-
-            if not outliers.empty:
-                print(f"Outliers found in {column}. Replacing with capped values.")
-                # For other columns, replace outliers by capping them at the threshold
-                data[column] = data[column].clip(lower=lower_bound, upper=upper_bound)
-                print(f"Outliers in {column} replaced with capped values.")
-
-        else:
-            # Check for values outside the expected range
-            lower_bound, upper_bound = expected_range
-            outliers = data[(data[column] < lower_bound) | (data[column] > upper_bound)]
-
-            if not outliers.empty:
-                print(f"Values outside expected range found in {column}. Replacing with capped values.")
-
-                # Special handling for the 'Cleaning' column (binary data: 0 or 1)
-                if column == 'Cleaning':
-                    # Handle case when there is no mode in 'Cleaning' (e.g., if all values are outliers)
-                    if data[column].mode().empty:
-                        print(f"No mode found for {column}, handling outliers differently.")
-                        # Use threshold for outliers in 'Cleaning'
-                        data.loc[outliers.index, column] = 0  # or any default value (0 or 1)
-                        print(f"Outliers in {column} replaced with default value 0.")
-                    else:
-                        mode_value = data[column].mode()[0]  # Get the most frequent value (mode)
-                        data.loc[outliers.index, column] = mode_value
-                        print(f"Outliers in {column} replaced with mode value {mode_value}.")
-                else:
-                    # For other columns, replace outliers by capping them at the threshold
-                    data[column] = data[column].clip(lower=lower_bound, upper=upper_bound)
-                    print(f"Outliers in {column} replaced with capped values.")
-
-    # Apply checks to all relevant columns in each dataset
-    print("Applying checks for data1")
-    check_negative_and_outliers(data1, 'GHI')
-    check_negative_and_outliers(data1, 'DNI')
-    check_negative_and_outliers(data1, 'DHI')
-    check_negative_and_outliers(data1, 'ModA')
-    check_negative_and_outliers(data1, 'ModB')
-    check_negative_and_outliers(data1, 'Tamb')
-    check_negative_and_outliers(data1, 'RH', expected_range=(0, 100))
-    check_negative_and_outliers(data1, 'WS')
-    check_negative_and_outliers(data1, 'WSgust')
-    check_negative_and_outliers(data1, 'WSstdev')
-    check_negative_and_outliers(data1, 'WD', expected_range=(0, 360))
-    check_negative_and_outliers(data1, 'WDstdev')
-    check_negative_and_outliers(data1, 'BP', expected_range=(900, 1050))
-    check_negative_and_outliers(data1, 'Cleaning', expected_range=(0, 1))
-    check_negative_and_outliers(data1, 'Precipitation', expected_range=(0, None))
-    check_negative_and_outliers(data1, 'TModA')
-    check_negative_and_outliers(data1, 'TModB')
-
-    # Repeat for the other data2
-    print("Applying checks for data2")
-    check_negative_and_outliers(data1, 'GHI', expected_range=(0, 4000))
-    check_negative_and_outliers(data2, 'DNI', expected_range=(0, 2000))
-    check_negative_and_outliers(data2, 'DHI', expected_range=(0, 2000))
-    check_negative_and_outliers(data2, 'ModA')
-    check_negative_and_outliers(data2, 'ModB')
-    check_negative_and_outliers(data2, 'Tamb', expected_range=(-50, 50))
-    check_negative_and_outliers(data2, 'RH', expected_range=(0, 100))
-    check_negative_and_outliers(data2, 'WS', expected_range=(0, 100))
-    check_negative_and_outliers(data2, 'WSgust', expected_range=(0, 100))
-    check_negative_and_outliers(data2, 'WSstdev', expected_range=(0, 100))
-    check_negative_and_outliers(data2, 'WD', expected_range=(0, 360))
-    check_negative_and_outliers(data2, 'WDstdev', expected_range=(0, 360))
-    check_negative_and_outliers(data2, 'BP', expected_range=(900, 1050))
-    check_negative_and_outliers(data2, 'Cleaning', expected_range=(0, 1))
-    check_negative_and_outliers(data2, 'Precipitation', expected_range=(0, None))
-    check_negative_and_outliers(data2, 'TModA', expected_range=(-50, 50))
-    check_negative_and_outliers(data2, 'TModB', expected_range=(-50, 50))
-    check_negative_and_outliers(data2, 'GHI', expected_range=(0, 1000))
-
-    # Repeat for the other data3
-    print("Applying checks for data3")
-    check_negative_and_outliers(data1, 'GHI', expected_range=(0, 4000))
-    check_negative_and_outliers(data3, 'DNI', expected_range=(0, 2000))
-    check_negative_and_outliers(data3, 'DHI', expected_range=(0, 2000))
-    check_negative_and_outliers(data3, 'ModA')
-    check_negative_and_outliers(data3, 'ModB')
-    check_negative_and_outliers(data3, 'Tamb', expected_range=(-50, 50))
-    check_negative_and_outliers(data3, 'RH', expected_range=(0, 100))
-    check_negative_and_outliers(data3, 'WS', expected_range=(0, 100))
-    check_negative_and_outliers(data3, 'WSgust', expected_range=(0, 100))
-    check_negative_and_outliers(data3, 'WSstdev', expected_range=(0, 100))
-    check_negative_and_outliers(data3, 'WD', expected_range=(0, 360))
-    check_negative_and_outliers(data3, 'WDstdev', expected_range=(0, 360))
-    check_negative_and_outliers(data3, 'BP', expected_range=(900, 1050))
-    check_negative_and_outliers(data3, 'Cleaning', expected_range=(0, 1))
-    check_negative_and_outliers(data3, 'Precipitation', expected_range=(0, None))
-    check_negative_and_outliers(data3, 'TModA', expected_range=(-50, 50))
-    check_negative_and_outliers(data3, 'TModB', expected_range=(-50, 50))
-    check_negative_and_outliers(data3, 'GHI', expected_range=(0, 1000))
-
-    return data1, data2, data3
\ No newline at end of file
+    data.drop(columns=[column for column in DROPPED_COLUMNS if column in data.columns], inplace=True)
+
+    return data
+
+# Function to read a raw site CSV with the dtypes of the station schema
+def read_site_csv(path):
+    with span('load_data.read_csv', key=os.path.basename(path)) as current:
+        data = pd.read_csv(path, dtype=read_dtypes())
+        current.set(rows_out=len(data))
+    return prepare_raw_data(data)
+
+# Function to read a raw site CSV in chunks.
+# The dtypes come from the station schema so every chunk has the same schema.
+def read_site_chunks(path, chunksize):
+    for chunk in pd.read_csv(path, chunksize=chunksize, dtype=read_dtypes()):
+        yield prepare_raw_data(chunk)
+
+# Function to select columns and a time range from a site's cleaned data
+def select_site_data(data, columns=None, start=None, end=None):
+    if start is not None:
+        data = data[data['Timestamp'] >= pd.Timestamp(start)]
+    if end is not None:
+        data = data[data['Timestamp'] <= pd.Timestamp(end)]
+    if columns is not None:
+        data = data[['Timestamp'] + [column for column in columns if column != 'Timestamp']]
+    return data.reset_index(drop=True)
+
+# Function to clean a site CSV chunk by chunk into the cache, for files that do not fit in memory.
+# The aggregate cube is updated with every cleaned chunk and cached as well. Returns the cleaning report.
+@instrumented
+def stream_site_to_cache(site, path, chunksize=DEFAULT_CHUNKSIZE):
+    rules = get_site(site).cleaning_rules
+    rules_version = site_rules_version(site, streaming=True)
+    rollup = {'cube': None}
+
+    def cleaned_chunks(chunks):
+        for chunk in chunks:
+            apply_schema(chunk)
+            rollup['cube'] = update_rollup(rollup['cube'], chunk)
+            yield chunk
+
+    report = stream_clean(
+        lambda: read_site_chunks(path, chunksize),
+        rules,
+        lambda chunks: write_cached_site_chunks(site, path, rules_version, cleaned_chunks(chunks)),
+    )
+    write_cached_rollup(site, path, rules_version, rollup['cube'])
+    return report
+
+# Function to load the cleaned data of a single site, from the cache when it is up to date.
+# With a chunksize the site is cleaned in streaming mode, reading the CSV chunksize rows at a time.
+# With the memmap backend the data is mapped from the site's column store, built on first use.
+@instrumented
+def load_site_data(site, columns=None, start=None, end=None, use_cache=True, chunksize=None, backend=None):
+    backend = backend or DEFAULT_BACKEND
+    if backend not in DATA_BACKENDS:
+        raise ValueError(f"Unknown data backend '{backend}', expected one of {DATA_BACKENDS}")
+    # Fetch the source file when it is missing or damaged, see data_sources.py
+    path = ensure_site_source(site)
+
+    rules_version = site_rules_version(site, streaming=chunksize is not None)
+
+    # The column store is built once from the cleaned data, then every load maps it
+    if use_cache and backend == 'memmap':
+        mapped = read_column_store(site, path, rules_version, columns=columns, start=start, end=end)
+        if mapped is not None:
+            return mapped
+        write_column_store(site, path, rules_version, load_site_data(site, chunksize=chunksize, backend='parquet'))
+        return read_column_store(site, path, rules_version, columns=columns, start=start, end=end)
+
+    if use_cache:
+        cached = read_cached_site(site, path, rules_version, columns=columns, start=start, end=end)
+        if cached is not None:
+            return cached
+
+    # Streaming mode always goes through the cache, only the selected part is read back
+    if chunksize is not None:
+        stream_site_to_cache(site, path, chunksize)
+        return read_cached_site(site, path, rules_version, columns=columns, start=start, end=end)
+
+    data = read_site_csv(path)
+    clean_site_data(site, data)
+
+    if use_cache:
+        write_cached_site(site, path, rules_version, data)
+
+    if columns is None and start is None and end is None:
+        return data
+    return select_site_data(data, columns, start, end)
+
+# Function to get the first and last timestamp of a site's cleaned data from the metadata of its cache, without loading it.
+# The column store is used with the memmap backend, the Parquet footer otherwise.
+# Returns None when the site has not been cleaned into the cache yet, (None, None) when it has no rows.
+def load_site_time_bounds(site, chunksize=None, backend=None):
+    path = site_source_path(site)
+    if not os.path.exists(path):
+        return None
+    rules_version = site_rules_version(site, streaming=chunksize is not None)
+    if (backend or DEFAULT_BACKEND) == 'memmap':
+        bounds = read_column_store_time_bounds(site, path, rules_version)
+        if bounds is not None:
+            return bounds
+    return read_cached_time_bounds(site, path, rules_version)
+
+# Function to load a site's aggregate cube (count, sum, m2, min and max per variable, day and hour), from the
+# cache when it is up to date. The cube is built from data when given, otherwise from the site's cleaned data.
+@instrumented
+def load_site_rollup(site, data=None, use_cache=True, chunksize=None):
+    path = site_source_path(site)
+    rules_version = site_rules_version(site, streaming=chunksize is not None)
+    if use_cache and os.path.exists(path):
+        cube = read_cached_rollup(site, path, rules_version)
+        if cube is not None:
+            return cube
+
+    if data is None:
+        data = load_site_data(site, use_cache=use_cache, chunksize=chunksize)
+        # Streaming mode caches the cube while it cleans the site
+        if use_cache and chunksize is not None:
+            cube = read_cached_rollup(site, path, rules_version)
+            if cube is not None:
+                return cube
+
+    cube = build_rollup(data)
+    if use_cache:
+        write_cached_rollup(site, path, rules_version, cube)
+    return cube
+
+# Function to load a single site in a worker process.
+# Errors are returned instead of raised so that one failing site does not affect the others.
+def load_site_timed(site, options):
+    start = time.perf_counter()
+    try:
+        data, error = load_site_data(site, **options), None
+    except Exception as e:
+        data, error = None, f"{type(e).__name__}: {e}"
+    return data, error, time.perf_counter() - start
+
+# Function to load several sites in parallel over a process pool.
+# Returns a dict of the cleaned data per site, in the order of sites (None for failed sites),
+# and a report with the rows, seconds and error of each site.
+def load_sites_parallel(sites, max_workers=None, **options):
+    max_workers = max_workers or max(1, min(len(sites), os.cpu_count() or 1))
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {site: executor.submit(load_site_timed, site, options) for site in sites}
+        for site, future in futures.items():
+            try:
+                results[site] = future.result()
+            except Exception as e:
+                # The worker process itself died, e.g. it ran out of memory
+                results[site] = None, f"{type(e).__name__}: {e}", float('nan')
+
+    frames = {site: data for site, (data, _, _) in results.items()}
+    report = pd.DataFrame({
+        'rows': [len(data) if data is not None else 0 for data, _, _ in results.values()],
+        'seconds': [seconds for _, _, seconds in results.values()],
+        'error': [error for _, error, _ in results.values()],
+    }, index=pd.Index(list(results), name='site'))
+
+    return frames, report
+
+# Load the cleaned data of the given sites, all registered sites by default, as a tuple in the order of sites.
+# Columns and a time range can be selected so that warm starts only read what a view needs,
+# and a chunksize switches to streaming mode for files larger than memory.
+# backend='memmap' maps the sites' column stores instead of reading them, see DATA_BACKENDS.
+# With parallel=True the sites are loaded and cleaned at the same time in separate processes, and a site that
+# fails to fetch or load is returned as None with its error printed, so it does not stop the other sites.
+@instrumented
+def load_and_clean_data(sites=None, columns=None, start=None, end=None, use_cache=True, chunksize=None, parallel=False, max_workers=None, backend=None):
+    sites = list_sites() if sites is None else list(sites)
+
+    # Missing source files are fetched concurrently up front rather than one by one as each site loads
+    fetched = fetch_site_sources(sites)
+    fetch_errors = fetched['error'].dropna()
+    if not parallel and not fetch_errors.empty:
+        raise RuntimeError("Failed to fetch " + "; ".join(f"{site}: {error}" for site, error in fetch_errors.items()))
+
+    options = {'columns': columns, 'start': start, 'end': end, 'use_cache': use_cache, 'chunksize': chunksize, 'backend': backend}
+
+    if parallel:
+        # Failures are kept per site: sites that could not be fetched are not loaded, the others load all the same
+        frames, report = load_sites_parallel([site for site in sites if site not in fetch_errors.index], max_workers, **options)
+        for site, error in {**fetch_errors.to_dict(), **report['error'].dropna().to_dict()}.items():
+            print(f"Failed to load {site}: {error}")
+        return tuple(frames.get(site) for site in sites)
+
+    return tuple(load_site_data(site, **options) for site in sites)
@@ -0,0 +1,143 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Rows whose absolute Z-score is above this are flagged as outliers
+ZSCORE_THRESHOLD = 3
+
+# Scaling of the median absolute deviation that makes it estimate the standard deviation of normal data
+MAD_SCALE = 1.4826
+
+# Scoring methods by the name shown in the dashboard
+ZSCORE_METHODS = {'Population (Mean/Std)': 'population', 'Robust (Median/MAD)': 'robust', 'Rolling Window': 'rolling'}
+
+# Time windows offered for rolling Z-scores, centered on each row
+ROLLING_WINDOWS = ['1h', '6h', '1D', '7D', '30D']
+
+# Rolling windows with fewer valid values than this get no score
+MIN_PERIODS = 30
+
+# Outliers of a dataset. The mask holds one variable per row and one data row per column.
+# counts is a Series of flagged rows per variable, center and scale Series per variable (None for rolling scores), column_rows the flagged row positions per variable,
+# rows the positions of rows flagged in any variable, timestamps their timestamps and row_zscores the Z-scores of those rows per variable.
+# The Z-scores of the other rows are not kept.
+OutlierResult = namedtuple('OutlierResult', ['variables', 'mask', 'counts', 'column_rows', 'rows', 'timestamps', 'row_zscores', 'center', 'scale'])
+
+# Function to get the rows of the time window centered on every timestamp, as [lo, hi) positions.
+# The timestamps are int64 nanoseconds in ascending order.
+def rolling_window_bounds(times, window):
+    half = pd.Timedelta(window).value // 2
+    return np.searchsorted(times, times - half, 'left'), np.searchsorted(times, times + half, 'right')
+
+# Function to compute the mean and sample standard deviation of every window from prefix sums, in O(n) after the bounds.
+# Values are shifted by their overall mean first, which keeps the sum of squares from cancelling out.
+# Windows with fewer than min_periods valid values get NaN.
+def rolling_moments(values, lo, hi, min_periods=MIN_PERIODS):
+    valid = ~np.isnan(values)
+    offset = values[valid].mean() if valid.any() else 0.0
+    shifted = np.where(valid, values - offset, 0.0)
+
+    counts = np.cumsum(np.r_[0, valid])
+    counts = counts[hi] - counts[lo]
+    sums = np.cumsum(np.r_[0.0, shifted])
+    sums = sums[hi] - sums[lo]
+    squares = np.cumsum(np.r_[0.0, shifted * shifted])
+    squares = squares[hi] - squares[lo]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums / counts
+        std = np.sqrt(np.maximum(squares - sums * mean, 0) / (counts - 1))
+    enough = counts >= max(min_periods, 2)
+    return np.where(enough, mean + offset, np.nan), np.where(enough & (std > 0), std, np.nan)
+
+# Function to compute rolling Z-scores of several variables as one 2-D array with one variable per row.
+# Every row is scored against the mean and standard deviation of the time window centered on it.
+# With by_hour the window only holds rows of the same hour of day, so a row is compared with the
+# same hour on the neighbouring days and a night-time GHI spike stands out.
+def rolling_zscore_matrix(data, variables, window='1D', by_hour=False, dtype='float64', min_periods=MIN_PERIODS):
+    times = data['Timestamp'].to_numpy(dtype='datetime64[ns]').view('int64')
+    order = np.arange(len(times)) if np.all(times[1:] >= times[:-1]) else np.argsort(times, kind='stable')
+
+    if by_hour:
+        hours = (times[order] // 3_600_000_000_000) % 24
+        groups = [order[hours == hour] for hour in range(24)]
+    else:
+        groups = [order]
+
+    zscores = np.full((len(variables), len(data)), np.nan, dtype=dtype)
+    columns = [data[variable].to_numpy(dtype='float64') for variable in variables]
+    for rows in groups:
+        lo, hi = rolling_window_bounds(times[rows], window)
+        for j, values in enumerate(columns):
+            values = values[rows]
+            mean, std = rolling_moments(values, lo, hi, min_periods)
+            zscores[j, rows] = (values - mean) / std
+    return zscores
+
+# Function to compute the Z-scores of several variables as one 2-D array with one variable per row.
+# The population method scores against the mean and sample standard deviation, like
+# (x - x.mean()) / x.std(), the robust method against the median and the scaled MAD.
+# The rolling method scores every row against its time window, see rolling_zscore_matrix, and has no single center or scale.
+# Statistics are computed in float64 whatever the dtype of the scores. NaN values get a NaN score.
+def zscore_matrix(data, variables, method='population', dtype='float64', window='1D', by_hour=False):
+    if method == 'rolling':
+        return rolling_zscore_matrix(data, variables, window, by_hour, dtype), None, None
+
+    zscores = np.empty((len(variables), len(data)), dtype=dtype)
+    for j, variable in enumerate(variables):
+        zscores[j] = data[variable].to_numpy(dtype=dtype)
+
+    if method == 'population':
+        center = np.nanmean(zscores, axis=1, dtype='float64')
+        scale = np.nanstd(zscores, axis=1, dtype='float64', ddof=1)
+    elif method == 'robust':
+        center = np.nanmedian(zscores, axis=1).astype('float64')
+        scale = np.array([np.nanmedian(np.abs(zscores[j] - center[j])) for j in range(len(variables))]) * MAD_SCALE
+    else:
+        raise ValueError(f"Unknown Z-score method '{method}'")
+
+    # Constant columns have no spread, their scores are NaN rather than infinite
+    with np.errstate(invalid='ignore', divide='ignore'):
+        zscores -= center.astype(dtype)[:, None]
+        zscores /= np.where(scale > 0, scale, np.nan).astype(dtype)[:, None]
+    return zscores, center, scale
+
+# Function to find the outliers of several variables in one vectorized pass.
+# Returns an OutlierResult: the mask, the flagged positions and the scores of the flagged rows, the full score matrix is dropped.
+def find_outliers(data, variables, threshold=ZSCORE_THRESHOLD, method='population', dtype='float32', window='1D', by_hour=False):
+    zscores, center, scale = zscore_matrix(data, variables, method, dtype, window, by_hour)
+
+    # NaN scores compare as False, so missing values are never flagged
+    with np.errstate(invalid='ignore'):
+        mask = np.abs(zscores) > threshold
+
+    counts = pd.Series(mask.sum(axis=1), index=pd.Index(variables, name='variable'), name='outliers')
+    column_rows = {variable: np.flatnonzero(mask[j]) for j, variable in enumerate(variables)}
+    rows = np.flatnonzero(mask.any(axis=0))
+    timestamps = data['Timestamp'].to_numpy()[rows] if 'Timestamp' in data.columns else None
+    row_zscores = {variable: zscores[j, rows] for j, variable in enumerate(variables)}
+
+    if center is not None:
+        center, scale = pd.Series(center, index=counts.index), pd.Series(scale, index=counts.index)
+    return OutlierResult(variables, mask, counts, column_rows, rows, timestamps, row_zscores, center, scale)
+
+# Function to summarize the outliers of each variable as a small table, with the center and scale when the method has them
+def outlier_summary(result):
+    total = result.mask.shape[1]
+    summary = pd.DataFrame({
+        'outliers': result.counts,
+        'percent': result.counts / max(total, 1) * 100,
+    })
+    if result.center is not None:
+        summary.insert(0, 'center', result.center)
+        summary.insert(1, 'scale', result.scale)
+    return summary
+
+# Function to get the flagged rows of a dataset with their Z-scores, limited to max_rows rows
+def flagged_rows(data, result, max_rows=None):
+    rows = result.rows if max_rows is None else result.rows[:max_rows]
+    flagged = data.iloc[rows][['Timestamp'] + list(result.variables)].reset_index(drop=True)
+    for variable in result.variables:
+        flagged[f"{variable}_z"] = result.row_zscores[variable][:len(rows)]
+    return flagged
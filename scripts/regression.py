@@ -0,0 +1,73 @@
+import numpy as np
+
+# Columns whose sufficient statistics are kept per site, any regression between them can be solved without the rows
+REGRESSION_COLUMNS = ['RH', 'Tamb', 'GHI', 'WS', 'BP']
+
+# Function to accumulate the sufficient statistics of ordinary least squares over some columns in one pass.
+# Keeps the row count, the column means, the centered cross-product matrix (X'X around the means, so large
+# offsets like BP do not cancel out) and the column ranges. Only rows complete for all columns are used.
+def sufficient_statistics(data, columns=REGRESSION_COLUMNS):
+    block = np.column_stack([data[column].to_numpy(dtype='float64') for column in columns])
+    block = block[~np.isnan(block).any(axis=1)]
+
+    mean = block.mean(axis=0) if len(block) else np.full(len(columns), np.nan)
+    block -= mean
+    return {
+        'columns': list(columns),
+        'n': len(block),
+        'mean': mean,
+        'cross': block.T @ block,
+        'min': block.min(axis=0) + mean if len(block) else mean,
+        'max': block.max(axis=0) + mean if len(block) else mean,
+    }
+
+# Function to solve several regressions from the same sufficient statistics.
+# models is a list of (target, predictors) pairs; models with the same number of predictors are solved
+# in one batched np.linalg.solve. Returns one dict per model with the intercept, coefficients and R².
+def fit_models(stats, models):
+    position = {column: i for i, column in enumerate(stats['columns'])}
+    fits = [None] * len(models)
+
+    by_size = {}
+    for m, (target, predictors) in enumerate(models):
+        by_size.setdefault(len(predictors), []).append(m)
+
+    for size, indices in by_size.items():
+        x = np.array([[position[p] for p in models[m][1]] for m in indices])
+        y = np.array([position[models[m][0]] for m in indices])
+
+        # Normal equations around the means: Sxx b = Sxy, the intercept follows from the means
+        sxx = stats['cross'][x[:, :, None], x[:, None, :]]
+        sxy = stats['cross'][x, y[:, None]]
+        syy = stats['cross'][y, y]
+        try:
+            coef = np.linalg.solve(sxx, sxy[:, :, None])[:, :, 0]
+        except np.linalg.LinAlgError:
+            # Collinear or constant predictors, fall back to the minimum-norm solution
+            coef = (np.linalg.pinv(sxx) @ sxy[:, :, None])[:, :, 0]
+        intercept = stats['mean'][y] - np.einsum('ij,ij->i', coef, stats['mean'][x])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            r2 = np.einsum('ij,ij->i', coef, sxy) / syy
+
+        for i, m in enumerate(indices):
+            target, predictors = models[m]
+            fits[m] = {
+                'target': target,
+                'predictors': list(predictors),
+                'intercept': float(intercept[i]),
+                'coef': dict(zip(predictors, coef[i].tolist())),
+                'r2': float(r2[i]),
+                'n': stats['n'],
+            }
+    return fits
+
+# Function to solve a single regression of target on predictors from the sufficient statistics
+def fit_model(stats, target, predictors):
+    return fit_models(stats, [(target, list(predictors))])[0]
+
+# Function to get the two endpoints of a univariate fitted line over the predictor's range
+def regression_line(fit, stats):
+    predictor = fit['predictors'][0]
+    i = stats['columns'].index(predictor)
+    x = np.array([stats['min'][i], stats['max'][i]])
+    return x, fit['intercept'] + fit['coef'][predictor] * x
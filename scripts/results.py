@@ -0,0 +1,11 @@
+import os
+
+# Directory the analysis scripts write their figures and tables to, laid out as results/<analysis>/<site>/.
+# Can be pointed elsewhere through the environment, e.g. to compare a regeneration with the committed results.
+RESULTS_DIR = os.environ.get('SOLAR_RESULTS_DIR', os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'results')))
+
+# Function to get the path of a result file, creating its directory when needed
+def results_path(analysis, site, file_name):
+    directory = os.path.join(RESULTS_DIR, analysis, site) if site else os.path.join(RESULTS_DIR, analysis)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, file_name)
@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+
+try:
+    from scripts.schema import FLOAT_COLUMNS
+except ImportError:
+    from schema import FLOAT_COLUMNS
+
+# The cube is stored at its finest grain, one cell per variable, day and hour.
+# Every coarser grain is combined from these cells.
+CELL_KEYS = ['Variable', 'Day', 'Hour']
+
+# Statistics kept per cell. m2 is the sum of squared deviations from the cell mean, which combines
+# exactly across cells (Chan et al.) without the cancellation of a raw sum of squares.
+CELL_STATS = ['count', 'sum', 'm2', 'min', 'max']
+
+# Keys of each grain the cube can be rolled up to
+GRAINS = {
+    'month': ['Month'],
+    'hour': ['Hour'],
+    'month_hour': ['Month', 'Hour'],
+    'day': ['Day'],
+}
+
+# Function to group sorted hour numbers into cells.
+# Returns the cell of every value and the position where each cell starts.
+def hour_cells(hours):
+    starts = np.flatnonzero(np.r_[True, hours[1:] != hours[:-1]])
+    cells = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(hours)]))
+    return cells, starts
+
+# Function to build the rollup cube of a dataset in one vectorized pass per variable.
+# Returns one row per variable, day and hour with the count, sum, m2, min and max of the values, ignoring NaN.
+def build_rollup(data, variables=None):
+    variables = [variable for variable in (variables or FLOAT_COLUMNS) if variable in data.columns]
+
+    # Hours since the epoch, the station files are in time order so sorting is usually skipped
+    hours = data['Timestamp'].to_numpy().astype('datetime64[h]').astype('int64')
+    order = None
+    if len(hours) and (np.diff(hours) < 0).any():
+        order = np.argsort(hours, kind='stable')
+        hours = hours[order]
+    cells, starts = hour_cells(hours)
+    cell_hours = hours[starts]
+
+    frames = []
+    for variable in variables:
+        values = data[variable].to_numpy(dtype='float64')
+        if order is not None:
+            values = values[order]
+        valid = ~np.isnan(values)
+
+        count = np.bincount(cells[valid], minlength=len(starts))
+        total = np.bincount(cells[valid], weights=values[valid], minlength=len(starts))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+        deviations = values[valid] - mean[cells[valid]]
+        m2 = np.bincount(cells[valid], weights=deviations * deviations, minlength=len(starts))
+
+        # fmin/fmax skip NaN, cells without any value are dropped below
+        with np.errstate(invalid='ignore'):
+            minimum = np.fmin.reduceat(values, starts) if len(starts) else np.empty(0)
+            maximum = np.fmax.reduceat(values, starts) if len(starts) else np.empty(0)
+
+        keep = count > 0
+        frames.append(pd.DataFrame({
+            'Variable': variable,
+            'Day': cell_hours[keep] // 24,
+            'Hour': (cell_hours[keep] % 24).astype('uint8'),
+            'count': count[keep],
+            'sum': total[keep],
+            'm2': m2[keep],
+            'min': minimum[keep],
+            'max': maximum[keep],
+        }))
+
+    if not frames:
+        return empty_rollup()
+    cube = pd.concat(frames, ignore_index=True)
+    cube['Day'] = cube['Day'].to_numpy().astype('datetime64[D]').astype('datetime64[s]')
+    return cube
+
+# Function to create a cube without any cells
+def empty_rollup():
+    cube = pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in
+                         [('Variable', 'object'), ('Day', 'datetime64[s]'), ('Hour', 'uint8'), ('count', 'int64'),
+                          ('sum', 'float64'), ('m2', 'float64'), ('min', 'float64'), ('max', 'float64')]})
+    return cube
+
+# Function to keep the cells of a date range, both ends inclusive. Missing ends mean the whole cube.
+def slice_rollup(cube, start=None, end=None):
+    if start is None and end is None:
+        return cube
+    days = cube['Day'].to_numpy()
+    keep = np.ones(len(cube), dtype=bool)
+    if start is not None:
+        keep &= days >= np.datetime64(pd.Timestamp(start).floor('D'))
+    if end is not None:
+        keep &= days <= np.datetime64(pd.Timestamp(end).floor('D'))
+    return cube[keep]
+
+# Function to combine cells that share the same keys into one cell each
+def combine_cells(cells, keys):
+    grouped = cells.groupby(keys, sort=True, observed=True)
+    count = grouped['count'].transform('sum')
+    group_mean = grouped['sum'].transform('sum') / count
+    cell_mean = cells['sum'] / cells['count']
+
+    # Parallel variance: the within-cell m2 plus the spread of the cell means around the group mean
+    cells = cells.assign(m2=cells['m2'] + cells['count'] * (cell_mean - group_mean) ** 2)
+    return cells.groupby(keys, sort=True, observed=True).agg(
+        count=('count', 'sum'),
+        sum=('sum', 'sum'),
+        m2=('m2', 'sum'),
+        min=('min', 'min'),
+        max=('max', 'max'),
+    )
+
+# Function to merge the statistics of two aligned sets of cells holding the same keys, with Chan's formula for m2
+def merge_cell_stats(a, b):
+    count = a['count'].to_numpy() + b['count'].to_numpy()
+    delta = b['sum'].to_numpy() / b['count'].to_numpy() - a['sum'].to_numpy() / a['count'].to_numpy()
+    return {
+        'count': count,
+        'sum': a['sum'].to_numpy() + b['sum'].to_numpy(),
+        'm2': a['m2'].to_numpy() + b['m2'].to_numpy() + delta * delta * a['count'].to_numpy() * b['count'].to_numpy() / count,
+        'min': np.fmin(a['min'].to_numpy(), b['min'].to_numpy()),
+        'max': np.fmax(a['max'].to_numpy(), b['max'].to_numpy()),
+    }
+
+# Function to add new rows to a cube, e.g. when rows are appended to a site or cleaned chunk by chunk.
+# Only the cells the new rows touch are merged: those already in the cube are combined with the new ones,
+# the others are appended, so the result equals the cube built from all rows at once without regrouping the cube.
+def update_rollup(cube, data, variables=None):
+    update = build_rollup(data, variables)
+    if cube is None or cube.empty:
+        return update
+    if update.empty:
+        return cube
+
+    # Only the cube's cells on the days of the new rows can hold the same keys
+    days = cube['Day'].to_numpy()
+    update_days = update['Day'].to_numpy()
+    candidates = np.flatnonzero((days >= update_days.min()) & (days <= update_days.max()))
+    positions = pd.MultiIndex.from_frame(cube.iloc[candidates][CELL_KEYS]).get_indexer(pd.MultiIndex.from_frame(update[CELL_KEYS]))
+    overlap = positions >= 0
+    rows = candidates[positions[overlap]]
+
+    # The cube's rows keep their positions, the new cells go after them
+    merged = pd.concat([cube, update[~overlap]], ignore_index=True)
+    if len(rows):
+        for stat, values in merge_cell_stats(cube.iloc[rows], update[overlap]).items():
+            merged.iloc[rows, merged.columns.get_loc(stat)] = values
+    return merged
+
+# Function to roll the cube up to a grain.
+# Returns one row per variable and grain key with the count, mean, std (ddof=1), min and max.
+def aggregate(cube, grain, variables=None):
+    cells = cube if variables is None else cube[cube['Variable'].isin(variables)]
+    if 'Month' in GRAINS[grain]:
+        cells = cells.assign(Month=cells['Day'].dt.month.astype('uint8'))
+
+    combined = combine_cells(cells, ['Variable'] + GRAINS[grain])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        combined['mean'] = combined['sum'] / combined['count']
+        combined['std'] = np.sqrt(combined['m2'] / (combined['count'] - 1)).where(combined['count'] > 1)
+    return combined[['count', 'mean', 'std', 'min', 'max']]
+
+# Function to get one statistic of a single variable at a grain, as a small frame with the grain
+# keys as columns and the statistic in a column named after the variable, ready to plot
+def aggregate_variable(cube, grain, variable, stat='mean'):
+    aggregated = aggregate(cube, grain, [variable]).loc[variable]
+    return aggregated[[stat]].rename(columns={stat: variable}).reset_index()
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+# Version of the column schema below. Bump it whenever the dtypes change so that cached
+# cleaned data stored with older dtypes is rebuilt.
+SCHEMA_VERSION = 1
+
+# Timestamp format of the station exports, e.g. 2021-08-09 00:01
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M'
+
+# Measured columns of the station format. Sensor values carry one decimal, so float32 holds them
+# exactly enough while using half the memory of float64.
+FLOAT_COLUMNS = ['GHI', 'DNI', 'DHI', 'ModA', 'ModB', 'Tamb', 'RH', 'WS', 'WSgust', 'WSstdev',
+                 'WD', 'WDstdev', 'BP', 'Precipitation', 'TModA', 'TModB']
+
+# Units of the measured columns, for axis labels
+COLUMN_UNITS = {
+    'GHI': 'W/m^2', 'DNI': 'W/m^2', 'DHI': 'W/m^2', 'ModA': 'W/m^2', 'ModB': 'W/m^2',
+    'Tamb': '°C', 'TModA': '°C', 'TModB': '°C', 'RH': '%',
+    'WS': 'm/s', 'WSgust': 'm/s', 'WSstdev': 'm/s', 'WD': '°N', 'WDstdev': '°',
+    'BP': 'hPa', 'Precipitation': 'mm/min',
+}
+
+# Binary flag columns, stored as uint8 once cleaning has brought them into 0/1
+FLAG_COLUMNS = ['Cleaning']
+
+# Columns that are always empty in the station exports
+DROPPED_COLUMNS = ['Comments']
+
+# Dtypes of the cleaned data
+COLUMN_DTYPES = {**{column: 'float32' for column in FLOAT_COLUMNS}, **{column: 'uint8' for column in FLAG_COLUMNS}}
+
+# Dtypes of the time parts derived from the timestamp
+TIME_PART_DTYPES = {'Month': 'uint8', 'Hour': 'uint8'}
+
+# Function to get the axis label of a column with its unit
+def column_label(column):
+    unit = COLUMN_UNITS.get(column)
+    return f"{column} ({unit})" if unit else column
+
+# Function to get the dtypes to read a raw station CSV with.
+# Flags are read as float32 since raw files can hold out of range or missing flags until they are cleaned.
+def read_dtypes():
+    return {column: 'float32' for column in FLOAT_COLUMNS + FLAG_COLUMNS}
+
+# Function to parse timestamps in the station format.
+# Files that deviate from it, e.g. with seconds, fall back to the slower ISO 8601 parsing.
+def parse_timestamps(values):
+    try:
+        return pd.to_datetime(values, format=TIMESTAMP_FORMAT)
+    except ValueError:
+        return pd.to_datetime(values, format='ISO8601')
+
+# Function to make sure the Timestamp column is parsed, without parsing it again
+def ensure_timestamp(data):
+    if not pd.api.types.is_datetime64_any_dtype(data['Timestamp']):
+        data['Timestamp'] = parse_timestamps(data['Timestamp'])
+    return data
+
+# Function to add the Month and Hour columns as small integers, unless they are already there
+def add_time_parts(data):
+    ensure_timestamp(data)
+    timestamps = data['Timestamp'].dt
+    for column, dtype in TIME_PART_DTYPES.items():
+        if column not in data.columns or data[column].dtype != dtype:
+            data[column] = getattr(timestamps, column.lower()).astype(dtype)
+    return data
+
+# Function to convert columns to numbers, skipping the ones that already are
+def ensure_numeric(data, columns):
+    for column in columns:
+        if not pd.api.types.is_numeric_dtype(data[column]):
+            data[column] = pd.to_numeric(data[column], errors='coerce')
+    return data
+
+# Function to cast cleaned data to the schema dtypes, in place.
+# Flag columns are only narrowed when all their values fit, otherwise they stay float32.
+def apply_schema(data):
+    for column, dtype in COLUMN_DTYPES.items():
+        if column not in data.columns or data[column].dtype == dtype:
+            continue
+        values = data[column].to_numpy()
+        if np.issubdtype(np.dtype(dtype), np.integer):
+            info = np.iinfo(dtype)
+            if not (np.isfinite(values).all() and np.array_equal(values, np.round(values))
+                    and (len(values) == 0 or (values.min() >= info.min and values.max() <= info.max))):
+                dtype = 'float32'
+        data[column] = values.astype(dtype)
+    return data
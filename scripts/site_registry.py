@@ -0,0 +1,63 @@
+import json
+import os
+from collections import namedtuple
+
+try:
+    from scripts.cleaning import DEFAULT_RULES
+except ImportError:
+    from cleaning import DEFAULT_RULES
+
+# Config file listing the stations, can be pointed elsewhere through the environment
+SITES_CONFIG = os.environ.get('SOLAR_SITES_CONFIG', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sites.json'))
+
+# One registered station: its key, how it is shown, where its data comes from, how it is cleaned
+# and the prefix of its time series result files
+SiteConfig = namedtuple('SiteConfig', ['key', 'display_name', 'location', 'file_name', 'source', 'cleaning_rules', 'result_prefix'])
+
+# Registries already read, per config file
+_registries = {}
+
+# Function to turn a site's cleaning rules from the config into a rule table.
+# A rule is null for IQR capping or a [lower, upper] range where a null bound leaves that side open.
+def parse_cleaning_rules(rules):
+    if rules is None:
+        return DEFAULT_RULES
+    return {column: None if expected_range is None else tuple(expected_range) for column, expected_range in rules.items()}
+
+# Function to read the site registry from a config file.
+# Returns a dict of SiteConfig by site key, in the order of the config file.
+def load_site_registry(path=SITES_CONFIG):
+    if path in _registries:
+        return _registries[path]
+
+    with open(path) as f:
+        config = json.load(f)
+
+    registry = {}
+    for site in config['sites']:
+        key = site['key']
+        if key in registry:
+            raise ValueError(f"Site '{key}' is registered twice in {path}")
+        registry[key] = SiteConfig(
+            key=key,
+            display_name=site.get('display_name', key),
+            location=site.get('location', ''),
+            file_name=site.get('file_name', f"{key}.csv"),
+            source=site.get('source', {}),
+            cleaning_rules=parse_cleaning_rules(site.get('cleaning_rules')),
+            result_prefix=site.get('result_prefix', key),
+        )
+
+    _registries[path] = registry
+    return registry
+
+# Function to list the keys of all registered sites
+def list_sites(path=SITES_CONFIG):
+    return list(load_site_registry(path))
+
+# Function to get the config of a registered site
+def get_site(site, path=SITES_CONFIG):
+    registry = load_site_registry(path)
+    if site not in registry:
+        raise KeyError(f"Unknown site '{site}', registered sites are: {', '.join(registry)}")
+    return registry[site]
@@ -0,0 +1,214 @@
+import argparse
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+try:
+    from scripts.schema import TIMESTAMP_FORMAT
+    from scripts.site_registry import get_site, list_sites
+except ImportError:
+    from schema import TIMESTAMP_FORMAT
+    from site_registry import get_site, list_sites
+
+# Columns of a station export, in the order of the real files
+STATION_COLUMNS = ['Timestamp', 'GHI', 'DNI', 'DHI', 'ModA', 'ModB', 'Tamb', 'RH', 'WS', 'WSgust', 'WSstdev',
+                   'WD', 'WDstdev', 'BP', 'Cleaning', 'Precipitation', 'TModA', 'TModB', 'Comments']
+
+# First timestamp of the synthetic series, the real exports start on this day too, with one row per minute
+SYNTHETIC_START = '2021-08-09 00:01'
+
+# Latitude in degrees the sun's path is computed for, about the latitude of the West African stations
+SYNTHETIC_LATITUDE = 10.0
+
+# Share of rows given an injected outlier, spread over the outlier kinds below
+OUTLIER_RATE = 0.005
+
+# Kinds of injected outliers as (column, kind), sharing OUTLIER_RATE of the rows between them.
+# 'spike' multiplies the value, 'negative' flips its sign, 'range' moves it outside its physical range,
+# 'missing' blanks it and 'flag' writes an invalid cleaning flag.
+OUTLIER_KINDS = [('GHI', 'spike'), ('GHI', 'negative'), ('DNI', 'spike'), ('DHI', 'negative'), ('ModA', 'spike'),
+                 ('Tamb', 'spike'), ('RH', 'range'), ('WS', 'spike'), ('WSgust', 'spike'), ('WD', 'range'),
+                 ('BP', 'range'), ('Precipitation', 'negative'), ('TModA', 'spike'), ('Tamb', 'missing'),
+                 ('GHI', 'missing'), ('WS', 'missing'), ('Cleaning', 'flag')]
+
+# Rows generated and written at a time, so files far larger than memory can be written
+CHUNK_ROWS = 1_000_000
+
+# Random drivers shared by all chunks of a series: the weather of every day and every hour.
+# They are drawn once up front, so a chunk boundary never shows in the data.
+StationDrivers = namedtuple('StationDrivers', ['start', 'clearness', 'day_temperature', 'hour_clouds', 'rain_hours',
+                                               'wind_scale', 'pressure'])
+
+# Function to draw the daily and hourly weather of a synthetic series of rows minutes
+def station_drivers(rows, seed=0, start=SYNTHETIC_START):
+    rng = np.random.default_rng([seed, 0])
+    days = rows // 1440 + 2
+    hours = days * 24
+    # Day-to-day weather drifts as a slow random walk around its mean, hours vary around their day
+    return StationDrivers(
+        start=pd.Timestamp(start),
+        clearness=rng.beta(6, 2, days),
+        day_temperature=np.cumsum(rng.normal(0, 0.6, days)) * 0.3 + rng.normal(0, 1.0, days),
+        hour_clouds=rng.beta(8, 1.5, hours),
+        rain_hours=rng.random(hours),
+        wind_scale=rng.gamma(8, 1 / 8, days),
+        pressure=np.cumsum(rng.normal(0, 0.4, days)) * 0.5,
+    )
+
+# Function to get the sine of the sun's elevation for day of year and fractional hour, negative at night
+def sun_elevation(day_of_year, hour, latitude=SYNTHETIC_LATITUDE):
+    declination = np.radians(23.44) * np.sin(2 * np.pi * (284 + day_of_year) / 365)
+    hour_angle = np.radians(15 * (hour - 12))
+    latitude = np.radians(latitude)
+    return np.sin(latitude) * np.sin(declination) + np.cos(latitude) * np.cos(declination) * np.cos(hour_angle)
+
+# Function to inject outliers into a chunk in place, returns the number injected per (column, kind)
+def inject_outliers(data, rng, outlier_rate=OUTLIER_RATE):
+    injected = {}
+    n = len(data)
+    for column, kind in OUTLIER_KINDS:
+        rows = np.flatnonzero(rng.random(n) < outlier_rate / len(OUTLIER_KINDS))
+        values = data[column].to_numpy(dtype='float64', copy=True)
+        if kind == 'spike':
+            values[rows] = values[rows] * rng.uniform(3, 8, len(rows)) + rng.uniform(20, 60, len(rows)) * np.sign(rng.normal(size=len(rows)))
+        elif kind == 'negative':
+            values[rows] = -np.abs(values[rows]) - rng.uniform(1, 20, len(rows))
+        elif kind == 'range':
+            high = {'RH': (101, 120), 'WD': (361, 400), 'BP': (1060, 1100)}[column]
+            values[rows] = np.where(rng.random(len(rows)) < 0.5, rng.uniform(*high, len(rows)), -rng.uniform(1, 50, len(rows)))
+        elif kind == 'missing':
+            values[rows] = np.nan
+        elif kind == 'flag':
+            values[rows] = rng.choice([-1, 2, 9], len(rows))
+        data[column] = values
+        injected[f"{column}:{kind}"] = len(rows)
+    return injected
+
+# Function to generate rows [offset, offset + rows) of a synthetic station series as a DataFrame in the
+# station schema, with its injected outliers. Returns the frame and the number of outliers injected per kind.
+# The values follow the sun's path and the weather drivers: irradiance with clouds, a lagged diurnal
+# temperature cycle with humidity moving against it, afternoon winds from a seasonal prevailing
+# direction, the semi-diurnal pressure tide and rare rain showers.
+def generate_rows(drivers, offset, rows, seed=0, outlier_rate=OUTLIER_RATE):
+    rng = np.random.default_rng([seed, 1, offset])
+    minutes = np.arange(offset, offset + rows)
+    timestamps = drivers.start + pd.to_timedelta(minutes, unit='min')
+    day = ((timestamps - drivers.start.normalize()) // pd.Timedelta(days=1)).to_numpy()
+    hour = (timestamps.hour + timestamps.minute / 60).to_numpy()
+    day_of_year = timestamps.dayofyear.to_numpy()
+    hour_index = day * 24 + timestamps.hour.to_numpy()
+    season = np.cos(2 * np.pi * (day_of_year - 15) / 365)
+
+    # Irradiance: clear sky scaled by the day's clearness and the hour's clouds, with minute flicker
+    elevation = np.clip(sun_elevation(day_of_year, hour), 0, None)
+    clear_sky = 1100 * elevation ** 1.15
+    clearness = np.clip(drivers.clearness[day] * drivers.hour_clouds[hour_index] * rng.normal(1, 0.04, rows), 0.05, 1.05)
+    ghi = clear_sky * clearness + rng.normal(0, 1.5, rows) - 1.0 * (elevation == 0)
+    dni = np.where(elevation > 0.02, 950 * np.clip((clearness - 0.3) / 0.7, 0, None) * elevation ** 0.25, 0) + rng.normal(0, 1.0, rows)
+    dhi = np.clip(ghi - dni * elevation, 0, None) + rng.normal(0, 1.0, rows)
+
+    # Temperatures: a seasonal and a diurnal cycle peaking mid-afternoon, modules warm up in the sun
+    tamb = (27 + 3 * season + drivers.day_temperature[day] + 5.5 * np.sin(2 * np.pi * (hour - 9) / 24)
+            * (0.5 + drivers.clearness[day] / 2) + rng.normal(0, 0.3, rows))
+    rh = np.clip(60 - 3.2 * (tamb - 27) - 20 * season + rng.normal(0, 3, rows), 3, 100)
+
+    # Wind: Weibull speeds stronger in the afternoon, directions around the harmattan (NE) or the monsoon (SW)
+    wind_scale = drivers.wind_scale[day] * (2.2 + 1.2 * np.clip(np.sin(2 * np.pi * (hour - 8) / 24), 0, None))
+    ws = wind_scale * rng.weibull(2.0, rows)
+    prevailing = np.where(season > 0, 45.0, 225.0)
+    wd = np.mod(prevailing + np.degrees(rng.vonmises(0, 1.5, rows)), 360)
+
+    # Rain falls in a few hours, mostly in the wet season
+    rain = drivers.rain_hours[hour_index] < 0.04 * (1 - season)
+    precipitation = np.where(rain, rng.gamma(0.6, 0.5, rows), 0)
+
+    # Modules are cleaned in the early morning about once a week
+    cleaning = ((day % 7 == 3) & (timestamps.hour == 7) & (timestamps.minute == 0)).astype('float64')
+
+    data = pd.DataFrame({
+        'Timestamp': timestamps,
+        'GHI': ghi,
+        'DNI': dni,
+        'DHI': dhi,
+        'ModA': ghi * 0.96 + rng.normal(0, 2, rows),
+        'ModB': ghi * 0.93 + rng.normal(0, 2, rows),
+        'Tamb': tamb,
+        'RH': rh,
+        'WS': ws,
+        'WSgust': ws * rng.uniform(1.2, 1.7, rows),
+        'WSstdev': np.abs(0.15 * ws + rng.normal(0, 0.1, rows)),
+        'WD': wd,
+        'WDstdev': np.abs(rng.normal(0, 25, rows)) / (1 + ws / 2),
+        'BP': 995 + 2 * season + drivers.pressure[day] + 1.2 * np.cos(4 * np.pi * (hour - 10) / 24) + rng.normal(0, 0.3, rows),
+        'Cleaning': cleaning,
+        'Precipitation': precipitation,
+        'TModA': tamb + 0.03 * ghi * (1 - ws / 30) + rng.normal(0, 0.5, rows),
+        'TModB': tamb + 0.025 * ghi * (1 - ws / 30) + rng.normal(0, 0.5, rows),
+        'Comments': np.nan,
+    }, columns=STATION_COLUMNS)
+
+    injected = inject_outliers(data, rng, outlier_rate)
+
+    # The station logs one decimal, pressure in whole hPa
+    for column in STATION_COLUMNS[1:-1]:
+        data[column] = data[column].round(0 if column in ('BP', 'Cleaning') else 1)
+    return data, injected
+
+# Function to generate a whole synthetic station series of rows minutes in memory
+def generate_station_data(rows, seed=0, start=SYNTHETIC_START, outlier_rate=OUTLIER_RATE):
+    data, _ = generate_rows(station_drivers(rows, seed, start), 0, rows, seed, outlier_rate)
+    return data
+
+# Function to write a synthetic station CSV of rows minutes in the format of the station exports.
+# It is generated and written chunk_rows at a time through Arrow's CSV writer, to a temporary file renamed into place.
+# Returns the number of outliers injected per kind.
+def write_station_csv(path, rows, seed=0, start=SYNTHETIC_START, outlier_rate=OUTLIER_RATE, chunk_rows=CHUNK_ROWS):
+    drivers = station_drivers(rows, seed, start)
+    injected = {}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write_options = pa_csv.WriteOptions(include_header=False, quoting_style='none')
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write((','.join(STATION_COLUMNS) + '\n').encode())
+            for offset in range(0, rows, chunk_rows):
+                chunk, chunk_injected = generate_rows(drivers, offset, min(chunk_rows, rows - offset), seed, outlier_rate)
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                table = table.set_column(0, 'Timestamp', pc.strftime(table['Timestamp'], format=TIMESTAMP_FORMAT))
+                pa_csv.write_csv(table, f, write_options)
+                for kind, count in chunk_injected.items():
+                    injected[kind] = injected.get(kind, 0) + count
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return injected
+
+# Function to write a synthetic CSV for each site under the file name the registry gives it, all registered sites by default.
+# Every site gets its own seed. Returns the number of outliers injected per kind, by site.
+def write_synthetic_sites(directory, rows, sites=None, seed=0, outlier_rate=OUTLIER_RATE):
+    os.makedirs(directory, exist_ok=True)
+    sites = list_sites() if sites is None else list(sites)
+    return {site: write_station_csv(os.path.join(directory, get_site(site).file_name), rows, seed + i, outlier_rate=outlier_rate)
+            for i, site in enumerate(sites)}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write synthetic station CSVs in the format of the real exports.')
+    parser.add_argument('directory', help='directory to write the CSVs to, e.g. temp_data')
+    parser.add_argument('--rows', type=int, default=100_000, help='rows (minutes) per site, 100000 by default')
+    parser.add_argument('--sites', nargs='+', help='sites to write, all registered sites by default')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the first site')
+    parser.add_argument('--outlier-rate', type=float, default=OUTLIER_RATE, help='share of rows given an injected outlier')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    injected = write_synthetic_sites(args.directory, args.rows, args.sites, args.seed, args.outlier_rate)
+    for site, counts in injected.items():
+        print(f"{site}: {args.rows} rows, {sum(counts.values())} injected outliers")
+    print(f"Wrote {len(injected)} files in {time.perf_counter() - start:.1f}s")
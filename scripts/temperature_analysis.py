@@ -2,15 +2,15 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.linear_model import LinearRegression
 
 # Import load_data.py as a module
 from load_data import load_and_clean_data
-
-# Load and assign the cleaned data
-benin_data, sierraleone_data, togo_data = load_and_clean_data()
+from regression import fit_model, regression_line, sufficient_statistics
+from results import results_path
+from instrumentation import instrumented
 
 # Preprocess Data to Extract Temperature, Relative Humidity, and Solar Radiation
+@instrumented
 def preprocess_temp_data(data):
     data['Tamb'] = pd.to_numeric(data['Tamb'], errors='coerce')  # Use Tamb for Temperature
     data['RH'] = pd.to_numeric(data['RH'], errors='coerce')  # Relative Humidity
@@ -22,6 +22,7 @@ def preprocess_temp_data(data):
     return data
 
 # 1. Scatter Plot: RH vs. Temperature (Tamb)
+@instrumented
 def plot_scatter_rh_temp(data, data_name, save_as):
     # Scatter plot for RH vs. Tamb (Temperature)
     plt.figure(figsize=(8, 6))
@@ -30,10 +31,11 @@ def plot_scatter_rh_temp(data, data_name, save_as):
     plt.xlabel('Relative Humidity (%)')
     plt.ylabel('Temperature (°C)')
     plt.tight_layout()
-    plt.savefig(f"../results/temperature_analysis/{data_name}/{save_as}")
+    plt.savefig(results_path('temperature_analysis', data_name, save_as))
     plt.close()
 
 # 2. Scatter Plot: RH vs. Solar Radiation (GHI)
+@instrumented
 def plot_scatter_rh_sr(data, data_name, save_as):
     # Scatter plot for RH vs. GHI (Solar Radiation)
     plt.figure(figsize=(8, 6))
@@ -42,10 +44,11 @@ def plot_scatter_rh_sr(data, data_name, save_as):
     plt.xlabel('Relative Humidity (%)')
     plt.ylabel('Solar Radiation (W/m²)')
     plt.tight_layout()
-    plt.savefig(f"../results/temperature_analysis/{data_name}/{save_as}")
+    plt.savefig(results_path('temperature_analysis', data_name, save_as))
     plt.close()
 
 # 3. Correlation Matrix: RH, Temperature, and Solar Radiation
+@instrumented
 def plot_correlation_matrix(data, data_name, save_as):
     # Calculate the correlation matrix
     correlation_matrix = data[['RH', 'Tamb', 'GHI']].corr()
@@ -55,106 +58,105 @@ def plot_correlation_matrix(data, data_name, save_as):
     sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', fmt='.2f', linewidths=0.5)
     plt.title(f'Correlation Matrix: RH, Temperature (Tamb), and Solar Radiation (GHI) ({data_name})')
     plt.tight_layout()
-    plt.savefig(f"../results/temperature_analysis/{data_name}/{save_as}")
+    plt.savefig(results_path('temperature_analysis', data_name, save_as))
     plt.close()
 
 # 4. Linear Regression: RH vs. Temperature (Tamb)
+@instrumented
 def plot_rh_vs_temp_regression(data, data_name, save_as):
-    # Prepare the data
-    X = data[['RH']]  # Independent variable (Relative Humidity)
-    y = data['Tamb']  # Dependent variable (Temperature - Tamb)
-
-    # Create a linear regression model
-    model = LinearRegression()
-    model.fit(X, y)
+    # Fit Temperature (Tamb) on Relative Humidity (RH) in closed form from the sufficient statistics
+    stats = sufficient_statistics(data, ['RH', 'Tamb'])
+    fit = fit_model(stats, 'Tamb', ['RH'])
 
-    # Plot the regression line
+    # Plot the regression line from its two endpoints
     plt.figure(figsize=(8, 6))
     sns.scatterplot(data=data, x='RH', y='Tamb', color='b', label='Data points')
-    plt.plot(data['RH'], model.predict(X), color='r', label='Regression line')
+    plt.plot(*regression_line(fit, stats), color='r', label=f"Regression line (R² = {fit['r2']:.3f})")
     plt.title(f'Linear Regression: RH vs. Temperature (Tamb) ({data_name})')
     plt.xlabel('Relative Humidity (%)')
     plt.ylabel('Temperature (°C)')
     plt.legend(loc='upper right')
     plt.tight_layout()
-    plt.savefig(f"../results/temperature_analysis/{data_name}/{save_as}")
+    plt.savefig(results_path('temperature_analysis', data_name, save_as))
     plt.close()
 
 # 5. Linear Regression: RH vs. Solar Radiation (GHI)
+@instrumented
 def plot_rh_vs_sr_regression(data, data_name, save_as):
-    # Prepare the data
-    X_sr = data[['RH']]  # Independent variable (Relative Humidity)
-    y_sr = data['GHI']  # Dependent variable (Solar Radiation - GHI)
+    # Fit Solar Radiation (GHI) on Relative Humidity (RH) in closed form from the sufficient statistics
+    stats = sufficient_statistics(data, ['RH', 'GHI'])
+    fit = fit_model(stats, 'GHI', ['RH'])
 
-    # Create a linear regression model
-    model_sr = LinearRegression()
-    model_sr.fit(X_sr, y_sr)
-
-    # Plot the regression line
+    # Plot the regression line from its two endpoints
     plt.figure(figsize=(8, 6))
     sns.scatterplot(data=data, x='RH', y='GHI', color='g', label='Data points')
-    plt.plot(data['RH'], model_sr.predict(X_sr), color='r', label='Regression line')
+    plt.plot(*regression_line(fit, stats), color='r', label=f"Regression line (R² = {fit['r2']:.3f})")
     plt.title(f'Linear Regression: RH vs. Solar Radiation (GHI) ({data_name})')
     plt.xlabel('Relative Humidity (%)')
     plt.ylabel('Solar Radiation (W/m²)')
     plt.legend(loc='upper right')
     plt.tight_layout()
-    plt.savefig(f"../results/temperature_analysis/{data_name}/{save_as}")
+    plt.savefig(results_path('temperature_analysis', data_name, save_as))
     plt.close()
 
-########################### Temperature Analysis for Benin ###########################
+# Run the analysis for all sites when executed as a script, importing the module only defines its functions
+if __name__ == '__main__':
+    # Load and assign the cleaned data
+    benin_data, sierraleone_data, togo_data = load_and_clean_data(["benin", "sierraleone", "togo"])
+
+    ########################### Temperature Analysis for Benin ###########################
 
-data1 = preprocess_temp_data(benin_data)
+    data1 = preprocess_temp_data(benin_data)
 
-# Plot Scatter Plot: RH vs. Temperature (Tamb)
-plot_scatter_rh_temp(data1, 'benin', 'Benin_RH_vs_Temperature.png')
+    # Plot Scatter Plot: RH vs. Temperature (Tamb)
+    plot_scatter_rh_temp(data1, 'benin', 'Benin_RH_vs_Temperature.png')
 
-# Plot Scatter Plot: RH vs. Solar Radiation (GHI)
-plot_scatter_rh_sr(data1, 'benin', 'Benin_RH_vs_Solar_Radiation.png')
+    # Plot Scatter Plot: RH vs. Solar Radiation (GHI)
+    plot_scatter_rh_sr(data1, 'benin', 'Benin_RH_vs_Solar_Radiation.png')
 
-# Plot Correlation Matrix for RH, Temperature (Tamb), and Solar Radiation (GHI)
-plot_correlation_matrix(data1, 'benin', 'Benin_Correlation_Matrix.png')
+    # Plot Correlation Matrix for RH, Temperature (Tamb), and Solar Radiation (GHI)
+    plot_correlation_matrix(data1, 'benin', 'Benin_Correlation_Matrix.png')
 
-# Plot Linear Regression for RH vs. Temperature (Tamb)
-plot_rh_vs_temp_regression(data1, 'benin', 'Benin_RH_vs_Temperature_Regression.png')
+    # Plot Linear Regression for RH vs. Temperature (Tamb)
+    plot_rh_vs_temp_regression(data1, 'benin', 'Benin_RH_vs_Temperature_Regression.png')
 
-# Plot Linear Regression for RH vs. Solar Radiation (GHI)
-plot_rh_vs_sr_regression(data1, 'benin', 'Benin_RH_vs_Solar_Radiation_Regression.png')
+    # Plot Linear Regression for RH vs. Solar Radiation (GHI)
+    plot_rh_vs_sr_regression(data1, 'benin', 'Benin_RH_vs_Solar_Radiation_Regression.png')
 
-########################### Temperature Analysis for Sierraleone ###########################
+    ########################### Temperature Analysis for Sierraleone ###########################
 
-data2 = preprocess_temp_data(sierraleone_data)
+    data2 = preprocess_temp_data(sierraleone_data)
 
-# Plot Scatter Plot: RH vs. Temperature (Tamb)
-plot_scatter_rh_temp(data2, 'sierraleone', 'Sierraleone_RH_vs_Temperature.png')
+    # Plot Scatter Plot: RH vs. Temperature (Tamb)
+    plot_scatter_rh_temp(data2, 'sierraleone', 'Sierraleone_RH_vs_Temperature.png')
 
-# Plot Scatter Plot: RH vs. Solar Radiation (GHI)
-plot_scatter_rh_sr(data2, 'sierraleone', 'Sierraleone_RH_vs_Solar_Radiation.png')
+    # Plot Scatter Plot: RH vs. Solar Radiation (GHI)
+    plot_scatter_rh_sr(data2, 'sierraleone', 'Sierraleone_RH_vs_Solar_Radiation.png')
 
-# Plot Correlation Matrix for RH, Temperature (Tamb), and Solar Radiation (GHI)
-plot_correlation_matrix(data2, 'sierraleone', 'Sierraleone_Correlation_Matrix.png')
+    # Plot Correlation Matrix for RH, Temperature (Tamb), and Solar Radiation (GHI)
+    plot_correlation_matrix(data2, 'sierraleone', 'Sierraleone_Correlation_Matrix.png')
 
-# Plot Linear Regression for RH vs. Temperature (Tamb)
-plot_rh_vs_temp_regression(data2, 'sierraleone', 'Sierraleone_RH_vs_Temperature_Regression.png')
+    # Plot Linear Regression for RH vs. Temperature (Tamb)
+    plot_rh_vs_temp_regression(data2, 'sierraleone', 'Sierraleone_RH_vs_Temperature_Regression.png')
 
-# Plot Linear Regression for RH vs. Solar Radiation (GHI)
-plot_rh_vs_sr_regression(data2, 'sierraleone', 'Sierraleone_RH_vs_Solar_Radiation_Regression.png')
+    # Plot Linear Regression for RH vs. Solar Radiation (GHI)
+    plot_rh_vs_sr_regression(data2, 'sierraleone', 'Sierraleone_RH_vs_Solar_Radiation_Regression.png')
 
-########################### Temperature Analysis for Togo ###########################
+    ########################### Temperature Analysis for Togo ###########################
 
-data3 = preprocess_temp_data(togo_data)
+    data3 = preprocess_temp_data(togo_data)
 
-# Plot Scatter Plot: RH vs. Temperature (Tamb)
-plot_scatter_rh_temp(data3, 'togo', 'Togo_RH_vs_Temperature.png')
+    # Plot Scatter Plot: RH vs. Temperature (Tamb)
+    plot_scatter_rh_temp(data3, 'togo', 'Togo_RH_vs_Temperature.png')
 
-# Plot Scatter Plot: RH vs. Solar Radiation (GHI)
-plot_scatter_rh_sr(data3, 'togo', 'Togo_RH_vs_Solar_Radiation.png')
+    # Plot Scatter Plot: RH vs. Solar Radiation (GHI)
+    plot_scatter_rh_sr(data3, 'togo', 'Togo_RH_vs_Solar_Radiation.png')
 
-# Plot Correlation Matrix for RH, Temperature (Tamb), and Solar Radiation (GHI)
-plot_correlation_matrix(data3, 'togo', 'Togo_Correlation_Matrix.png')
+    # Plot Correlation Matrix for RH, Temperature (Tamb), and Solar Radiation (GHI)
+    plot_correlation_matrix(data3, 'togo', 'Togo_Correlation_Matrix.png')
 
-# Plot Linear Regression for RH vs. Temperature (Tamb)
-plot_rh_vs_temp_regression(data3, 'togo', 'Togo_RH_vs_Temperature_Regression.png')
+    # Plot Linear Regression for RH vs. Temperature (Tamb)
+    plot_rh_vs_temp_regression(data3, 'togo', 'Togo_RH_vs_Temperature_Regression.png')
 
-# Plot Linear Regression for RH vs. Solar Radiation (GHI)
-plot_rh_vs_sr_regression(data3, 'togo', 'Togo_RH_vs_Solar_Radiation_Regression.png')
\ No newline at end of file
+    # Plot Linear Regression for RH vs. Solar Radiation (GHI)
+    plot_rh_vs_sr_regression(data3, 'togo', 'Togo_RH_vs_Solar_Radiation_Regression.png')
@@ -0,0 +1,38 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+# Function to sort a dataset by time, the station files are in time order so the sort is usually skipped
+def sort_by_time(data):
+    if data['Timestamp'].is_monotonic_increasing:
+        return data
+    return data.sort_values('Timestamp', kind='stable')
+
+# Function to get the timestamps of a dataset sorted by time as int64 nanoseconds since the epoch, for range slicing
+def time_index(data):
+    return data['Timestamp'].to_numpy(dtype='datetime64[ns]').view('int64')
+
+# Function to get the first and last date of a time index, or (None, None) when it is empty
+def time_index_dates(times):
+    if len(times) == 0:
+        return None, None
+    return pd.Timestamp(times[0]).date(), pd.Timestamp(times[-1]).date()
+
+# Function to find the rows of a time range in a time index by binary search, as [lo, hi) positions.
+# Both ends are inclusive: an end given as a date includes that whole day. Missing ends mean the whole index.
+def time_bounds(times, start=None, end=None):
+    lo = 0 if start is None else int(np.searchsorted(times, pd.Timestamp(start).value, 'left'))
+    if end is None:
+        hi = len(times)
+    elif isinstance(end, datetime.date) and not isinstance(end, datetime.datetime):
+        hi = int(np.searchsorted(times, (pd.Timestamp(end) + pd.Timedelta(days=1)).value, 'left'))
+    else:
+        hi = int(np.searchsorted(times, pd.Timestamp(end).value, 'right'))
+    return lo, max(lo, hi)
+
+# Function to slice the rows of a time range out of a dataset sorted by time.
+# The slice is positional, so it shares the dataset's memory instead of copying the rows a boolean mask selects.
+def slice_time_range(data, times, start=None, end=None):
+    lo, hi = time_bounds(times, start, end)
+    return data.iloc[lo:hi]
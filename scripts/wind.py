@@ -0,0 +1,140 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from matplotlib import colormaps
+
+try:
+    from scripts.instrumentation import instrumented
+except ImportError:
+    from instrumentation import instrumented
+
+# Number of direction sectors of the wind roses, the first one is centered on north
+WIND_SECTORS = 16
+
+# Edges of the speed classes in m/s, the last class is open-ended
+SPEED_CLASS_EDGES = np.array([0, 0.5, 1, 2, 3, 4, 6, np.inf])
+
+# Frequencies of a site's wind per day, direction sector and speed class, with the per-day and hour sums of the
+# unit vectors of the wind directions. Any date range's wind rose and circular statistics are summed from it,
+# so the views never scan the rows again.
+# days: the days covered, consecutive, as datetime64[D]
+# counts: rows per day, sector and speed class, shape (days, sectors, speed classes)
+# hour_counts, hour_sin, hour_cos: rows and sums of sin and cos of the direction per day and hour, shape (days, 24)
+WindTable = namedtuple('WindTable', ['days', 'counts', 'hour_counts', 'hour_sin', 'hour_cos', 'speed_edges'])
+
+# Function to get the sector of every direction in degrees, sectors being centered on north, east, ...
+def direction_sectors(directions, sectors=WIND_SECTORS):
+    width = 360 / sectors
+    return (np.floor(((directions + width / 2) % 360) / width).astype('int64')) % sectors
+
+# Function to get the center of every sector in degrees
+def sector_centers(sectors=WIND_SECTORS):
+    return np.arange(sectors) * (360 / sectors)
+
+# Function to label the speed classes, e.g. '1-2' and '>=6'
+def speed_class_labels(speed_edges=SPEED_CLASS_EDGES):
+    return [f"{low:g}-{high:g}" if np.isfinite(high) else f">={low:g}" for low, high in zip(speed_edges[:-1], speed_edges[1:])]
+
+# Function to build the wind table of a dataset in one vectorized pass.
+# The sectors are computed arithmetically and the speed classes by binary search over their few edges, then every
+# row is counted in one bincount over its (day, sector, class) cell, the same for the direction sums per day and hour.
+# Rows without a direction or speed, or with a negative speed, are left out.
+@instrumented
+def build_wind_table(data, sectors=WIND_SECTORS, speed_edges=SPEED_CLASS_EDGES):
+    directions = data['WD'].to_numpy(dtype='float64')
+    speeds = data['WS'].to_numpy(dtype='float64')
+    times = data['Timestamp'].to_numpy(dtype='datetime64[ns]').astype('datetime64[h]').astype('int64')
+
+    valid = ~np.isnan(directions) & ~np.isnan(speeds) & (speeds >= speed_edges[0])
+    directions, speeds, times = directions[valid], speeds[valid], times[valid]
+    classes = len(speed_edges) - 1
+    if len(times) == 0:
+        empty = np.zeros((0, 24))
+        return WindTable(np.empty(0, dtype='datetime64[D]'), np.zeros((0, sectors, classes), dtype='int64'),
+                         empty.astype('int64'), empty, empty, speed_edges)
+
+    first_day = times.min() // 24
+    day_index = times // 24 - first_day
+    days = int(day_index.max()) + 1
+    speed_class = np.minimum(np.searchsorted(speed_edges, speeds, side='right') - 1, classes - 1)
+
+    cells = (day_index * sectors + direction_sectors(directions, sectors)) * classes + speed_class
+    counts = np.bincount(cells, minlength=days * sectors * classes).reshape(days, sectors, classes)
+
+    hours = day_index * 24 + times % 24
+    radians = np.radians(directions)
+    hour_counts = np.bincount(hours, minlength=days * 24).reshape(days, 24)
+    hour_sin = np.bincount(hours, weights=np.sin(radians), minlength=days * 24).reshape(days, 24)
+    hour_cos = np.bincount(hours, weights=np.cos(radians), minlength=days * 24).reshape(days, 24)
+
+    day_range = np.arange(first_day, first_day + days).astype('datetime64[D]')
+    return WindTable(day_range, counts, hour_counts, hour_sin, hour_cos, speed_edges)
+
+# Function to keep the days of a date range of a wind table, both ends inclusive. Missing ends mean the whole table.
+def slice_wind_table(table, start=None, end=None):
+    lo, hi = 0, len(table.days)
+    if start is not None:
+        lo = np.searchsorted(table.days, np.datetime64(pd.Timestamp(start).floor('D'), 'D'), side='left')
+    if end is not None:
+        hi = np.searchsorted(table.days, np.datetime64(pd.Timestamp(end).floor('D'), 'D'), side='right')
+    if lo == 0 and hi == len(table.days):
+        return table
+    return WindTable(table.days[lo:hi], table.counts[lo:hi], table.hour_counts[lo:hi], table.hour_sin[lo:hi],
+                     table.hour_cos[lo:hi], table.speed_edges)
+
+# Function to get the wind rose of a wind table: the share of rows in every sector and speed class, in percent
+def rose_frequencies(table):
+    counts = table.counts.sum(axis=0)
+    total = counts.sum()
+    return counts * (100 / total) if total else counts.astype('float64')
+
+# Function to compute circular statistics from counts and sums of the unit vectors of directions, vectorized
+# over any number of groups. Returns the vector-mean direction in degrees, the mean resultant length (1 when all
+# directions agree, near 0 when they spread evenly) and the circular standard deviation in degrees.
+def circular_stats(count, sin_sum, cos_sum):
+    count, sin_sum, cos_sum = (np.asarray(values, dtype='float64') for values in (count, sin_sum, cos_sum))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        resultant = np.clip(np.hypot(sin_sum, cos_sum) / count, 0, 1)
+        mean_direction = np.where(count > 0, np.degrees(np.arctan2(sin_sum, cos_sum)) % 360, np.nan)
+        circular_std = np.degrees(np.sqrt(-2 * np.log(resultant)))
+    return pd.DataFrame({'count': count.astype('int64'), 'mean_direction': mean_direction,
+                         'resultant_length': resultant, 'circular_std': circular_std})
+
+# Function to get the circular statistics of the wind direction of a wind table, overall or by 'hour' or 'month'.
+# The groups' prevailing directions come from the grouped sums of the direction unit vectors.
+def direction_stats(table, by=None):
+    sums = [table.hour_counts, table.hour_sin, table.hour_cos]
+    if by is None:
+        return circular_stats(*[values.sum(keepdims=True).ravel() for values in sums]).iloc[0]
+    if by == 'hour':
+        stats = circular_stats(*[values.sum(axis=0) for values in sums])
+        stats.index = pd.RangeIndex(24, name='Hour')
+        return stats
+    if by == 'month':
+        months = table.days.astype('datetime64[M]').astype('int64') % 12
+        stats = circular_stats(*[np.bincount(months, weights=values.sum(axis=1), minlength=12) for values in sums])
+        stats.index = pd.RangeIndex(1, 13, name='Month')
+        return stats
+    raise ValueError(f"Unknown grouping '{by}', expected None, 'hour' or 'month'")
+
+# Function to draw a wind rose from a wind table on a polar axis: one bar per sector, stacked by speed class,
+# with the share of rows in percent as the radius
+def draw_wind_rose(ax, table, cmap='viridis', opening=0.8):
+    frequencies = rose_frequencies(table)
+    sectors, classes = frequencies.shape
+    angles = np.radians(sector_centers(sectors))
+    width = 2 * np.pi / sectors * opening
+    colors = colormaps[cmap](np.linspace(0, 1, classes))
+
+    ax.set_theta_zero_location('N')
+    ax.set_theta_direction(-1)
+    bottom = np.zeros(sectors)
+    for speed_class, label in enumerate(speed_class_labels(table.speed_edges)):
+        ax.bar(angles, frequencies[:, speed_class], width=width, bottom=bottom, color=colors[speed_class],
+               edgecolor='white', linewidth=0.5, label=f"{label} m/s")
+        bottom += frequencies[:, speed_class]
+    ax.set_xticks(np.radians(np.arange(0, 360, 45)))
+    ax.set_xticklabels(['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW'])
+    ax.yaxis.set_major_formatter(lambda value, _: f"{value:g}%")
+    ax.legend(title='Wind Speed', loc='upper left', bbox_to_anchor=(1.05, 1), fontsize='small')
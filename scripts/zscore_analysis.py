@@ -5,11 +5,12 @@ import seaborn as sns
 
 # Assuming 'load_data.py' is imported to load the cleaned data
 from load_data import load_and_clean_data
-
-# Load data
-benin_data, sierraleone_data, togo_data = load_and_clean_data()
+from outliers import ZSCORE_THRESHOLD, find_outliers, outlier_summary, zscore_matrix
+from results import results_path
+from instrumentation import instrumented
 
 # Function to preprocess data for Z-Score analysis
+@instrumented
 def preprocess_data_for_zscore(data):
     data['Tamb'] = pd.to_numeric(data['Tamb'], errors='coerce')
     data['GHI'] = pd.to_numeric(data['GHI'], errors='coerce')
@@ -22,55 +23,67 @@ def preprocess_data_for_zscore(data):
     
     return data
 
-# Function to calculate Z-scores
-def calculate_z_scores(data, variables):
-    z_scores = {}
-    
-    for var in variables:
-        mean = data[var].mean()
-        std_dev = data[var].std()
-        z_scores[var] = (data[var] - mean) / std_dev
-    
-    return pd.DataFrame(z_scores)
+# Function to calculate Z-scores of several variables in one vectorized pass, as a DataFrame with a column per variable.
+# method is 'population' (mean and standard deviation), 'robust' (median and MAD) or 'rolling' (mean and standard
+# deviation of the time window centered on each row, of the same hour of day only with by_hour).
+def calculate_z_scores(data, variables, method='population', dtype='float64', window='1D', by_hour=False):
+    z_scores, _, _ = zscore_matrix(data, variables, method, dtype, window, by_hour)
+    return pd.DataFrame(z_scores.T, index=data.index, columns=variables, copy=False)
 
-# Function to identify outliers based on Z-scores (Z > 3 or Z < -3)
-def identify_outliers(z_scores_df):
-    outliers = {}
-    for column in z_scores_df.columns:
-        outliers[column] = z_scores_df[(z_scores_df[column] > 3) | (z_scores_df[column] < -3)]
-    return outliers
+# Function to identify outliers based on Z-scores (Z > 3 or Z < -3).
+# Returns an OutlierResult with the outlier mask, the counts per variable and the flagged rows and timestamps.
+def identify_outliers(data, variables, threshold=ZSCORE_THRESHOLD, method='population', window='1D', by_hour=False):
+    return find_outliers(data, variables, threshold, method, window=window, by_hour=by_hour)
 
 # Function to plot Z-scores for visualization and save as image
+@instrumented
 def plot_z_scores(z_scores_df, data_name, save_as):
     plt.figure(figsize=(10, 6))
     sns.boxplot(data=z_scores_df)
     plt.title(f'Z-Scores Distribution ({data_name})')
     plt.tight_layout()
-    plt.savefig(f"../results/zscore_analysis/{data_name}/{save_as}")
+    plt.savefig(results_path('zscore_analysis', data_name, save_as))
     plt.close()
 
-# Preprocess data for Z-score analysis for each dataset
-benin_data_cleaned = preprocess_data_for_zscore(benin_data)
-sierraleone_data_cleaned = preprocess_data_for_zscore(sierraleone_data)
-togo_data_cleaned = preprocess_data_for_zscore(togo_data)
-
-# Calculate Z-scores for the relevant variables
+# Variables of the Z-score analysis
 variables_of_interest = ['Tamb', 'GHI', 'WS', 'RH', 'BP']
-benin_z_scores = calculate_z_scores(benin_data_cleaned, variables_of_interest)
-sierraleone_z_scores = calculate_z_scores(sierraleone_data_cleaned, variables_of_interest)
-togo_z_scores = calculate_z_scores(togo_data_cleaned, variables_of_interest)
 
-# Identify outliers for each dataset
-benin_outliers = identify_outliers(benin_z_scores)
-sierraleone_outliers = identify_outliers(sierraleone_z_scores)
-togo_outliers = identify_outliers(togo_z_scores)
+# Function to preprocess a dataset and calculate the Z-scores of the variables of interest
+@instrumented
+def site_z_scores(data):
+    return calculate_z_scores(preprocess_data_for_zscore(data), variables_of_interest)
+
+# Run the analysis for all sites when executed as a script, importing the module only defines its functions
+if __name__ == '__main__':
+    # Load data
+    benin_data, sierraleone_data, togo_data = load_and_clean_data(["benin", "sierraleone", "togo"])
+
+    # Preprocess data for Z-score analysis for each dataset
+    benin_data_cleaned = preprocess_data_for_zscore(benin_data)
+    sierraleone_data_cleaned = preprocess_data_for_zscore(sierraleone_data)
+    togo_data_cleaned = preprocess_data_for_zscore(togo_data)
+
+    # Calculate Z-scores for the relevant variables
+    benin_z_scores = calculate_z_scores(benin_data_cleaned, variables_of_interest)
+    sierraleone_z_scores = calculate_z_scores(sierraleone_data_cleaned, variables_of_interest)
+    togo_z_scores = calculate_z_scores(togo_data_cleaned, variables_of_interest)
+
+    # Identify outliers for each dataset
+    benin_outliers = identify_outliers(benin_data_cleaned, variables_of_interest)
+    sierraleone_outliers = identify_outliers(sierraleone_data_cleaned, variables_of_interest)
+    togo_outliers = identify_outliers(togo_data_cleaned, variables_of_interest)
+
+    # Plot Z-scores and save them as images for each dataset
+    plot_z_scores(benin_z_scores, 'benin', 'Benin_Zscore_Distribution.png')
+    plot_z_scores(sierraleone_z_scores, 'sierraleone', 'Sierraleone_Zscore_Distribution.png')
+    plot_z_scores(togo_z_scores, 'togo', 'Togo_Zscore_Distribution.png')
 
-# Plot Z-scores and save them as images for each dataset
-plot_z_scores(benin_z_scores, 'benin', 'Benin_Zscore_Distribution.png')
-plot_z_scores(sierraleone_z_scores, 'sierraleone', 'Sierraleone_Zscore_Distribution.png')
-plot_z_scores(togo_z_scores, 'togo', 'Togo_Zscore_Distribution.png')
+    # Print the number of outliers per variable for further analysis
+    print("Benin Outliers:\n", outlier_summary(benin_outliers))
+    print("Sierraleone Outliers:\n", outlier_summary(sierraleone_outliers))
+    print("Togo Outliers:\n", outlier_summary(togo_outliers))
 
-# Optionally, you can also print or return the outliers for further analysis
-print("Benin Outliers:", benin_outliers)
-print("Sierraleone Outliers:", sierraleone_outliers)
-print("Togo Outliers:", togo_outliers)
\ No newline at end of file
+    # Rows that are only unusual for their time of day: same hour of day over the surrounding 30 days
+    print("Benin Hour-of-Day Outliers:\n", outlier_summary(identify_outliers(benin_data_cleaned, variables_of_interest, method='rolling', window='30D', by_hour=True)))
+    print("Sierraleone Hour-of-Day Outliers:\n", outlier_summary(identify_outliers(sierraleone_data_cleaned, variables_of_interest, method='rolling', window='30D', by_hour=True)))
+    print("Togo Hour-of-Day Outliers:\n", outlier_summary(identify_outliers(togo_data_cleaned, variables_of_interest, method='rolling', window='30D', by_hour=True)))
@@ -0,0 +1,76 @@
+import importlib.util
+import os
+from collections import namedtuple
+
+import pytest
+
+from scripts import artifacts
+from scripts.artifacts import code_hash, stale_reason
+from scripts.data_cache import FINGERPRINTS_FILE, file_fingerprint
+
+# The part of a report job the staleness check reads, generate_reports runs as a script from scripts/
+Job = namedtuple('Job', ['outputs'])
+
+# A small plotting module: a figure function, the helper and the constant it uses, and a function it does not use
+PLOT_MODULE = """import numpy as np
+
+BINS = {bins}
+
+def scale(values):
+    return np.asarray(values) * {factor}
+
+def unused(values):
+    return {unused}
+
+def plot(values):
+    return np.histogram(scale(values), bins=BINS)
+"""
+
+# Function to write a version of the plotting module to its own directory and import it, under the same module name
+def load_plot_module(tmp_path, monkeypatch, version, bins=30, factor=1, unused=0):
+    directory = tmp_path / version
+    directory.mkdir()
+    path = directory / 'report_plots.py'
+    path.write_text(PLOT_MODULE.format(bins=bins, factor=factor, unused=unused))
+    monkeypatch.setattr(artifacts, 'PROJECT_DIRS', artifacts.PROJECT_DIRS + [str(directory)])
+    spec = importlib.util.spec_from_file_location('report_plots', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture
+def plot_hash(tmp_path, monkeypatch):
+    # Hashes are remembered per function name, every version is hashed afresh
+    def plot_hash(version, **changes):
+        monkeypatch.setattr(artifacts, '_code_hashes', {})
+        return code_hash(load_plot_module(tmp_path, monkeypatch, version, **changes).plot)
+    return plot_hash
+
+def test_code_hash_follows_referenced_constants_and_helpers(plot_hash):
+    base = plot_hash('base')
+    assert plot_hash('same') == base
+    assert plot_hash('bins', bins=50) != base
+    assert plot_hash('helper', factor=2) != base
+    assert plot_hash('unused', unused=1) == base
+
+def test_changed_helper_marks_results_stale(tmp_path, monkeypatch, plot_hash):
+    job = Job(['histograms/benin/GHI.png'])
+    (tmp_path / 'histograms' / 'benin').mkdir(parents=True)
+    (tmp_path / 'histograms' / 'benin' / 'GHI.png').write_bytes(b'')
+    inputs = {'data': 'abc-3', 'prepare': None, 'plot': plot_hash('base'), 'params': '["GHI"]'}
+    manifest = {job.outputs[0]: inputs}
+    assert stale_reason(job, inputs, manifest, str(tmp_path)) is None
+
+    for version, changes in [('bins', {'bins': 50}), ('helper', {'factor': 2})]:
+        changed = {**inputs, 'plot': plot_hash(version, **changes)}
+        assert stale_reason(job, changed, manifest, str(tmp_path)) == 'changed plot'
+
+def test_fingerprint_without_persist_writes_nothing(tmp_path):
+    path = tmp_path / 'site.csv'
+    path.write_text('a,b\n1,2\n')
+    cache_dir = str(tmp_path / 'cache')
+
+    fingerprint = file_fingerprint(str(path), cache_dir, persist=False)
+    assert not os.path.exists(os.path.join(cache_dir, FINGERPRINTS_FILE))
+    assert file_fingerprint(str(path), cache_dir) == fingerprint
+    assert os.path.exists(os.path.join(cache_dir, FINGERPRINTS_FILE))
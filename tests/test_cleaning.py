@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.cleaning import DEFAULT_RULES, apply_cleaning_rules
+
+# Frozen copy of the per-column cleaning that apply_cleaning_rules replaced, without its prints.
+# The only change is that a None bound of an expected range is open, as the rule tables allow.
+def check_negative_and_outliers(data, column, expected_range=None):
+    valid_negative_columns = ['Tamb', 'TModA', 'TModB']
+
+    if column not in valid_negative_columns and (data[column] < 0).any():
+        data[column] = data[column].abs()
+
+    if expected_range is None:
+        Q1 = data[column].quantile(0.25)
+        Q3 = data[column].quantile(0.75)
+        IQR = Q3 - Q1
+        lower_bound = Q1 - 1.5 * IQR
+        upper_bound = Q3 + 1.5 * IQR
+        outliers = data[(data[column] < lower_bound) | (data[column] > upper_bound)]
+        if not outliers.empty:
+            data[column] = data[column].clip(lower=lower_bound, upper=upper_bound)
+    else:
+        lower_bound, upper_bound = expected_range
+        lower_bound = -np.inf if lower_bound is None else lower_bound
+        upper_bound = np.inf if upper_bound is None else upper_bound
+        outliers = data[(data[column] < lower_bound) | (data[column] > upper_bound)]
+        if not outliers.empty:
+            if column == 'Cleaning':
+                if data[column].mode().empty:
+                    data.loc[outliers.index, column] = 0
+                else:
+                    data.loc[outliers.index, column] = data[column].mode()[0]
+            else:
+                data[column] = data[column].clip(lower=lower_bound, upper=upper_bound)
+
+# Rule table capping every measured column at its IQR fences, like the Benin site
+IQR_RULES = {column: None if column not in ('RH', 'WD', 'BP', 'Cleaning', 'Precipitation') else expected_range
+             for column, expected_range in DEFAULT_RULES.items()}
+
+# Values with many ties, as in the station columns that are rounded to a tenth or stuck at zero at night
+def tied_values(rng, n):
+    return np.round(rng.gamma(0.5, 20, n), 1) * (rng.random(n) > 0.4)
+
+# Function to build a small station-like frame with negatives, values out of range, gaps and bad cleaning flags
+def station_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({'Timestamp': pd.date_range('2021-08-09', periods=rows, freq='min')})
+    for column in DEFAULT_RULES:
+        data[column] = np.round(rng.normal(100, 400, rows), 1)
+    data['GHI'] = tied_values(rng, rows) * 20
+    data['BP'] = np.round(rng.normal(995, 60, rows))
+    data['Cleaning'] = (rng.random(rows) < 0.01).astype('float64')
+    data.loc[::97, 'Cleaning'] = 2.0
+    for column in ['GHI', 'ModA', 'Tamb']:
+        data.loc[rng.random(rows) < 0.05, column] = np.nan
+    return data
+
+# Function to get the IQR fences of a column's values from the report of cleaning them alone
+def iqr_bounds(values):
+    report = apply_cleaning_rules(pd.DataFrame({'ModA': values}), {'ModA': None})
+    return report.loc['ModA', ['lower_bound', 'upper_bound']].to_numpy(dtype='float64')
+
+# Function to get the IQR fences of some values straight from numpy
+def numpy_bounds(values):
+    q1, q3 = np.nanquantile(values, [0.25, 0.75])
+    return np.array([q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)])
+
+@pytest.mark.parametrize('n', [1, 2, 3, 10, 101, 5000])
+def test_iqr_bounds_match_numpy_quantiles(n):
+    rng = np.random.default_rng(n)
+    for values in [np.abs(rng.normal(size=n)), tied_values(rng, n), np.sort(np.abs(rng.normal(size=n))), np.full(n, 3.5)]:
+        np.testing.assert_array_equal(iqr_bounds(values), numpy_bounds(values))
+
+def test_iqr_bounds_with_ties_at_the_quartiles():
+    # Half of the values tie at zero, the first quartile falls among the ties and the third one above them
+    values = np.zeros(8192)
+    values[1::2] = np.arange(1, 4097)
+    np.testing.assert_array_equal(np.quantile(values, [0.25, 0.75]), [0, 2048.25])
+    np.testing.assert_array_equal(iqr_bounds(values), numpy_bounds(values))
+
+def test_iqr_bounds_ignore_nan():
+    rng = np.random.default_rng(0)
+    values = tied_values(rng, 5000)
+    values[rng.random(len(values)) < 0.3] = np.nan
+    np.testing.assert_array_equal(iqr_bounds(values), numpy_bounds(values))
+    assert np.isinf(iqr_bounds(np.full(10, np.nan))).all()
+
+@pytest.mark.parametrize('rules', [DEFAULT_RULES, IQR_RULES], ids=['default', 'iqr'])
+def test_apply_cleaning_rules_matches_previous_cleaning(rules):
+    data = station_frame(3000, seed=3)
+    expected = data.copy()
+    for column, expected_range in rules.items():
+        check_negative_and_outliers(expected, column, expected_range)
+
+    report = apply_cleaning_rules(data, rules)
+
+    pd.testing.assert_frame_equal(data, expected, check_dtype=False)
+    assert list(report.index) == list(rules)
+    assert (report['negatives_fixed'] > 0).any() and (report['above_upper'] > 0).any()
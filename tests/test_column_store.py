@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from scripts.column_store import is_mapped, read_column_store, read_column_store_time_bounds, write_column_store
+from scripts.data_cache import read_cached_site, write_cached_site
+
+# Function to write a small source file, the stores are keyed by its fingerprint
+def write_source(directory, name, text):
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
+
+# Function to build cleaned station rows with float, integer and timestamp columns and some gaps
+def station_frame(rows=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        'Timestamp': pd.date_range('2021-08-09 00:01', periods=rows, freq='min'),
+        'GHI': np.round(rng.normal(200, 300, rows), 1),
+        'Tamb': np.round(rng.normal(27, 4, rows), 1).astype('float32'),
+        'Cleaning': (rng.random(rows) < 0.01).astype('int64'),
+    })
+    data.loc[rng.random(rows) < 0.05, 'GHI'] = np.nan
+    return data
+
+def test_column_store_maps_the_values_of_the_parquet_cache(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    source = write_source(tmp_path, 'benin.csv', 'a')
+    data = station_frame()
+    write_cached_site('benin', source, 'v1', data, cache_dir=cache_dir)
+    write_column_store('benin', source, 'v1', data, cache_dir=cache_dir)
+
+    cached = read_cached_site('benin', source, 'v1', cache_dir=cache_dir)
+    mapped = read_column_store('benin', source, 'v1', cache_dir=cache_dir)
+    assert all(is_mapped(mapped[column].to_numpy()) for column in mapped.columns)
+    # Compared on a copy, the testing helpers tell a memmap from an ndarray of the same values
+    pd.testing.assert_frame_equal(mapped.copy(), cached)
+
+    start, end = '2021-08-09 06:00', '2021-08-09 18:00'
+    sliced = read_column_store('benin', source, 'v1', columns=['GHI'], start=start, end=end, cache_dir=cache_dir)
+    assert is_mapped(sliced['GHI'].to_numpy())
+    keep = (cached['Timestamp'] >= start) & (cached['Timestamp'] <= end)
+    pd.testing.assert_frame_equal(sliced.copy(), cached.loc[keep, ['Timestamp', 'GHI']].reset_index(drop=True))
+    assert read_column_store_time_bounds('benin', source, 'v1', cache_dir=cache_dir) == (data['Timestamp'].iloc[0], data['Timestamp'].iloc[-1])
+
+def test_column_stores_of_prefix_sites_and_variants_are_kept_apart(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    togo = write_source(tmp_path, 'togo.csv', 'a')
+    togo_2 = write_source(tmp_path, 'togo-2.csv', 'b')
+
+    write_column_store('togo-2', togo_2, 'v1', station_frame(10, seed=2), cache_dir=cache_dir)
+    write_column_store('togo', togo, 'v1', station_frame(20, seed=1), cache_dir=cache_dir)
+    write_column_store('togo', togo, 'v1-streaming', station_frame(30, seed=1), cache_dir=cache_dir)
+    assert len(read_column_store('togo-2', togo_2, 'v1', cache_dir=cache_dir)) == 10
+    assert len(read_column_store('togo', togo, 'v1-streaming', cache_dir=cache_dir)) == 30
+
+    # A new rules version replaces the older store of its own variant only
+    write_column_store('togo', togo, 'v2', station_frame(40, seed=1), cache_dir=cache_dir)
+    assert read_column_store('togo', togo, 'v1', cache_dir=cache_dir) is None
+    assert len(read_column_store('togo', togo, 'v1-streaming', cache_dir=cache_dir)) == 30
+    assert len(read_column_store('togo', togo, 'v2', cache_dir=cache_dir)) == 40
+    assert len(read_column_store('togo-2', togo_2, 'v1', cache_dir=cache_dir)) == 10
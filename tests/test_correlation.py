@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.correlation import build_correlation_index, correlation_matrix
+
+# Function to build a few days of minute rows with correlated radiation, temperature and humidity, and gaps in some columns
+def station_frame(rows=7000, seed=0):
+    rng = np.random.default_rng(seed)
+    hours = np.arange(rows) / 60
+    ghi = np.maximum(900 * np.sin(2 * np.pi * (hours - 6) / 24), 0) + rng.normal(0, 20, rows)
+    tamb = 24 + ghi / 150 + rng.normal(0, 1, rows)
+    data = pd.DataFrame({
+        'GHI': ghi,
+        'DNI': 0.8 * ghi + rng.normal(0, 40, rows),
+        'DHI': 0.3 * ghi + rng.normal(0, 15, rows),
+        'RH': 95 - 2.5 * tamb + rng.normal(0, 8, rows),
+        'Tamb': tamb,
+        'WS': rng.gamma(2, 1.2, rows),
+        'WD': rng.uniform(0, 360, rows),
+    }).round(1)
+    data.insert(0, 'Timestamp', pd.date_range('2021-08-09 00:01', periods=rows, freq='min'))
+    for column in ['GHI', 'RH', 'WD']:
+        data.loc[rng.random(rows) < 0.02, column] = np.nan
+    return data
+
+@pytest.mark.parametrize('start, end', [(None, None), ('2021-08-10', '2021-08-12'), ('2021-08-11 06:30', None), ('2021-08-20', None)])
+def test_correlation_matrix_matches_dataframe_corr(start, end):
+    data = station_frame()
+    index = build_correlation_index(data)
+    matrix = correlation_matrix(index, start=start, end=end)
+
+    days = data['Timestamp'].dt.floor('D')
+    keep = np.ones(len(data), dtype=bool)
+    if start is not None:
+        keep &= days >= pd.Timestamp(start).floor('D')
+    if end is not None:
+        keep &= days <= pd.Timestamp(end).floor('D')
+    expected = data.loc[keep, index['columns']].corr()
+    pd.testing.assert_frame_equal(matrix, expected, rtol=1e-9, atol=1e-12)
@@ -0,0 +1,43 @@
+import os
+
+import pandas as pd
+
+from scripts.data_cache import read_cached_site, write_cached_rollup, write_cached_site
+
+# Function to write a small source file, the cache is keyed by its fingerprint
+def write_source(directory, name, text):
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
+
+def frame(values):
+    return pd.DataFrame({'Timestamp': pd.date_range('2021-08-09', periods=len(values), freq='min'), 'GHI': values})
+
+def test_sites_with_a_common_prefix_keep_their_entries(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    togo = write_source(tmp_path, 'togo.csv', 'a')
+    togo_2 = write_source(tmp_path, 'togo-2.csv', 'b')
+
+    write_cached_site('togo-2', togo_2, 'v1', frame([2.0, 3.0]), cache_dir=cache_dir)
+    write_cached_site('togo', togo, 'v1', frame([1.0]), cache_dir=cache_dir)
+    write_cached_rollup('togo-2', togo_2, 'v1', frame([2.0]), cache_dir=cache_dir)
+    write_cached_rollup('togo', togo, 'v1', frame([1.0]), cache_dir=cache_dir)
+
+    pd.testing.assert_frame_equal(read_cached_site('togo-2', togo_2, 'v1', cache_dir=cache_dir), frame([2.0, 3.0]))
+    pd.testing.assert_frame_equal(read_cached_site('togo', togo, 'v1', cache_dir=cache_dir), frame([1.0]))
+
+def test_streaming_and_exact_entries_are_kept_apart(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    source = write_source(tmp_path, 'benin.csv', 'a')
+
+    write_cached_site('benin', source, 'v1', frame([1.0]), cache_dir=cache_dir)
+    write_cached_site('benin', source, 'v1-streaming', frame([2.0]), cache_dir=cache_dir)
+    assert read_cached_site('benin', source, 'v1', cache_dir=cache_dir) is not None
+    assert read_cached_site('benin', source, 'v1-streaming', cache_dir=cache_dir) is not None
+
+    # A new rules version replaces the older entry of its own variant only
+    write_cached_site('benin', source, 'v2', frame([3.0]), cache_dir=cache_dir)
+    assert read_cached_site('benin', source, 'v1', cache_dir=cache_dir) is None
+    assert read_cached_site('benin', source, 'v1-streaming', cache_dir=cache_dir) is not None
+    assert len(os.listdir(tmp_path / 'cache' / 'sites' / 'benin')) == 2
@@ -0,0 +1,142 @@
+import hashlib
+import http.server
+import json
+import os
+import threading
+
+import pytest
+
+from scripts.data_sources import SOURCES_MANIFEST, fetch_site_source
+
+CONTENT = b''.join(f"2021-08-09 {i // 60:02d}:{i % 60:02d},{i * 0.7:.1f},{20 + i % 9:.1f}\n".encode() for i in range(5000))
+SHA256 = hashlib.sha256(CONTENT).hexdigest()
+
+# Function to write a file to fetch from, in its own directory
+def write_file(directory, name, content=CONTENT):
+    directory.mkdir(exist_ok=True)
+    path = directory / name
+    path.write_bytes(content)
+    return str(path)
+
+# Request handler serving CONTENT, honouring Range requests unless ranges is False. Records the ranges it was sent.
+class ContentHandler(http.server.BaseHTTPRequestHandler):
+    ranges = True
+    requests = []
+
+    def do_GET(self):
+        requested = self.headers.get('Range')
+        type(self).requests.append(requested)
+        if requested and self.ranges:
+            start = int(requested.split('=')[1].split('-')[0])
+            if start >= len(CONTENT):
+                self.send_response(416)
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}")
+        else:
+            start = 0
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(CONTENT) - start))
+        self.end_headers()
+        self.wfile.write(CONTENT[start:])
+
+    def log_message(self, *args):
+        pass
+
+# Function to serve CONTENT on a local port. Yields the URL of the file and the handler class.
+def serve(ranges):
+    handler = type('Handler', (ContentHandler,), {'ranges': ranges, 'requests': []})
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/site.csv", handler
+    finally:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def range_server():
+    yield from serve(ranges=True)
+
+@pytest.fixture
+def plain_server():
+    yield from serve(ranges=False)
+
+def test_local_source_is_verified_and_recorded(tmp_path):
+    source = {'type': 'local', 'path': write_file(tmp_path / 'share', 'site.csv'), 'sha256': SHA256, 'size': len(CONTENT)}
+    path = str(tmp_path / 'data' / 'site.csv')
+
+    assert fetch_site_source('site', path, source) == path
+    with open(path, 'rb') as f:
+        assert f.read() == CONTENT
+    assert not os.path.exists(f"{path}.part")
+    with open(tmp_path / 'data' / SOURCES_MANIFEST) as f:
+        record = json.load(f)['site.csv']
+    assert record['sha256'] == SHA256 and record['size'] == len(CONTENT) and record['source'] == 'local'
+
+def test_local_source_resumes_a_partial_copy(tmp_path):
+    source = {'type': 'local', 'path': write_file(tmp_path / 'share', 'site.csv'), 'sha256': SHA256}
+    path = tmp_path / 'data' / 'site.csv'
+    write_file(tmp_path / 'data', 'site.csv.part', CONTENT[:1000])
+
+    fetch_site_source('site', str(path), source)
+    assert path.read_bytes() == CONTENT
+
+def test_http_source_resumes_with_a_range_request(tmp_path, range_server):
+    url, handler = range_server
+    path = tmp_path / 'data' / 'site.csv'
+    write_file(tmp_path / 'data', 'site.csv.part', CONTENT[:12345])
+
+    fetch_site_source('site', str(path), {'type': 'http', 'url': url, 'sha256': SHA256})
+    assert handler.requests == ['bytes=12345-']
+    assert path.read_bytes() == CONTENT
+
+def test_http_source_without_range_support_is_fetched_whole(tmp_path, plain_server):
+    url, handler = plain_server
+    path = tmp_path / 'data' / 'site.csv'
+    write_file(tmp_path / 'data', 'site.csv.part', CONTENT[:12345])
+
+    fetch_site_source('site', str(path), {'type': 'http', 'url': url, 'sha256': SHA256})
+    assert handler.requests == ['bytes=12345-']
+    assert path.read_bytes() == CONTENT
+
+def test_http_source_with_a_complete_partial_file(tmp_path, range_server):
+    url, handler = range_server
+    path = tmp_path / 'data' / 'site.csv'
+    write_file(tmp_path / 'data', 'site.csv.part')
+
+    fetch_site_source('site', str(path), {'type': 'http', 'url': url, 'sha256': SHA256, 'size': len(CONTENT)})
+    assert path.read_bytes() == CONTENT
+
+def test_corrupt_partial_file_is_fetched_again(tmp_path, range_server):
+    url, handler = range_server
+    path = tmp_path / 'data' / 'site.csv'
+    write_file(tmp_path / 'data', 'site.csv.part', b'x' * 12345)
+
+    fetch_site_source('site', str(path), {'type': 'http', 'url': url, 'sha256': SHA256})
+    assert handler.requests == ['bytes=12345-', None]
+    assert path.read_bytes() == CONTENT
+
+@pytest.mark.parametrize('checks', [{'sha256': hashlib.sha256(b'other').hexdigest()}, {'sha256': SHA256, 'size': len(CONTENT) + 1}],
+                         ids=['sha256', 'size'])
+def test_mismatching_file_is_not_published(tmp_path, checks):
+    source = {'type': 'local', 'path': write_file(tmp_path / 'share', 'site.csv'), **checks}
+    path = tmp_path / 'data' / 'site.csv'
+
+    with pytest.raises(ValueError):
+        fetch_site_source('site', str(path), source)
+    assert not path.exists()
+    assert not (tmp_path / 'data' / 'site.csv.part').exists()
+
+def test_source_without_a_checksum_needs_an_opt_out(tmp_path):
+    source = {'type': 'local', 'path': write_file(tmp_path / 'share', 'site.csv')}
+    path = tmp_path / 'data' / 'site.csv'
+
+    with pytest.raises(ValueError, match='sha256'):
+        fetch_site_source('site', str(path), source)
+    assert not path.exists()
+
+    fetch_site_source('site', str(path), {**source, 'verify': False})
+    assert path.read_bytes() == CONTENT
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from scripts.distributions import BIN_CHOICES, base_histogram, binned_kde, rebin, scott_bandwidth
+
+# Temperatures of a few days of minute data, rounded to a tenth like the station files
+def temperatures(rows=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    hours = np.arange(rows) / 60
+    return np.round(27 + 4 * np.sin(2 * np.pi * hours / 24) + rng.normal(0, 1.5, rows), 1)
+
+def test_base_histogram_matches_numpy():
+    values = temperatures()
+    values[::50] = np.nan
+    histogram = base_histogram(values)
+    valid = values[~np.isnan(values)]
+
+    counts, edges = np.histogram(valid, bins=len(histogram['counts']), range=(valid.min(), valid.max()))
+    np.testing.assert_allclose(histogram['edges'], edges)
+    np.testing.assert_array_equal(histogram['counts'], counts)
+    assert histogram['counts'].sum() == histogram['n'] == len(valid)
+    assert histogram['mean'] == pytest.approx(valid.mean())
+    assert histogram['std'] == pytest.approx(valid.std(ddof=1))
+
+@pytest.mark.parametrize('bins', BIN_CHOICES)
+def test_rebin_merges_base_bins_exactly(bins):
+    histogram = base_histogram(temperatures())
+    counts, edges = rebin(histogram, bins)
+    assert counts.sum() == histogram['n']
+    np.testing.assert_allclose(edges, np.linspace(histogram['edges'][0], histogram['edges'][-1], bins + 1))
+    np.testing.assert_array_equal(counts, histogram['counts'].reshape(bins, -1).sum(axis=1))
+
+def test_binned_kde_matches_gaussian_sum():
+    values = temperatures()
+    histogram = base_histogram(values)
+    bin_width = (histogram['edges'][-1] - histogram['edges'][0]) / 30
+    centers, curve = binned_kde(histogram, bin_width=bin_width)
+
+    # Gaussian kernels summed over the binned values with numpy, in counts per bin of bin_width
+    bandwidth = scott_bandwidth(histogram)
+    assert bandwidth == pytest.approx(values.std(ddof=1) * len(values) ** (-1 / 5))
+    kernels = np.exp(-0.5 * ((centers[:, None] - centers[None, :]) / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+    expected = kernels @ histogram['counts'] * bin_width
+    np.testing.assert_allclose(curve, expected, atol=1e-3 * expected.max())
+
+def test_binned_kde_of_constant_or_empty_values():
+    centers, curve = binned_kde(base_histogram(np.full(10, 3.0)))
+    assert curve.sum() == 10
+    _, curve = binned_kde(base_histogram(np.array([np.nan])))
+    assert curve.sum() == 0
@@ -0,0 +1,40 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+STATION_CSV = """Timestamp,GHI,DNI,DHI,ModA,ModB,Tamb,RH,WS,WSgust,WSstdev,WD,WDstdev,BP,Cleaning,Precipitation,TModA,TModB,Comments
+2021-08-09 00:01,-3.6,11.1,2.7,-3.4,-3.3,24.8,80.2,0.4,2.9,0.5,177.1,1.5,992.0,0,0.0,32.0,29.4,
+2021-08-09 00:02,4.7,3.1,-2.5,4.5,4.3,26.4,86.5,1.0,3.6,0.6,243.4,15.0,992.0,0,0.0,27.7,28.9,
+2021-08-09 00:03,2.9,0.0,1.1,2.2,2.1,25.9,84.1,0.8,1.9,0.4,201.0,9.2,993.0,0,0.0,27.1,28.0,
+"""
+
+# Function to register a site whose file is copied from a local path, pinned to the checksum of the given content
+def local_site(key, file_name, path, content):
+    return {'key': key, 'display_name': key.title(), 'location': key, 'file_name': file_name,
+            'source': {'type': 'local', 'path': path, 'sha256': hashlib.sha256(content.encode()).hexdigest()}, 'cleaning_rules': None}
+
+def test_parallel_load_keeps_failures_per_site(tmp_path):
+    (tmp_path / 'good.csv').write_text(STATION_CSV)
+    (tmp_path / 'corrupt.csv').write_text('not,a\n1,2\n')
+    sites = [local_site('good', 'good.csv', str(tmp_path / 'good.csv'), STATION_CSV),
+             local_site('missing', 'missing.csv', str(tmp_path / 'nowhere.csv'), STATION_CSV),
+             local_site('corrupt', 'corrupt.csv', str(tmp_path / 'corrupt.csv'), 'not,a\n1,2\n')]
+    (tmp_path / 'sites.json').write_text(json.dumps({'sites': sites}))
+
+    # The registry and data directories are read from the environment when the modules are imported
+    env = {**os.environ, 'SOLAR_SITES_CONFIG': str(tmp_path / 'sites.json'), 'SOLAR_DATA_DIR': str(tmp_path / 'data'),
+           'SOLAR_CACHE_DIR': str(tmp_path / 'cache')}
+    script = ("from scripts.load_data import load_and_clean_data\n"
+              "frames = load_and_clean_data(parallel=True, max_workers=2)\n"
+              "print([None if frame is None else len(frame) for frame in frames])\n")
+    result = subprocess.run([sys.executable, '-c', script], env=env, cwd=ROOT_DIR, capture_output=True, text=True, timeout=300)
+
+    assert result.returncode == 0, result.stderr
+    lines = result.stdout.splitlines()
+    assert lines[-1] == '[3, None, None]'
+    assert any(line.startswith('Failed to load missing: FileNotFoundError') for line in lines)
+    assert any(line.startswith('Failed to load corrupt:') for line in lines)
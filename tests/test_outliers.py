@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from scripts.outliers import MAD_SCALE, find_outliers, flagged_rows, zscore_matrix
+
+VARIABLES = ['GHI', 'Tamb', 'RH', 'WS', 'BP']
+
+# Function to build a week of minute rows with a few spikes and gaps, so that some values lie beyond 3 standard deviations
+def station_frame(rows=10_000, seed=0):
+    rng = np.random.default_rng(seed)
+    hours = np.arange(rows) / 60
+    data = pd.DataFrame({
+        'Timestamp': pd.date_range('2021-08-09 00:01', periods=rows, freq='min'),
+        'GHI': np.round(np.maximum(900 * np.sin(2 * np.pi * (hours - 6) / 24), 0) + rng.normal(0, 20, rows), 1),
+        'Tamb': np.round(27 + 4 * np.sin(2 * np.pi * (hours - 9) / 24) + rng.normal(0, 1, rows), 1),
+        'RH': np.round(rng.uniform(20, 100, rows), 1),
+        'WS': np.round(rng.gamma(2, 1.2, rows), 1),
+        'BP': np.round(rng.normal(995, 2, rows)),
+    })
+    for column in VARIABLES:
+        spikes = rng.random(rows) < 0.003
+        data.loc[spikes, column] = data.loc[spikes, column] * 4 + 50
+    for column in ['GHI', 'RH']:
+        data.loc[rng.random(rows) < 0.02, column] = np.nan
+    return data
+
+def test_zscores_match_pandas():
+    data = station_frame()
+    population, center, scale = zscore_matrix(data, VARIABLES)
+    frame = data[VARIABLES]
+    expected = (frame - frame.mean()) / frame.std()
+    np.testing.assert_allclose(population, expected.to_numpy().T, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(center, frame.mean().to_numpy())
+    np.testing.assert_allclose(scale, frame.std().to_numpy())
+
+    robust, center, scale = zscore_matrix(data, VARIABLES, method='robust')
+    median = frame.median()
+    mad = (frame - median).abs().median() * MAD_SCALE
+    np.testing.assert_allclose(robust, ((frame - median) / mad).to_numpy().T, rtol=1e-9, atol=1e-12)
+
+def test_rolling_zscores_match_window_statistics():
+    data = station_frame(3000)
+    rolling, _, _ = zscore_matrix(data, ['Tamb', 'GHI'], method='rolling', window='6h')
+    times = data['Timestamp']
+    half = pd.Timedelta('3h')
+    for row in range(0, len(data), 97):
+        window = data[(times >= times[row] - half) & (times <= times[row] + half)]
+        for j, variable in enumerate(['Tamb', 'GHI']):
+            values = window[variable]
+            expected = (data[variable][row] - values.mean()) / values.std()
+            np.testing.assert_allclose(rolling[j, row], expected, rtol=1e-7, atol=1e-9)
+
+def test_find_outliers_matches_pandas():
+    data = station_frame()
+    result = find_outliers(data, VARIABLES, dtype='float64')
+    frame = data[VARIABLES]
+    expected = (frame - frame.mean()) / frame.std()
+    flagged = expected.abs() > 3
+    assert (flagged.sum() > 0).all()
+
+    pd.testing.assert_series_equal(result.counts, flagged.sum(), check_names=False, check_index_type=False)
+    np.testing.assert_array_equal(result.rows, np.flatnonzero(flagged.any(axis=1)))
+    for variable in VARIABLES:
+        np.testing.assert_array_equal(result.column_rows[variable], np.flatnonzero(flagged[variable]))
+
+    table = flagged_rows(data, result)
+    for variable in VARIABLES:
+        np.testing.assert_allclose(table[f"{variable}_z"], expected[variable].to_numpy()[result.rows], rtol=1e-9)
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.regression import fit_model, sufficient_statistics
+
+# Function to build station-like rows where humidity falls as the sun and the temperature rise, with gaps in some columns
+def station_frame(rows=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    ghi = np.maximum(rng.normal(300, 350, rows), 0)
+    tamb = 24 + ghi / 150 + rng.normal(0, 1.5, rows)
+    data = pd.DataFrame({
+        'RH': np.clip(95 - 2.5 * tamb + rng.normal(0, 8, rows), 0, 100),
+        'Tamb': tamb,
+        'GHI': ghi,
+        'WS': rng.gamma(2, 1.2, rows),
+        'BP': rng.normal(995, 2, rows),
+    }).round(1)
+    for column in ['GHI', 'RH']:
+        data.loc[rng.random(rows) < 0.02, column] = np.nan
+    return data
+
+@pytest.mark.parametrize('target, predictors', [('GHI', ['RH']), ('Tamb', ['RH']), ('GHI', ['RH', 'Tamb', 'WS'])])
+def test_fit_model_matches_lstsq(target, predictors):
+    data = station_frame()
+    stats = sufficient_statistics(data)
+    fit = fit_model(stats, target, predictors)
+
+    complete = data[stats['columns']].dropna()
+    x = np.column_stack([np.ones(len(complete))] + [complete[p].to_numpy() for p in predictors])
+    y = complete[target].to_numpy()
+    solution, _, _, _ = np.linalg.lstsq(x, y, rcond=None)
+    residuals = y - x @ solution
+
+    assert fit['n'] == len(complete)
+    assert fit['intercept'] == pytest.approx(solution[0], rel=1e-8)
+    np.testing.assert_allclose([fit['coef'][p] for p in predictors], solution[1:], rtol=1e-8)
+    assert fit['r2'] == pytest.approx(1 - residuals @ residuals / ((y - y.mean()) @ (y - y.mean())), rel=1e-8)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.rollups import aggregate, build_rollup, update_rollup
+
+VARIABLES = ['GHI', 'Tamb', 'RH']
+
+# Function to build a station-like frame spanning two months, with gaps in some columns
+def station_frame(rows=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        'Timestamp': pd.date_range('2021-08-09 00:01', periods=rows, freq='17min'),
+        'GHI': np.round(np.maximum(rng.normal(200, 300, rows), 0), 1),
+        'Tamb': np.round(rng.normal(27, 4, rows), 1),
+        'RH': np.round(rng.uniform(20, 100, rows), 1),
+    })
+    data.loc[rng.random(rows) < 0.05, 'GHI'] = np.nan
+    data.loc[rng.random(rows) < 0.02, 'RH'] = np.nan
+    return data
+
+# Function to get the statistics of a grain straight from the rows with groupby().agg
+def grouped_reference(data, keys):
+    frame = data.assign(Day=data['Timestamp'].dt.floor('D'), Hour=data['Timestamp'].dt.hour, Month=data['Timestamp'].dt.month)
+    long = frame.melt(id_vars=['Day', 'Hour', 'Month'], value_vars=VARIABLES, var_name='Variable').dropna(subset=['value'])
+    return long.groupby(['Variable'] + keys)['value'].agg(['count', 'mean', 'std', 'min', 'max'])
+
+@pytest.mark.parametrize('grain, keys', [('month', ['Month']), ('hour', ['Hour']), ('month_hour', ['Month', 'Hour']), ('day', ['Day'])])
+def test_aggregate_matches_groupby(grain, keys):
+    data = station_frame()
+    aggregated = aggregate(build_rollup(data, VARIABLES), grain)
+    expected = grouped_reference(data, keys)
+    assert len(aggregated) == len(expected)
+    pd.testing.assert_frame_equal(aggregated, expected.loc[aggregated.index], check_dtype=False, check_index_type=False,
+                                  check_names=False, rtol=1e-9)
+
+def test_build_rollup_sorts_rows():
+    data = station_frame(500)
+    shuffled = data.sample(frac=1, random_state=0)
+    pd.testing.assert_frame_equal(build_rollup(shuffled, VARIABLES), build_rollup(data, VARIABLES), rtol=1e-9)
+
+def test_update_rollup_matches_build_rollup():
+    data = station_frame()
+    # Chunks split inside an hour, so the cells at the chunk boundaries are merged
+    cube = None
+    for start, end in [(0, 1234), (1234, 2001), (2001, 2002), (2002, len(data))]:
+        cube = update_rollup(cube, data.iloc[start:end], VARIABLES)
+    expected = build_rollup(data, VARIABLES)
+
+    keys = ['Variable', 'Day', 'Hour']
+    pd.testing.assert_frame_equal(cube.sort_values(keys, ignore_index=True), expected.sort_values(keys, ignore_index=True), rtol=1e-9)
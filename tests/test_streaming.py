@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.cleaning import DEFAULT_RULES, apply_cleaning_rules
+from scripts.streaming import DEFAULT_SKETCH_SIZE, QuantileSketch, fit_streaming_bounds, stream_clean
+
+QS = np.array([0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99])
+
+# Rank error of the sketches of the default size k = 400: about 1.5 / k, stated as +-0.4%, see DEFAULT_SKETCH_SIZE
+RANK_ERROR = 0.004
+
+# Function to check that every estimate lies between the exact quantiles one rank error below and above its quantile
+def assert_within_rank_error(values, estimates, qs, error):
+    values = values[~np.isnan(values)]
+    low = np.quantile(values, np.clip(qs - RANK_ERROR, 0, 1))
+    high = np.quantile(values, np.clip(qs + error, 0, 1))
+    assert ((low <= estimates) & (estimates <= high)).all(), (qs, low, estimates, high)
+
+# Station-like values: rounded to a tenth, with many ties at zero
+def station_values(rng, n):
+    return np.round(rng.gamma(0.5, 20, n), 1) * (rng.random(n) > 0.4)
+
+@pytest.mark.parametrize('seed', range(5))
+def test_sketch_quantiles_are_within_the_rank_error(seed):
+    rng = np.random.default_rng(seed)
+    values = station_values(rng, 200_000)
+    sketch = QuantileSketch(DEFAULT_SKETCH_SIZE, seed=seed)
+    for chunk in np.array_split(values, 37):
+        sketch.update(chunk)
+
+    assert sketch.count == len(values)
+    assert_within_rank_error(values, sketch.quantile(QS), QS, RANK_ERROR)
+
+def test_merged_sketches_are_within_the_rank_error():
+    rng = np.random.default_rng(1)
+    chunks = [rng.normal(10 * i, 1 + i, 20_000 + 1000 * i) for i in range(8)]
+    chunks[3][::7] = np.nan
+
+    sketches = []
+    for i, chunk in enumerate(chunks):
+        sketch = QuantileSketch(DEFAULT_SKETCH_SIZE, seed=i)
+        sketch.update(chunk)
+        sketches.append(sketch)
+    merged = sketches[0]
+    for sketch in sketches[1:]:
+        merged.merge(sketch)
+
+    values = np.concatenate(chunks)
+    assert merged.count == np.count_nonzero(~np.isnan(values))
+    assert_within_rank_error(values, merged.quantile(QS), QS, RANK_ERROR)
+
+def test_empty_sketch_has_no_quantiles():
+    assert np.isnan(QuantileSketch().quantile([0.25, 0.75])).all()
+
+def test_fit_streaming_bounds_without_chunks():
+    with pytest.raises(ValueError):
+        fit_streaming_bounds(iter([]), DEFAULT_RULES)
+
+def test_streaming_cleaning_agrees_with_the_exact_cleaning():
+    rng = np.random.default_rng(2)
+    rows = 60_000
+    data = pd.DataFrame({
+        'ModA': station_values(rng, rows) * 20 - 5,
+        'ModB': rng.normal(300, 200, rows),
+        'GHI': rng.normal(400, 500, rows),
+        'Cleaning': (rng.random(rows) < 0.01) * 1.0 + (rng.random(rows) < 0.001) * 2.0,
+    })
+    rules = {column: DEFAULT_RULES[column] for column in data.columns}
+
+    exact = data.copy()
+    exact_report = apply_cleaning_rules(exact, rules)
+
+    cleaned = []
+    report = stream_clean(lambda: (data.iloc[start:start + 7000].copy() for start in range(0, rows, 7000)), rules,
+                          lambda chunks: cleaned.extend(chunks))
+    streamed = pd.concat(cleaned)
+
+    # Range and mode rules are applied exactly
+    for column in ['GHI', 'Cleaning']:
+        pd.testing.assert_series_equal(streamed[column], exact[column])
+    pd.testing.assert_frame_equal(report.loc[['GHI', 'Cleaning']], exact_report.loc[['GHI', 'Cleaning']])
+
+    # The IQR fences lie between the exact fences of the quartiles one rank error away
+    for column in ['ModA', 'ModB']:
+        values = np.abs(data[column].to_numpy())
+        q1 = np.quantile(values, [0.25 - RANK_ERROR, 0.25 + RANK_ERROR])
+        q3 = np.quantile(values, [0.75 - RANK_ERROR, 0.75 + RANK_ERROR])
+        lower = [a - 1.5 * (b - a) for a in q1 for b in q3]
+        upper = [b + 1.5 * (b - a) for a in q1 for b in q3]
+        assert min(lower) <= report.loc[column, 'lower_bound'] <= max(lower)
+        assert min(upper) <= report.loc[column, 'upper_bound'] <= max(upper)
@@ -0,0 +1,35 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.time_index import slice_time_range, sort_by_time, time_index
+
+# Function to build a few days of minute rows, the slice has to return them as they are
+def station_frame(rows=7000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Timestamp': pd.date_range('2021-08-09 00:01', periods=rows, freq='min'),
+        'GHI': np.round(rng.normal(200, 300, rows), 1),
+        'Tamb': np.round(rng.normal(27, 4, rows), 1),
+    })
+
+@pytest.mark.parametrize('start, end', [(None, None), ('2021-08-10', '2021-08-12'), (pd.Timestamp('2021-08-11 06:30'), pd.Timestamp('2021-08-13 18:00')),
+                                        (None, datetime.date(2021, 8, 12)), (None, '2021-08-01'), ('2021-08-20', None)])
+def test_slice_time_range_matches_mask(start, end):
+    data = station_frame()
+    shuffled = data.sample(frac=1, random_state=0)
+    ordered = sort_by_time(shuffled)
+    sliced = slice_time_range(ordered, time_index(ordered), start, end)
+
+    keep = np.ones(len(data), dtype=bool)
+    if start is not None:
+        keep &= data['Timestamp'] >= pd.Timestamp(start)
+    if isinstance(end, datetime.date) and not isinstance(end, datetime.datetime):
+        # A date includes that whole day
+        keep &= data['Timestamp'] < pd.Timestamp(end) + pd.Timedelta(days=1)
+    elif end is not None:
+        keep &= data['Timestamp'] <= pd.Timestamp(end)
+    pd.testing.assert_frame_equal(sliced, data[keep].loc[sliced.index])
+    assert len(sliced) == keep.sum()
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.wind import build_wind_table, direction_stats, slice_wind_table
+
+# Function to build a few days of minute rows whose wind blows around north, so the mean direction wraps at 360,
+# with gaps and a few negative speeds that are left out
+def station_frame(rows=7000, seed=0):
+    rng = np.random.default_rng(seed)
+    hours = np.arange(rows) / 60
+    data = pd.DataFrame({
+        'Timestamp': pd.date_range('2021-08-09 00:01', periods=rows, freq='min'),
+        'WS': np.round(rng.gamma(2, 1.2, rows), 1),
+        'WD': np.round((350 + 40 * np.sin(2 * np.pi * hours / 24) + np.degrees(rng.vonmises(0, 2, rows))) % 360, 1),
+    })
+    data.loc[rng.random(rows) < 0.005, 'WS'] = -1.0
+    for column in ['WS', 'WD']:
+        data.loc[rng.random(rows) < 0.02, column] = np.nan
+    return data
+
+# Function to get the circular statistics of the wind directions of some rows with numpy, as (mean direction, resultant length, std)
+def circular_reference(directions):
+    radians = np.radians(directions)
+    sin, cos = np.sin(radians).mean(), np.cos(radians).mean()
+    resultant = np.hypot(sin, cos)
+    return np.degrees(np.arctan2(sin, cos)) % 360, resultant, np.degrees(np.sqrt(-2 * np.log(resultant)))
+
+@pytest.mark.parametrize('start, end', [(None, None), ('2021-08-11', '2021-08-12')])
+def test_direction_stats_match_numpy(start, end):
+    data = station_frame()
+    table = slice_wind_table(build_wind_table(data), start, end)
+    rows = data[data['WD'].notna() & data['WS'].notna() & (data['WS'] >= 0)]
+    if start is not None:
+        days = rows['Timestamp'].dt.floor('D')
+        rows = rows[(days >= pd.Timestamp(start)) & (days <= pd.Timestamp(end))]
+
+    overall = direction_stats(table)
+    assert overall['count'] == len(rows)
+    np.testing.assert_allclose(overall[['mean_direction', 'resultant_length', 'circular_std']].to_numpy(dtype='float64'),
+                               circular_reference(rows['WD'].to_numpy()), rtol=1e-9)
+
+    by_hour = direction_stats(table, 'hour')
+    for hour, group in rows.groupby(rows['Timestamp'].dt.hour):
+        assert by_hour.loc[hour, 'count'] == len(group)
+        np.testing.assert_allclose(by_hour.loc[hour, ['mean_direction', 'resultant_length', 'circular_std']].to_numpy(dtype='float64'),
+                                   circular_reference(group['WD'].to_numpy()), rtol=1e-9)